@@ -66,8 +66,8 @@ valid_set = dataset.test_iter
 
 neon_logger.display("Vocab size - {}".format(vocab_size))
 neon_logger.display("Sentence Length - {}".format(sentence_length))
-neon_logger.display("# of train sentences {}".format(train_set.Xdev[0].shape[0]))
-neon_logger.display("# of test sentence {}".format(valid_set.Xdev[0].shape[0]))
+neon_logger.display("# of train sentences {}".format(train_set.ndata))
+neon_logger.display("# of test sentence {}".format(valid_set.ndata))
 
 
 # weight initialization
@@ -25,7 +25,7 @@ Usage:
 """
 
 from neon.callbacks.callbacks import Callbacks
-from neon.data import HDF5IteratorOneHot, MNIST
+from neon.data import HDF5IteratorOneHot, MNIST, write_arrays
 from neon.initializers import Gaussian
 from neon.layers import GeneralizedCost, Affine
 from neon.models import Model
@@ -33,8 +33,6 @@ from neon.optimizers import GradientDescentMomentum
 from neon.transforms import Rectlin, Logistic, CrossEntropyBinary, Misclassification
 from neon.util.argparser import NeonArgparser
 from neon import logger as neon_logger
-import h5py
-import numpy as np
 
 # parse the command line arguments
 parser = NeonArgparser(__doc__)
@@ -46,30 +44,11 @@ dataset = MNIST(path=args.data_dir)
 # split into train and tests sets
 (X_train, y_train), (X_test, y_test), nclass = dataset.load_data()
 
-# generate the HDF5 file
-datsets = {'train': (X_train, y_train),
-           'test': (X_test, y_test)}
-
-for ky in ['train', 'test']:
-    df = h5py.File('mnist_%s.h5' % ky, 'w')
-
-    # input images
-    in_dat = datsets[ky][0]
-    df.create_dataset('input', data=in_dat)
-    df['input'].attrs['lshape'] = (1, 28, 28)  # (C, H, W)
-
-    # can also add in a mean image or channel by channel mean for color image
-    # for mean subtraction during data iteration
-    # e.g.
-    if ky == 'train':
-        mean_image = np.mean(X_train, axis=0)
-    # use training set mean for both train and val data sets
-    df.create_dataset('mean', data=mean_image)
-
-    target = datsets[ky][1].reshape((-1, 1))  # make it a 2D array
-    df.create_dataset('output', data=target)
-    df['output'].attrs['nclass'] = 10
-    df.close()
+# generate the HDF5 files, using the training set mean for both sets
+mean_image = write_arrays('mnist_train.h5', X_train, y_train, lshape=(1, 28, 28), nclass=nclass,
+                          batch_size=args.batch_size)
+write_arrays('mnist_test.h5', X_test, y_test, lshape=(1, 28, 28), nclass=nclass,
+             batch_size=args.batch_size, mean=mean_image)
 
 # setup a training set iterator
 # use the iterator that generates 1-hot output. other HDF5Iterator (sub) classes are
@@ -26,10 +26,11 @@ except ImportError:
           "the software.\n    From the top level dir issue: 'make'")
     sys.exit(1)
 from copy import deepcopy
+from future.utils import with_metaclass
 import inspect
 import logging
 
-from neon.util.persist import load_class
+from neon.util.persist import load_class, register_class
 
 
 DISPLAY_LEVEL_NUM = 41
@@ -62,7 +63,16 @@ def get_args(func):
     return dict(list(zip(args, defaults)))
 
 
-class NervanaObject(object):
+class NervanaObjectMeta(type):
+    """
+    Metaclass of NervanaObject, registers every subclass for load_class.
+    """
+    def __init__(cls, name, bases, dict_):
+        super(NervanaObjectMeta, cls).__init__(name, bases, dict_)
+        register_class(cls)
+
+
+class NervanaObject(with_metaclass(NervanaObjectMeta, object)):
     """
     Base (global) object available to all other classes.
 
@@ -44,7 +44,7 @@ except ImportError:
 def gen_backend(backend='cpu', rng_seed=None, datatype=np.float32,
                 batch_size=0, stochastic_round=False, device_id=0,
                 max_devices=get_device_count(), compat_mode=None,
-                deterministic_update=None, deterministic=None):
+                deterministic_update=None, deterministic=None, batch_major=False):
     """
     Construct and return a backend instance of the appropriate type based on
     the arguments given. With no parameters, a single CPU core, float32
@@ -74,6 +74,13 @@ def gen_backend(backend='cpu', rng_seed=None, datatype=np.float32,
                                      layer output sizes will match that of caffe as will
                                      the dropout layer implementation
         deterministic (bool, optional): if set to true, all operations will be done deterministically.
+        batch_major (bool, optional): if set to true, the layers of a model keep their
+                                      activations with the batch as the outer axis and
+                                      images in (height, width, channel) order. Data
+                                      iterators provide batch major inputs and the model
+                                      converts its outputs and output deltas back to the
+                                      (feature, batch) layout. Only supported by the cpu
+                                      backend.
 
     Returns:
         Backend: newly constructed backend instance of the specifed type.
@@ -97,6 +104,12 @@ def gen_backend(backend='cpu', rng_seed=None, datatype=np.float32,
                       'specifying random seed')
        deterministic = None
 
+    layout_args = {}
+    if batch_major:
+        if backend != 'cpu':
+            raise ValueError('batch major layout is only supported by the cpu backend')
+        layout_args['batch_major'] = True
+
     from neon.backends.backend import Backend
     be = Backend.allocate_backend(backend,
                                     rng_seed=rng_seed,
@@ -105,7 +118,8 @@ def gen_backend(backend='cpu', rng_seed=None, datatype=np.float32,
                                     device_id=device_id,
                                     num_devices=max_devices,
                                     compat_mode=compat_mode,
-                                    deterministic=deterministic)
+                                    deterministic=deterministic,
+                                    **layout_args)
 
     logger.info("Backend: {}, RNG seed: {}".format(backend, rng_seed))
 
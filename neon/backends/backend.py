@@ -186,10 +186,14 @@ class Tensor(object):
         """
         raise NotImplementedError()
 
-    def get(self):
+    def get(self, out=None):
         """
         Copy tensor to host as numpy array.
 
+        Arguments:
+            out (numpy.ndarray, optional): host array of the same shape and dtype to
+                                           copy into instead of a new one
+
         Returns:
             numpy.ndarray: A host numpy array
         """
@@ -496,6 +500,9 @@ class Backend(AbstractBackend):
 
         self.deterministic = self.rng_seed is not None
 
+        # layout of the layer activations, see iobuf
+        self.batch_major = False
+
     def cleanup_backend(self):
         """Release any resources that have been acquired by this backend."""
         pass
@@ -540,7 +547,7 @@ class Backend(AbstractBackend):
         return self.compat_mode == 'caffe'
 
     def iobuf(self, dim0, x=None, dtype=None, name=None, persist_values=True,
-              shared=None, parallelism=None):
+              shared=None, parallelism=None, batch_major=False):
         """
         Allocate input and output buffer for layer based on batch size. This
         is used because the layer does not know about the batch size.
@@ -567,6 +574,11 @@ class Backend(AbstractBackend):
                                          Model) employed by this buffer.
                                          Ignored on CPU and GPU backends,
                                          defaults to no parallelism.
+            batch_major (bool, optional): If True, allocate the buffer with the
+                                          batch as the outer axis, (bsz, dim0),
+                                          and the features of a sample in
+                                          (depth, height, width, channel) order.
+                                          Defaults to False.
         Returns:
             Tensor: array object
         """
@@ -579,6 +591,8 @@ class Backend(AbstractBackend):
                 bufshape = (int(np.prod(dim0)), self.bsz)
         else:
             bufshape = (dim0, self.bsz)
+        if batch_major:
+            bufshape = bufshape[::-1]
 
         if shared is not None:
             out_tsr = shared if shared.shape == bufshape else shared.share(bufshape)
@@ -589,6 +603,24 @@ class Backend(AbstractBackend):
 
         return out_tsr
 
+    def feature_view(self, x, nfm=None):
+        """
+        Return a view of a layer activation tensor with the features on the
+        first axis, independent of the layout of the backend.
+
+        Arguments:
+            x (Tensor): activations allocated with iobuf
+            nfm (int, optional): number of rows of the view, e.g. the number of
+                                 feature maps.  Defaults to all the features of
+                                 a sample.
+
+        Returns:
+            Tensor: (nfm, -1) view of x
+        """
+        if self.batch_major:
+            raise NotImplementedError()
+        return x if nfm is None else x.reshape((nfm, -1))
+
     def shared_iobuf_size(self, shape, parallelism):
         """
         Computes the backend specific size needed for an iobuf with a specified
@@ -1528,6 +1560,49 @@ class Backend(AbstractBackend):
         """
         self.ng.add(inputs, bias, out=inputs)
 
+    def compound_fprop_bias_act(self, y, bias, relu=False, explin=False, slope=0.0,
+                                alpha=1.0):
+        """
+        Add the bias to the outputs of a layer in place and apply a rectified
+        linear or exponential linear activation.
+
+        Arguments:
+            y (Tensor): layer outputs of shape (nout, N), updated in place
+            bias (Tensor): (nout, 1) bias
+            relu (bool): apply max(y, 0) + slope * min(y, 0)
+            explin (bool): apply max(y, 0) + alpha * (exp(min(y, 0)) - 1)
+            slope (float): slope of the rectified linear activation for y < 0
+            alpha (float): scale of the exponential linear activation for y < 0
+        """
+        if relu:
+            y[:] = self.maximum(y + bias, 0) + slope * self.minimum(y + bias, 0)
+        elif explin:
+            y[:] = self.maximum(y + bias, 0) + alpha * (self.exp(self.minimum(y + bias, 0)) - 1)
+        else:
+            y[:] = y + bias
+
+    def compound_bprop_bias_act(self, error, y, bias_grad, relu=False, explin=False,
+                                slope=0.0, alpha=1.0):
+        """
+        Multiply the error by the derivative of the activation applied by
+        compound_fprop_bias_act in place and compute the bias gradient.
+
+        Arguments:
+            error (Tensor): backpropagated error of shape (nout, N), updated in place
+            y (Tensor): layer outputs of shape (nout, N) after the activation
+            bias_grad (Tensor): (nout, 1) buffer for the bias gradient
+            relu (bool): rectified linear activation was applied
+            explin (bool): exponential linear activation was applied
+            slope (float): slope of the rectified linear activation for y < 0
+            alpha (float): scale of the exponential linear activation for y < 0
+        """
+        if relu:
+            error[:] = error * (self.greater(y, 0) + slope * self.less(y, 0))
+        elif explin:
+            error[:] = error * (self.greater(y, 0) + self.minimum(y, 0) +
+                                alpha * self.less(y, 0))
+        bias_grad[:] = self.sum(error, axis=1)
+
     def compound_rnn_unroll_fprop(self, W_recur, h_prev_s, h_ff_s, h_s, bias,
                                   nout, num_steps, num_used_steps, activation,
                                   reverse=False):
@@ -20,6 +20,7 @@ from builtins import object
 import math
 from operator import mul
 import numpy as np
+from numpy.lib.stride_tricks import as_strided
 from functools import reduce
 
 
@@ -57,7 +58,14 @@ class ConvLayer(object):
                  D=1, H=1, W=1,
                  T=1, R=1, S=1,
                  pad_d=0, pad_h=0, pad_w=0,
-                 str_d=1, str_h=1, str_w=1):
+                 str_d=1, str_h=1, str_w=1,
+                 groups=1):
+
+        assert C % groups == 0 and K % groups == 0, \
+            "Input and output feature maps must be divisible by groups"
+        self.batch_major = lib.batch_major
+        assert groups == 1 or not self.batch_major, \
+            "Grouped convolution is not supported with the batch major layout"
 
         # Compute the output spatial dimensions
         M = lib.output_dim(D, T, pad_d, str_d)
@@ -75,19 +83,29 @@ class ConvLayer(object):
         self.MPQ = (M, P, Q)
         self.padding = (pad_d, pad_h, pad_w)
         self.strides = (str_d, str_h, str_w)
+        self.groups = groups
 
+        # each output feature map only sees the C // groups input feature maps of its group
         self.dimI = (C, D, H, W, N)
-        self.dimF = (C, T, R, S, K)
+        self.dimF = (C // groups, T, R, S, K)
         self.dimO = (K, M, P, Q, N)
         self.dimS = (K, 1)
         self.dimI2 = (C * D * H * W, N)
-        self.dimF2 = (C * T * R * S, K)
+        self.dimF2 = (C // groups * T * R * S, K)
         self.dimO2 = (K * M * P * Q, N)
+        # batch major layout of the inputs and outputs
+        self.bmI = (N, D, H, W, C)
+        self.bmO = (N, M, P, Q, K)
         self.sizeI = reduce(mul, self.dimI, 1)
         self.sizeF = reduce(mul, self.dimF, 1)
         self.sizeO = reduce(mul, self.dimO, 1)
         self.nOut = reduce(mul, self.MPQ, 1) * K
 
+        # a single sample is convolved with one matrix multiply over a strided view
+        # of its zero padded input, see xprop_conv_single
+        self.single = N == 1 and groups == 1 and not self.batch_major
+        self.padI = None
+
         if all(x == 1 for x in self.TRS) and \
            all(p == 0 for p in self.padding) and \
            all(s == 1 for s in self.strides):
@@ -154,6 +172,16 @@ class ConvLayer(object):
     def xprop_conv(self, I, F, O, X=None, bias=None, bsum=None, alpha=1.0, beta=0.0,
                    relu=False, brelu=False, slope=0.0, backward=False):
 
+        if self.groups > 1:
+            return self.xprop_conv_grouped(I, F, O, X, bias, bsum, alpha, beta,
+                                           relu, brelu, slope, backward)
+        if self.batch_major:
+            return self.xprop_conv_bm(I, F, O, X, bias, bsum, alpha, beta,
+                                      relu, brelu, slope, backward)
+        if self.single and not self.dot and not backward:
+            return self.xprop_conv_single(I, F, O, X, bias, bsum, alpha, beta,
+                                          relu, brelu, slope)
+
         if X is None:
             X = O
 
@@ -219,8 +247,272 @@ class ConvLayer(object):
         if not beta:
             self.compound_ops(O, X, bias, bsum, relu, brelu, slope)
 
+    def xprop_conv_single(self, I, F, O, X=None, bias=None, bsum=None, alpha=1.0, beta=0.0,
+                          relu=False, brelu=False, slope=0.0):
+        """
+        Forward convolution of a single sample.  The patches of all output positions
+        are gathered from a strided view of the zero padded (C, D, H, W) input, so the
+        convolution is one (K, CTRS) . (CTRS, MPQ) matrix multiply instead of one
+        small one per output position.
+        """
+        if X is None:
+            X = O
+
+        C, T, R, S, K = self.dimF
+        D, H, W = self.DHW
+        M, P, Q = self.MPQ
+        pad_d, pad_h, pad_w = self.padding
+        str_d, str_h, str_w = self.strides
+
+        I = I._tensor.reshape((C, D, H, W))
+        O = O._tensor.reshape(self.dimO)
+        X = X._tensor.reshape(self.dimO)
+        F = F._tensor.reshape(self.dimF2)
+        if bias is not None:
+            bias = bias._tensor.reshape((K, 1))
+        if bsum is not None:
+            bsum = bsum._tensor.reshape((K, 1))
+
+        if any(self.padding):
+            # the border of the padded buffer is never written, only the image is copied
+            if self.padI is None or self.padI.dtype != I.dtype:
+                self.padI = np.zeros((C, D + 2 * pad_d, H + 2 * pad_h, W + 2 * pad_w),
+                                     dtype=I.dtype)
+            self.padI[:, pad_d:pad_d + D, pad_h:pad_h + H, pad_w:pad_w + W] = I
+            I = self.padI
+
+        sC, sD, sH, sW = I.strides
+        patches = as_strided(I, shape=(C, T, R, S, M, P, Q),
+                             strides=(sC, sD, sH, sW, sD * str_d, sH * str_h, sW * str_w))
+        result = np.dot(F.T, patches.reshape((C * T * R * S, M * P * Q))).reshape(O.shape)
+
+        if beta:
+            O[:] = alpha * result + beta * X
+        else:
+            O[:] = result
+            self.compound_ops(O, X, bias, bsum, relu, brelu, slope)
+
+    def xprop_conv_bm(self, I, F, O, X=None, bias=None, bsum=None, alpha=1.0, beta=0.0,
+                      relu=False, brelu=False, slope=0.0, backward=False):
+        """
+        Convolution of batch major (N, D, H, W, C) tensors.  The patch of every
+        sample is contiguous over (T, R, S, C), so each output position is one
+        (N, TRSC) . (TRSC, K) matrix multiply.
+        """
+        if X is None:
+            X = O
+
+        if backward:
+            I = I._tensor.reshape(self.bmO)
+            O = O._tensor.reshape(self.bmI)
+            X = X._tensor.reshape(self.bmI)
+        else:
+            I = I._tensor.reshape(self.bmI)
+            O = O._tensor.reshape(self.bmO)
+            X = X._tensor.reshape(self.bmO)
+        if bias is not None:
+            bias = bias._tensor.reshape((O.shape[-1], 1))
+        if bsum is not None:
+            bsum = bsum._tensor.reshape((O.shape[-1], 1))
+
+        # filters are stored (C, T, R, S, K) in both layouts, reorder them to the
+        # patch order once per call
+        F = F._tensor.reshape(self.dimF)
+        if backward:
+            # C <=> K and mirror T, R, S
+            F = np.ascontiguousarray(F[:, ::-1, ::-1, ::-1, :].transpose(1, 2, 3, 4, 0))
+        else:
+            F = np.ascontiguousarray(F.transpose(1, 2, 3, 0, 4))
+
+        N, M, P, Q, K = O.shape
+
+        if self.dot:
+            result = np.dot(I.reshape((-1, I.shape[-1])), F.reshape((-1, K)))
+            if beta:
+                O[:] = alpha * result.reshape(O.shape) + beta * X
+            else:
+                O[:] = result.reshape(O.shape)
+        else:
+            if backward:
+                mSlice, pSlice, qSlice = self.dSlice, self.hSlice, self.wSlice
+            else:
+                mSlice, pSlice, qSlice = self.mSlice, self.pSlice, self.qSlice
+
+            for m in range(M):
+                sliceT, sliceD, _ = mSlice[m]
+                for p in range(P):
+                    sliceR, sliceH, _ = pSlice[p]
+                    for q in range(Q):
+                        sliceS, sliceW, _ = qSlice[q]
+
+                        slicedF = F[sliceT, sliceR, sliceS].reshape((-1, K))
+                        slicedI = I[:, sliceD, sliceH, sliceW, :].reshape((N, -1))
+
+                        if beta:
+                            O[:, m, p, q, :] = alpha * np.dot(slicedI, slicedF) + \
+                                beta * X[:, m, p, q, :]
+                        else:
+                            O[:, m, p, q, :] = np.dot(slicedI, slicedF)
+
+        if not beta:
+            self.compound_ops(O.reshape((-1, K)).T, X.reshape((-1, K)).T,
+                              bias, bsum, relu, brelu, slope)
+
+    def update_conv_bm(self, I, E, U, alpha=1.0, beta=0.0):
+        """
+        Weight gradient of a convolution of batch major (N, D, H, W, C) tensors.
+        """
+        C, T, R, S, K = self.dimF
+        N, M, P, Q, _ = self.bmO
+
+        I = I._tensor.reshape(self.bmI)
+        E = E._tensor.reshape(self.bmO)
+        U = U._tensor.reshape(self.dimF)
+
+        if self.dot:
+            update = np.dot(I.reshape((-1, C)).T, E.reshape((-1, K))).reshape(U.shape)
+        else:
+            # accumulate in the patch order (T, R, S, C, K)
+            update = np.zeros((T, R, S, C, K), dtype=U.dtype)
+            for m in range(M):
+                sliceT, sliceD, tlen = self.mSlice[m]
+                for p in range(P):
+                    sliceR, sliceH, rlen = self.pSlice[p]
+                    for q in range(Q):
+                        sliceS, sliceW, slen = self.qSlice[q]
+
+                        slicedI = I[:, sliceD, sliceH, sliceW, :].reshape((N, -1))
+                        slicedE = E[:, m, p, q, :]
+                        update[sliceT, sliceR, sliceS] += \
+                            np.dot(slicedI.T, slicedE).reshape((tlen, rlen, slen, C, K))
+            update = update.transpose(3, 0, 1, 2, 4)
+
+        if beta:
+            U[:] = alpha * update + beta * U
+        else:
+            U[:] = alpha * update
+
+    def xprop_conv_grouped(self, I, F, O, X=None, bias=None, bsum=None, alpha=1.0, beta=0.0,
+                           relu=False, brelu=False, slope=0.0, backward=False):
+        """
+        Grouped convolution.  The filters of all groups are applied to their input
+        feature maps with one batched matrix multiply per output position.
+        """
+        G = self.groups
+        if X is None:
+            X = O
+
+        if backward:
+            I = I._tensor.reshape(self.dimO)
+            O = O._tensor.reshape(self.dimI)
+            X = X._tensor.reshape(self.dimI)
+        else:
+            I = I._tensor.reshape(self.dimI)
+            O = O._tensor.reshape(self.dimO)
+            X = X._tensor.reshape(self.dimO)
+        if bias is not None:
+            bias = bias._tensor.reshape((O.shape[0], 1))
+        if bsum is not None:
+            bsum = bsum._tensor.reshape((O.shape[0], 1))
+
+        # filters as (groups, output maps per group, input maps per group, T, R, S)
+        C, T, R, S, K = self.dimF
+        F = F._tensor.reshape((C, T, R, S, G, K // G)).transpose(4, 5, 0, 1, 2, 3)
+        if backward:
+            # swap input and output maps and mirror T, R, S
+            F = F[:, :, :, ::-1, ::-1, ::-1].transpose(0, 2, 1, 3, 4, 5)
+        Gin, Gout = F.shape[2], F.shape[1]
+        N = O.shape[-1]
+
+        def store(m, p, q, result):
+            if beta:
+                O[:, m, p, q, :] = alpha * result + beta * X[:, m, p, q, :]
+            else:
+                O[:, m, p, q, :] = alpha * result if alpha != 1.0 else result
+
+        if self.dot:
+            Fdot = F.reshape((G, Gout, Gin))
+            Idot = I.reshape((G, Gin, -1))
+            result = np.matmul(Fdot, Idot).reshape(O.shape)
+            if beta:
+                O[:] = alpha * result + beta * X
+            else:
+                O[:] = alpha * result if alpha != 1.0 else result
+        else:
+            if backward:
+                mSlice, pSlice, qSlice = self.dSlice, self.hSlice, self.wSlice
+            else:
+                mSlice, pSlice, qSlice = self.mSlice, self.pSlice, self.qSlice
+
+            F = np.ascontiguousarray(F)
+            _, M, P, Q, _ = O.shape
+            for m in range(M):
+                sliceT, sliceD, _ = mSlice[m]
+                for p in range(P):
+                    sliceR, sliceH, _ = pSlice[p]
+                    for q in range(Q):
+                        sliceS, sliceW, _ = qSlice[q]
+
+                        slicedF = F[:, :, :, sliceT, sliceR, sliceS].reshape((G, Gout, -1))
+                        slicedI = I[:, sliceD, sliceH, sliceW, :].reshape((G, -1, N))
+                        store(m, p, q, np.matmul(slicedF, slicedI).reshape((-1, N)))
+
+        if not beta:
+            self.compound_ops(O, X, bias, bsum, relu, brelu, slope)
+
+    def update_conv_grouped(self, I, E, U, alpha=1.0, beta=0.0):
+        """
+        Weight gradient of a grouped convolution, with one batched matrix multiply
+        per output position.
+        """
+        G = self.groups
+        C, T, R, S, K = self.dimF
+        _, M, P, Q, N = self.dimO
+
+        I = I._tensor.reshape(self.dimI)
+        E = E._tensor.reshape(self.dimO)
+        U = U._tensor.reshape(self.dimF)
+
+        if self.dot:
+            # (G, C/G, K/G) = (G, C/G, HWN) . (G, HWN, K/G)
+            update = np.matmul(I.reshape((G, C, -1)),
+                               E.reshape((G, K // G, -1)).transpose(0, 2, 1))
+            update = update.transpose(1, 0, 2).reshape(U.shape)
+            if beta:
+                U[:] = alpha * update + beta * U
+            else:
+                U[:] = alpha * update
+            return
+
+        if beta:
+            U *= beta
+        else:
+            U.fill(0.0)
+
+        for m in range(M):
+            sliceT, sliceD, tlen = self.mSlice[m]
+            for p in range(P):
+                sliceR, sliceH, rlen = self.pSlice[p]
+                for q in range(Q):
+                    sliceS, sliceW, slen = self.qSlice[q]
+
+                    slicedI = I[:, sliceD, sliceH, sliceW, :].reshape((G, -1, N))
+                    slicedE = E[:, m, p, q, :].reshape((G, K // G, N))
+                    update = np.matmul(slicedI, slicedE.transpose(0, 2, 1))
+                    update = update.reshape((G, C, tlen, rlen, slen, K // G))
+                    update = update.transpose(1, 2, 3, 4, 0, 5).reshape((C, tlen, rlen, slen, K))
+                    if alpha == 1.0:
+                        U[:, sliceT, sliceR, sliceS, :] += update
+                    else:
+                        U[:, sliceT, sliceR, sliceS, :] += alpha * update
+
     def update_conv(self, I, E, U, alpha=1.0, beta=0.0):
 
+        if self.groups > 1:
+            return self.update_conv_grouped(I, E, U, alpha, beta)
+        if self.batch_major:
+            return self.update_conv_bm(I, E, U, alpha, beta)
+
         C = self.C
         K, M, P, Q, N = self.dimO
 
@@ -317,6 +609,10 @@ class DeconvLayer(ConvLayer):
         self.padding = (pad_d, pad_h, pad_w)
         self.strides = (str_d, str_h, str_w)
 
+        self.groups = 1
+        self.batch_major = False
+        self.single = False
+
         # Did not change the names of dimI, dimO, etc. even though dimI is now technically the
         # dimension of the output
         self.dimI = (C, D, H, W, N)
@@ -325,6 +621,9 @@ class DeconvLayer(ConvLayer):
         self.dimI2 = (C * D * H * W, N)
         self.dimF2 = (C * T * R * S, K)
         self.dimO2 = (K * M * P * Q, N)
+        # batch major layout of the inputs and outputs
+        self.bmI = (N, D, H, W, C)
+        self.bmO = (N, M, P, Q, K)
         self.sizeI = reduce(mul, self.dimI, 1)
         self.sizeF = reduce(mul, self.dimF, 1)
         self.sizeO = reduce(mul, self.dimO, 1)
@@ -419,6 +718,18 @@ class PoolLayer(object):
 
         self.dimI = (C, D, H, W, N)
         self.dimO = (K, M, P, Q, N)
+        self.batch_major = lib.batch_major
+        self.bmI = (N, D, H, W, C)
+        self.bmO = (N, M, P, Q, K)
+        # spatial pooling is vectorized over the samples and feature maps of each
+        # output position.  A single sample in the (C, D, H, W, N) layout has the
+        # memory order of C samples with one feature map in the batch major layout.
+        if J == 1 and self.batch_major:
+            self.vecI, self.vecO = self.bmI, self.bmO
+        elif J == 1 and N == 1:
+            self.vecI, self.vecO = (C, D, H, W, 1), (K, M, P, Q, 1)
+        else:
+            self.vecI = self.vecO = None
         self.dimF2 = None
         self.dimI2 = (C * D * H * W, N)
         self.dimO2 = (K * M * P * Q, N)
@@ -249,10 +249,17 @@ class CPUTensor(Tensor):
         self._tensor[:] = value
         return self
 
-    def get(self):
+    def get(self, out=None):
         """
         Return the array.
+
+        Arguments:
+            out (numpy.ndarray, optional): host array of the same shape and dtype to
+                                           copy into instead of a new one
         """
+        if out is not None:
+            out[...] = self._tensor
+            return out
         return self._tensor.copy()
 
     def raw(self):
@@ -272,13 +279,14 @@ class CPUTensor(Tensor):
         """
         return self._tensor
 
-    def take(self, indices, axis=None):
+    def take(self, indices, axis=None, out=None):
         """
         Select a subset of elements from an array across an axis.
 
         Arguments:
             indices (Tensor, numpy ndarray): indicies of elements to select
             axis (int): axis across which to select the values
+            out (Tensor, optional): Output Tensor to fill with selected values
 
         Returns:
             Tensor: Tensor with selected values
@@ -290,6 +298,9 @@ class CPUTensor(Tensor):
         # collapsed, hence the squeeze call.
         if type(indices) == np.ndarray:
             indices = indices.squeeze()
+        if out is not None:
+            np.take(self._tensor, np.ravel(indices), axis, out=out._tensor)
+            return out
         new_shape = list(self.shape)
         new_shape[axis] = indices.size
         return self.__class__(
@@ -521,6 +532,7 @@ class NervanaCPU(Backend):
                  hist_bins=64,
                  hist_offset=-48,
                  compat_mode=None,
+                 batch_major=False,
                  # Ignored
                  num_devices=None,
                  stochastic_round=None,
@@ -549,6 +561,7 @@ class NervanaCPU(Backend):
         self.device_type = 0
         self.device_id = 0
         self.tensor_cls = CPUTensor
+        self.batch_major = batch_major
 
         logger.info("Initialized NervanaCPU")
 
@@ -643,7 +656,7 @@ class NervanaCPU(Backend):
             numpy_ind[numpy_axis] = numpy_ind0
             numpy_ind[1 - numpy_axis] = numpy_ind1
             array_output[:] = 0
-            array_output[numpy_ind.tolist()] = 1
+            array_output[tuple(numpy_ind)] = 1
 
             return array_output
 
@@ -1004,6 +1017,57 @@ class NervanaCPU(Backend):
         """
         out._tensor[:] = np.transpose(a._tensor, axes).copy()
 
+    def feature_view(self, x, nfm=None):
+        """
+        Return a view of a layer activation tensor with the features on the
+        first axis.  For the batch major layout this is a transposed view of
+        the (bsz * spatial, nfm) rows of x.
+
+        Arguments:
+            x (CPUTensor): activations allocated with iobuf
+            nfm (int, optional): number of rows of the view, e.g. the number of
+                                 feature maps.  Defaults to all the features of
+                                 a sample.
+
+        Returns:
+            CPUTensor: (nfm, -1) view of x
+        """
+        if not self.batch_major:
+            return x if nfm is None else x.reshape((nfm, -1))
+        nfm = x.shape[1] if nfm is None else nfm
+        return self.tensor_cls(backend=self, ary=x._tensor.reshape((-1, nfm)).T,
+                               dtype=x._tensor.dtype, base=x)
+
+    def to_feature_major(self, x, shape, out):
+        """
+        Copy batch major activations into a feature major buffer.
+
+        Arguments:
+            x (CPUTensor): (bsz, D * H * W * C) activations
+            shape (int, tuple): feature shape of a sample, e.g. (C, H, W)
+            out (CPUTensor): (C * H * W, bsz) output buffer
+        """
+        shape = (shape,) if isinstance(shape, int) else tuple(shape)
+        N = x.shape[0]
+        src = x._tensor.reshape((N,) + shape[1:] + shape[:1])
+        axes = (src.ndim - 1,) + tuple(range(1, src.ndim - 1)) + (0,)
+        out._tensor.reshape(shape + (N,))[:] = src.transpose(axes)
+
+    def to_batch_major(self, x, shape, out):
+        """
+        Copy feature major activations into a batch major buffer.
+
+        Arguments:
+            x (CPUTensor): (C * H * W, bsz) activations
+            shape (int, tuple): feature shape of a sample, e.g. (C, H, W)
+            out (CPUTensor): (bsz, D * H * W * C) output buffer
+        """
+        shape = (shape,) if isinstance(shape, int) else tuple(shape)
+        N = x.shape[-1]
+        src = x._tensor.reshape(shape + (N,))
+        axes = (src.ndim - 1,) + tuple(range(1, src.ndim - 1)) + (0,)
+        out._tensor.reshape((N,) + shape[1:] + shape[:1])[:] = src.transpose(axes)
+
     def make_binary_mask(self, out, keepthresh=0.5):
         """
         Create a binary mask for dropout layers.
@@ -1021,7 +1085,8 @@ class NervanaCPU(Backend):
                    D=1, H=1, W=1,
                    T=1, R=1, S=1,
                    pad_d=0, pad_h=0, pad_w=0,
-                   str_d=1, str_h=1, str_w=1):
+                   str_d=1, str_h=1, str_w=1,
+                   groups=1):
         """
         Create a new ConvLayer parameter object.
         This then is passed as an argument to all the convolution operations.
@@ -1041,6 +1106,10 @@ class NervanaCPU(Backend):
         padding: amount of zero-padding around the given edge
         strides: factor to step the filters by in a given direction
 
+        groups: number of groups the input and output feature maps are split
+                into, each output map only connects to the input maps of its
+                group.  groups == C is a depthwise convolution.
+
         dtype: need to know dtype to setup proper kernels and params.
 
         bsum: calculate the sum along the batchnorm axis for fprop or bprop
@@ -1048,7 +1117,7 @@ class NervanaCPU(Backend):
 
         """
         return ConvLayer(self, dtype, N, C, K, D, H, W, T, R, S,
-                         pad_d, pad_h, pad_w, str_d, str_h, str_w)
+                         pad_d, pad_h, pad_w, str_d, str_h, str_w, groups)
 
     def fprop_conv(self, layer, I, F, O,
                    X=None, bias=None, bsum=None,
@@ -1356,10 +1425,19 @@ class NervanaCPU(Backend):
         pad_c, pad_d, pad_h, pad_w = layer.padding
         str_c, str_d, str_h, str_w = layer.strides
 
-        array_I = I._tensor.reshape(layer.dimI)
-        array_O = O._tensor.reshape(layer.dimO)
-        if op == "max":
-            array_argmax = argmax._tensor.reshape(layer.dimO)
+        if layer.vecI is not None:
+            return self._fprop_pool_vec(layer, I, O, argmax, beta)
+        if layer.batch_major:
+            # pool over feature maps through (C, D, H, W, N) views of the batch major tensors
+            array_I = I._tensor.reshape(layer.bmI).transpose(4, 1, 2, 3, 0)
+            array_O = O._tensor.reshape(layer.bmO).transpose(4, 1, 2, 3, 0)
+            if op == "max":
+                array_argmax = argmax._tensor.reshape(layer.bmO).transpose(4, 1, 2, 3, 0)
+        else:
+            array_I = I._tensor.reshape(layer.dimI)
+            array_O = O._tensor.reshape(layer.dimO)
+            if op == "max":
+                array_argmax = argmax._tensor.reshape(layer.dimO)
 
         for k in range(K):
             sliceC, _ = layer.kSlice[k]
@@ -1411,12 +1489,20 @@ class NervanaCPU(Backend):
         pad_c, pad_d, pad_h, pad_w = layer.padding
         str_c, str_d, str_h, str_w = layer.strides
 
-        array_E = I._tensor.reshape(layer.dimO)
+        if layer.vecI is not None:
+            return self._bprop_pool_vec(layer, I, O, argmax, alpha, beta)
+        if layer.batch_major:
+            array_E = I._tensor.reshape(layer.bmO).transpose(4, 1, 2, 3, 0)
+            array_delta = O._tensor.reshape(layer.bmI).transpose(4, 1, 2, 3, 0)
+            if op == "max":
+                array_argmax = argmax._tensor.reshape(layer.bmO).transpose(4, 1, 2, 3, 0)
+        else:
+            array_E = I._tensor.reshape(layer.dimO)
+            array_delta = O._tensor.reshape(layer.dimI)
+            if op == "max":
+                array_argmax = argmax._tensor.reshape(layer.dimO)
         array_E[:] = array_E * alpha
-        array_delta = O._tensor.reshape(layer.dimI)
         array_delta[:] = array_delta * beta
-        if op == "max":
-            array_argmax = argmax._tensor.reshape(layer.dimO)
 
         for k in range(K):
             sliceC, clen = layer.kSlice[k]
@@ -1442,6 +1528,71 @@ class NervanaCPU(Backend):
                             raise NotImplementedError
                         array_delta[patch_in] = sliceB.reshape((clen, dlen, hlen, wlen, N))
 
+    def _fprop_pool_vec(self, layer, I, O, argmax, beta):
+        """
+        Spatial pooling of (N, D, H, W, C) tensors, vectorized over the samples
+        and feature maps of each output position.
+        """
+        op = layer.op
+        N, D, H, W, C = layer.vecI
+        _, M, P, Q, _ = layer.vecO
+
+        array_I = I._tensor.reshape(layer.vecI)
+        array_O = O._tensor.reshape(layer.vecO)
+        if op == "max":
+            array_argmax = argmax._tensor.reshape(layer.vecO)
+
+        for m in range(M):
+            sliceD, _ = layer.mSlice[m]
+            for p in range(P):
+                sliceH, _ = layer.pSlice[p]
+                for q in range(Q):
+                    sliceW, _ = layer.qSlice[q]
+
+                    sliceI = array_I[:, sliceD, sliceH, sliceW, :].reshape((N, -1, C))
+                    if op == "max":
+                        array_argmax[:, m, p, q, :] = np.argmax(sliceI, axis=1)
+                        pooled = np.max(sliceI, axis=1)
+                    elif op == "avg":
+                        pooled = np.mean(sliceI, axis=1)
+                    elif op == "l2":
+                        pooled = np.sqrt(np.sum(np.square(sliceI), axis=1))
+                    array_O[:, m, p, q, :] = array_O[:, m, p, q, :] * beta + pooled
+
+    def _bprop_pool_vec(self, layer, I, O, argmax, alpha, beta):
+        """
+        Backward spatial pooling of (N, D, H, W, C) tensors.
+        """
+        op = layer.op
+        N, D, H, W, C = layer.vecI
+        _, M, P, Q, _ = layer.vecO
+
+        array_E = I._tensor.reshape(layer.vecO)
+        array_E[:] = array_E * alpha
+        array_delta = O._tensor.reshape(layer.vecI)
+        array_delta[:] = array_delta * beta
+        if op == "max":
+            array_argmax = argmax._tensor.reshape(layer.vecO)
+            n_idx = np.arange(N)[:, None]
+            c_idx = np.arange(C)[None, :]
+
+        for m in range(M):
+            sliceD, dlen = layer.mSlice[m]
+            for p in range(P):
+                sliceH, hlen = layer.pSlice[p]
+                for q in range(Q):
+                    sliceW, wlen = layer.qSlice[q]
+
+                    patch_in = (slice(None), sliceD, sliceH, sliceW, slice(None))
+                    sliceB = array_delta[patch_in].reshape((N, -1, C))
+                    if op == "max":
+                        sliceB[n_idx, array_argmax[:, m, p, q, :], c_idx] += array_E[:, m, p, q, :]
+                    elif op == "avg":
+                        sliceB += array_E[:, m, p, q, None, :] * (1.0 / sliceB.shape[1])
+                    else:
+                        raise NotImplementedError
+                    array_delta[patch_in] = sliceB.reshape((N, dlen, hlen, wlen, C))
+
     def _roipooling_slice(self, h, stride, H, roi_offset):
         """
         Slicing for ROIPooling along one dimension.
@@ -1684,6 +1835,59 @@ class NervanaCPU(Backend):
         xtmp = (op(xhat, grad_gamma) + grad_beta) / float(x.shape[1])
         delta_out.reshape(delta_in.shape)[:] = op(op(delta_in - xtmp, gamma), inv_v)
 
+    def compound_fprop_bias_act(self, y, bias, relu=False, explin=False, slope=0.0,
+                                alpha=1.0):
+        """
+        Add the bias to the outputs of a layer in place and apply a rectified
+        linear or exponential linear activation, without building op-trees or
+        temporaries of the size of the outputs.
+
+        Arguments:
+            y (Tensor): layer outputs of shape (nout, N), updated in place
+            bias (Tensor): (nout, 1) bias
+            relu (bool): apply max(y, 0) + slope * min(y, 0)
+            explin (bool): apply max(y, 0) + alpha * (exp(min(y, 0)) - 1)
+            slope (float): slope of the rectified linear activation for y < 0
+            alpha (float): scale of the exponential linear activation for y < 0
+        """
+        Y = y._tensor
+        np.add(Y, bias._tensor, out=Y)
+        if relu and not slope:
+            np.maximum(Y, 0, out=Y)
+        elif relu or explin:
+            neg = np.minimum(Y, 0)
+            np.maximum(Y, 0, out=Y)
+            if relu:
+                neg *= slope
+            else:
+                np.expm1(neg, out=neg)
+                neg *= alpha
+            Y += neg
+
+    def compound_bprop_bias_act(self, error, y, bias_grad, relu=False, explin=False,
+                                slope=0.0, alpha=1.0):
+        """
+        Multiply the error by the derivative of the activation applied by
+        compound_fprop_bias_act in place and compute the bias gradient.
+
+        Arguments:
+            error (Tensor): backpropagated error of shape (nout, N), updated in place
+            y (Tensor): layer outputs of shape (nout, N) after the activation
+            bias_grad (Tensor): (nout, 1) buffer for the bias gradient
+            relu (bool): rectified linear activation was applied
+            explin (bool): exponential linear activation was applied
+            slope (float): slope of the rectified linear activation for y < 0
+            alpha (float): scale of the exponential linear activation for y < 0
+        """
+        E, Y = error._tensor, y._tensor
+        if relu and not slope:
+            E *= Y > 0
+        elif relu:
+            E *= (Y > 0) + slope * (Y < 0)
+        elif explin:
+            E *= np.where(Y > 0, 1.0, np.minimum(Y, 0) + alpha * (Y < 0))
+        np.sum(E, axis=1, keepdims=True, out=bias_grad._tensor)
+
     def compound_bprop_lut(self, nin, inputs, error, error_t, dW, pad_idx, alpha=1.0, beta=0):
         """
         Backward propagate lookup table layer.
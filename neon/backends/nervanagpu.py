@@ -405,22 +405,31 @@ class GPUTensor(Tensor):
 
         return self
 
-    def get(self, stream=None):
+    def get(self, stream=None, out=None):
         """
         Copy device array to host.
 
+        Arguments:
+            stream (Stream, optional): stream of the copy
+            out (numpy.ndarray, optional): host array of the same shape and dtype to
+                                           copy into instead of a new one
+
         Returns:
             numpy.ndarray: A host numpy array
         """
+        if out is None:
+            ary = np.empty(self.shape, self.dtype)
+        else:
+            assert out.shape == self.shape and out.dtype == self.dtype and \
+                out.flags.c_contiguous, "out must be a contiguous array of the tensor shape"
+            ary = out
 
         if self.is_contiguous:
-            ary = np.empty(self.shape, self.dtype)
             drv.memcpy_dtoh_async(ary, self.gpudata, stream)
         else:
             # if it is not contiguous, need to copy it over to new device mem
             ary_d = self.backend.empty(self.shape, self.dtype)
             ary_d.copy(self)
-            ary = np.empty(self.shape, self.dtype)
             drv.memcpy_dtoh_async(ary, ary_d.gpudata, stream)
         return ary
 
@@ -30,7 +30,8 @@ import weakref
 from neon import NervanaObject, logger as neon_logger
 from neon.data import NervanaDataIterator, Ticker
 from neon.util.compat import PY3
-from neon.util.persist import load_obj, save_obj, load_class
+from neon.util.persist import (load_obj, save_obj, load_class, save_chunked,
+                               CheckpointWriter)
 from neon.layers import Convolution, BatchNorm, Multicost
 
 logger = logging.getLogger(__name__)
@@ -85,6 +86,7 @@ class Callbacks(NervanaObject):
         super(Callbacks, self).__init__(name=None)
         self.callbacks = list()
         self.epoch_marker = 0
+        self.caught_signal = None
         self.output_file = output_file
         if output_file is None:
             if hasattr(self, 'callback_data'):
@@ -257,8 +259,19 @@ class Callbacks(NervanaObject):
         if self.model_file:
             self.model().load_params(self.model_file)
 
-        # setup an interrupt handler
+        # continue the minibatch counts of the epochs a checkpoint has completed
+        model = self.model()
+        markers = model.minibatch_markers[:epochs]
+        if len(markers) > 0:
+            time_markers['minibatch'][:len(markers)] = markers
+            self.epoch_marker = markers[-1]
+        if model.resume_state is not None:
+            self.epoch_minibatches = model.resume_state['minibatch']
+
+        # setup interrupt and termination handlers
+        self.caught_signal = None
         signal.signal(signal.SIGINT, self.on_sigint_catch)
+        signal.signal(signal.SIGTERM, self.on_sigterm_catch)
 
         for c in self.callbacks:
             c.on_train_begin(self.callback_data, self.model(), epochs)
@@ -267,8 +280,9 @@ class Callbacks(NervanaObject):
         """
         Call all registered callbacks' on_train_end functions.
         """
-        # reset the signal handler
+        # reset the signal handlers
         signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
 
         for c in self.callbacks:
             c.on_train_end(self.callback_data, self.model())
@@ -302,6 +316,7 @@ class Callbacks(NervanaObject):
         self.callback_data['time_markers'].attrs['epochs_complete'] = epoch + 1
         self.callback_data['time_markers'].attrs['minibatches_complete'] = self.epoch_marker
         self.callback_data.flush()
+        self.check_signal()
 
     def on_minibatch_begin(self, epoch, minibatch):
         """
@@ -329,24 +344,62 @@ class Callbacks(NervanaObject):
 
         # keep track of the number of mb per epoch, since they vary
         self.epoch_minibatches = minibatch + 1
+        self.check_signal()
 
-    def on_sigint_catch(self, epoch, minibatch):
+    def on_sigint_catch(self, signum, frame):
         """
-        Callback to handle SIGINT events.
+        Callback to handle SIGINT events.  Training stops at the end of the current
+        minibatch, see check_signal, a second SIGINT interrupts it immediately.
 
         Arguments:
-            epoch (int): index of current epoch
-            minibatch (int): index of minibatch that is ending
+            signum (int): signal number
+            frame (frame): stack frame the signal interrupted
         """
         # restore the orignal handler
         signal.signal(signal.SIGINT, signal.SIG_DFL)
+        self.caught_signal = signal.SIGINT
+
+    def on_sigterm_catch(self, signum, frame):
+        """
+        Callback to handle SIGTERM events, e.g. the preemption of a job.  Training stops
+        at the end of the current minibatch, see check_signal.
+
+        Arguments:
+            signum (int): signal number
+            frame (frame): stack frame the signal interrupted
+        """
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        self.caught_signal = signal.SIGTERM
+
+    def check_signal(self):
+        """
+        Stop training if SIGINT or SIGTERM was caught.  The model is saved to save_path
+        first, at the end of a minibatch the checkpoint resumes training from the next
+        one.  Raises KeyboardInterrupt for SIGINT and SystemExit for SIGTERM.
+        """
+        if self.caught_signal is None:
+            return
+        signum, self.caught_signal = self.caught_signal, None
+
+        # let pending checkpoint writes finish before writing the last one
+        for c in self.callbacks:
+            if getattr(c, 'writer', None) is not None:
+                try:
+                    c.writer.wait()
+                except Exception:
+                    pass
 
         # save the model
         if self.save_path is not None:
             save_obj(self.model().serialize(keep_states=True), self.save_path)
-            raise KeyboardInterrupt('Checkpoint file saved to {0}'.format(self.save_path))
-        else:
-            raise KeyboardInterrupt
+            msg = 'Checkpoint file saved to {0}'.format(self.save_path)
+            if signum == signal.SIGTERM:
+                logger.warning(msg)
+                raise SystemExit(128 + signum)
+            raise KeyboardInterrupt(msg)
+        if signum == signal.SIGTERM:
+            raise SystemExit(128 + signum)
+        raise KeyboardInterrupt
 
 
 class Callback(NervanaObject):
@@ -511,13 +564,46 @@ class SerializeModelCallback(Callback):
                                  files up to this count are retained.  filename
                                  for the check point files will be
                                  <save_path>_<epoch>.
+        async_write (bool, optional): write the checkpoints in a background thread
+                                      from a snapshot of the model, see
+                                      CheckpointWriter.  Defaults to True.
+        minibatch_freq (int, optional): also serialize the model every
+                                        minibatch_freq minibatches of an epoch, fit
+                                        resumes from the next minibatch when loading
+                                        these checkpoints.  Defaults to None.
+        full_freq (int, optional): write a full checkpoint every full_freq checkpoints
+                                   and deltas of the last full one in between, which
+                                   only hold the array chunks that changed, see
+                                   save_chunked.  Full checkpoints that retained
+                                   deltas depend on are kept beyond history.  Requires
+                                   history > 1.  Defaults to None, only full
+                                   checkpoints.
+        compression (str, optional): write chunked checkpoints with the arrays
+                                     compressed in a thread pool, 'zlib' or 'lzma'.
+                                     Defaults to None, uncompressed pickles unless
+                                     full_freq is given.
     """
 
-    def __init__(self, save_path, epoch_freq=1, history=1):
-        super(SerializeModelCallback, self).__init__(epoch_freq=epoch_freq)
+    def __init__(self, save_path, epoch_freq=1, history=1, async_write=True,
+                 minibatch_freq=None, full_freq=None, compression=None):
+        super(SerializeModelCallback, self).__init__(epoch_freq=epoch_freq,
+                                                     minibatch_freq=minibatch_freq)
+        if full_freq is not None and history <= 1:
+            raise ValueError("Delta checkpoints need history > 1 to keep their full "
+                             "checkpoint")
         self.save_path = save_path
         self.history = history
+        self.async_write = async_write
+        self.full_freq = full_freq
+        self.compression = compression
+        self.writer = CheckpointWriter() if async_write else None
         self.checkpoint_files = deque()
+        # full checkpoint the next deltas are written against, the full checkpoint
+        # of every delta file and full checkpoints kept for retained deltas
+        self.base = None
+        self.bases = dict()
+        self.kept_bases = []
+        self.nsaved = 0
 
     def on_epoch_end(self, callback_data, model, epoch):
         """
@@ -531,7 +617,36 @@ class SerializeModelCallback(Callback):
         if self.history > 1:
             self.save_history(epoch, model)
         else:
-            save_obj(model.serialize(keep_states=True), self.save_path)
+            self._write(self._save, model.serialize(keep_states=True), self.save_path)
+
+    def on_minibatch_end(self, callback_data, model, epoch, minibatch):
+        """
+        Called when a minibatch is about to end
+
+        Arguments:
+            callback_data (HDF5 dataset): shared data between callbacks
+            model (Model): model object
+            epoch (int): index of current epoch
+            minibatch (int): index of minibatch that is ending
+        """
+        self.on_epoch_end(callback_data, model, epoch)
+
+    def on_train_end(self, callback_data, model):
+        """
+        Called when training is about to end
+
+        Arguments:
+            callback_data (HDF5 dataset): shared data between callbacks
+            model (Model): model object
+        """
+        if self.writer is not None:
+            self.writer.wait()
+
+    def _write(self, func, *args):
+        if self.writer is not None:
+            self.writer.write(func, *args)
+        else:
+            func(*args)
 
     def save_history(self, epoch, model):
         """
@@ -540,21 +655,48 @@ class SerializeModelCallback(Callback):
         # if history > 1, this function will save the last N checkpoints
         # where N is equal to self.history.  The files will have the form
         # of save_path with the epoch added to the filename before the ext
-
-        if len(self.checkpoint_files) > self.history:
-            # remove oldest checkpoint file when max count have been saved
-            fn = self.checkpoint_files.popleft()
+        path_split = os.path.splitext(self.save_path)
+        save_path = '%s_%d%s' % (path_split[0], epoch, path_split[1])
+        # add the current file to the deque, the oldest files are removed
+        # once it is written
+        if len(self.checkpoint_files) == 0 or self.checkpoint_files[-1] != save_path:
+            self.checkpoint_files.append(save_path)
+        stale_files = []
+        while len(self.checkpoint_files) > self.history:
+            stale_files.append(self.checkpoint_files.popleft())
+        self._write(self._save_history, model.serialize(keep_states=True), save_path,
+                    stale_files, list(self.checkpoint_files))
+
+    def _save(self, pdict, save_path):
+        """
+        Write a checkpoint as a pickle, a full chunked file or a delta.
+        """
+        if self.full_freq is None and self.compression is None:
+            save_obj(pdict, save_path)
+            return
+        full = (self.full_freq is None or self.nsaved % self.full_freq == 0 or
+                self.base is None or self.base[0] == save_path)
+        base = self.base = save_chunked(pdict, save_path, None if full else self.base,
+                                        compression=self.compression or 'zlib')
+        self.bases[save_path] = None if full else base[0]
+        self.nsaved += 1
+
+    def _save_history(self, pdict, save_path, stale_files, retained_files):
+        self._save(pdict, save_path)
+
+        needed = set(self.bases.get(fn) for fn in retained_files)
+        kept_bases = []
+        for fn in stale_files + self.kept_bases:
+            if fn in needed:
+                kept_bases.append(fn)
+                continue
+            self.bases.pop(fn, None)
             try:
                 os.remove(fn)
                 logger.info('removed old checkpoint %s' % fn)
             except OSError:
                 logger.warn('Could not delete old checkpoint file %s' % fn)
-
-        path_split = os.path.splitext(self.save_path)
-        save_path = '%s_%d%s' % (path_split[0], epoch, path_split[1])
-        # add the current file to the deque
-        self.checkpoint_files.append(save_path)
-        save_obj(model.serialize(keep_states=True), save_path)
+        self.kept_bases = kept_bases
 
         # maintain a symlink pointing to the latest model params
         try:
@@ -622,7 +764,7 @@ class TrainCostCallback(Callback):
         callback_data.create_dataset("cost/train", (points,))
 
         # make sure our window size is less than or equal to total number of minibatches
-        self.wsz = min(points, self.wsz)
+        self.wsz = min(int(points), self.wsz)
         self.cost_history = deque([], maxlen=self.wsz)
 
         # clue in the data reader to use the 'minibatch' time_markers
@@ -640,7 +782,7 @@ class TrainCostCallback(Callback):
         """
         self.cost_history.append(model.cost.cost)
         mean_cost = sum(self.cost_history) / len(self.cost_history)
-        mbstart = callback_data['time_markers/minibatch'][epoch - 1] if epoch > 0 else 0
+        mbstart = int(callback_data['time_markers/minibatch'][epoch - 1]) if epoch > 0 else 0
         callback_data['cost/train'][mbstart + minibatch] = mean_cost
 
 
@@ -674,7 +816,7 @@ class TrainMulticostCallback(Callback):
                                      (points, self.ncosts_allbranches), dtype='float64')
 
         # make sure our window size is less than or equal to total number of minibatches
-        self.wsz = min(points, self.wsz)
+        self.wsz = min(int(points), self.wsz)
         self.cost_history = deque([], maxlen=self.wsz)
 
         # clue in the data reader to use the 'minibatch' time_markers
@@ -694,7 +836,7 @@ class TrainMulticostCallback(Callback):
         costs = np.array([c.cost for c in model.cost.costs])
         self.cost_history.append(costs)
         mean_cost = sum(self.cost_history) / len(self.cost_history)
-        mbstart = callback_data['time_markers/minibatch'][epoch-1] if epoch > 0 else 0
+        mbstart = int(callback_data['time_markers/minibatch'][epoch - 1]) if epoch > 0 else 0
         callback_data['multicost/train'][mbstart + minibatch, :] = mean_cost.squeeze()
 
         # Extract all nested-multicosts
@@ -1053,7 +1195,7 @@ class ProgressBarCallback(Callback):
         mb_complete = minibatch + 1
         if (now - self.last_update > self.update_thresh_s or mb_complete == self.nbatches):
             self.last_update = now
-            mbstart = callback_data['time_markers/minibatch'][epoch - 1] if epoch > 0 else 0
+            mbstart = int(callback_data['time_markers/minibatch'][epoch - 1]) if epoch > 0 else 0
             train_cost = callback_data['cost/train'][mbstart + minibatch]
 
             progress_string = get_progress_string("Train", epoch, mb_complete, self.nbatches,
@@ -1125,7 +1267,7 @@ class TrainLoggerCallback(Callback):
             epoch (int): index of current epoch
             minibatch (int): index of minibatch that is ending
         """
-        mbstart = callback_data['time_markers/minibatch'][epoch - 1] if epoch > 0 else 0
+        mbstart = int(callback_data['time_markers/minibatch'][epoch - 1]) if epoch > 0 else 0
         train_cost = callback_data['cost/train'][mbstart + minibatch]
         logger.info("Epoch %d Minibatch %d complete. Train cost: %f", epoch, minibatch, train_cost)
 
@@ -1152,13 +1294,29 @@ class SaveBestStateCallback(Callback):
     Arguments:
         path (str): repeatedly write the best model parameters seen so far to the
                     filesystem path specified.
+        async_write (bool, optional): write the checkpoints in a background thread
+                                      from a snapshot of the model, see
+                                      CheckpointWriter.  Defaults to True.
     """
 
-    def __init__(self, path):
+    def __init__(self, path, async_write=True):
         super(SaveBestStateCallback, self).__init__(epoch_freq=1)
         self.best_path = path
+        self.async_write = async_write
+        self.writer = CheckpointWriter() if async_write else None
         self.best_cost = None
 
+    def on_train_end(self, callback_data, model):
+        """
+        Called when training is about to end
+
+        Arguments:
+            callback_data (HDF5 dataset): shared data between callbacks
+            model (Model): model object
+        """
+        if self.writer is not None:
+            self.writer.wait()
+
     def on_epoch_end(self, callback_data, model, epoch):
         """
         Called when an epoch is about to end
@@ -1172,7 +1330,11 @@ class SaveBestStateCallback(Callback):
         if _eil:
             if self.best_cost is None or _eil['cost'] < self.best_cost:
                 # TODO: switch this to a general seralization op
-                save_obj(model.serialize(keep_states=True), self.best_path)
+                pdict = model.serialize(keep_states=True)
+                if self.writer is not None:
+                    self.writer.write(save_obj, pdict, self.best_path)
+                else:
+                    save_obj(pdict, self.best_path)
                 self.best_cost = _eil['cost']
 
 
@@ -14,7 +14,11 @@
 # ----------------------------------------------------------------------------
 
 from neon.data.dataiterator import NervanaDataIterator, ArrayIterator
-from neon.data.hdf5iterator import HDF5Iterator, HDF5IteratorOneHot, HDF5IteratorAutoencoder
+from neon.data.prefetch import PrefetchIterator
+from neon.data.augment import AugmentedImageIterator
+from neon.data.hdf5iterator import (HDF5Iterator, HDF5IteratorOneHot, HDF5IteratorAutoencoder,
+                                     ShardedHDF5Iterator, ShardedHDF5IteratorOneHot)
+from neon.data.hdf5writer import HDF5Writer, write_arrays, write_csv, write_image_dir
 from neon.data.datasets import Dataset
 from neon.data.text import Text, Shakespeare, PTB, HutterPrize, IMDB
 from neon.data.batch_writer import BatchWriter, BatchWriterI1K
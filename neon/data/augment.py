@@ -0,0 +1,354 @@
+# ----------------------------------------------------------------------------
+# Copyright 2016 Nervana Systems Inc.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ----------------------------------------------------------------------------
+"""
+Image augmentation of in memory image datasets on worker processes.
+"""
+import ctypes
+import logging
+import multiprocessing as mp
+import traceback
+
+import numpy as np
+
+from neon.data.dataiterator import NervanaDataIterator
+
+logger = logging.getLogger(__name__)
+
+
+def augment_batch(images, out, rng, crop_size, random_crop=True, flip=False, scale=None,
+                  jitter=0.0):
+    """
+    Augment a batch of images with vectorized transforms: the crop, scale and flip of
+    every image are sampled with one gather, and the colour jitter is one broadcast
+    multiply.
+
+    Arguments:
+        images (ndarray): (N, C, H, W) images
+        out (ndarray): (C * crop height * crop width, N) feature major output
+        rng (RandomState): random number generator
+        crop_size (tuple): (height, width) of the crops
+        random_crop (bool, optional): crop at random places, else at the center
+        flip (bool, optional): flip half of the images horizontally at random
+        scale (tuple, optional): (min, max) range of the random zoom factor; the crop is
+                                 taken from a window of crop_size / factor resampled
+                                 with the nearest pixels
+        jitter (float, optional): standard deviation of the random multiplicative factor
+                                  of each channel of each image
+    """
+    N, C, H, W = images.shape
+    ch, cw = crop_size
+    if scale is not None:
+        factor = rng.uniform(scale[0], scale[1], N)
+        wh = np.clip(np.round(ch / factor), 1, H).astype(np.int64)
+        ww = np.clip(np.round(cw / factor), 1, W).astype(np.int64)
+    else:
+        wh = np.full(N, ch, dtype=np.int64)
+        ww = np.full(N, cw, dtype=np.int64)
+    if random_crop:
+        oy = (rng.uniform(size=N) * (H - wh + 1)).astype(np.int64)
+        ox = (rng.uniform(size=N) * (W - ww + 1)).astype(np.int64)
+    else:
+        oy, ox = (H - wh) // 2, (W - ww) // 2
+
+    # pixel coordinates of the crops in the images
+    rows = oy[:, None] + (np.arange(ch)[None, :] * wh[:, None]) // ch
+    cols = ox[:, None] + (np.arange(cw)[None, :] * ww[:, None]) // cw
+    if flip:
+        flipped = rng.uniform(size=N) < 0.5
+        cols[flipped] = cols[flipped, ::-1]
+    crops = images[np.arange(N)[:, None, None, None], np.arange(C)[None, :, None, None],
+                   rows[:, None, :, None], cols[:, None, None, :]]
+    if jitter > 0:
+        crops = crops * (1 + jitter * rng.standard_normal((N, C, 1, 1)))
+    out[:] = crops.reshape((N, -1)).T
+
+
+def _augment_worker(tasks, done, X, lshape, slots, slot_shape, params):
+    """
+    Body of the worker processes, augments the batches it is given into the shared
+    memory batch slots.  Each batch is augmented with an RNG seeded with the epoch
+    seed and the index of the batch.
+    """
+    slots = np.frombuffer(slots, dtype=np.float32).reshape(slot_shape)
+    images = X.reshape((-1,) + tuple(lshape))
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+        batch, slot, rows, seed = task
+        try:
+            rng = np.random.RandomState([seed, batch])
+            augment_batch(images[rows], slots[slot], rng, **params)
+            done.put((batch, slot, None))
+        except Exception:
+            done.put((batch, slot, traceback.format_exc()))
+
+
+class AugmentedImageIterator(NervanaDataIterator):
+    """
+    Iterates over minibatches of randomly augmented images held in memory as numpy
+    arrays, e.g. those of CIFAR10 or MNIST.  For example::
+
+        (X_train, y_train), _, nclass = CIFAR10(path).load_data()
+        train = AugmentedImageIterator(X_train, y_train, nclass=nclass, lshape=(3, 32, 32),
+                                       crop_size=(28, 28), flip=True, scale=(0.9, 1.1))
+
+    The images of a minibatch are cropped, scaled, flipped and colour jittered together
+    (see augment_batch) by a pool of `nworkers` processes, each writing its minibatches
+    into shared memory slots the iterator copies to the backend.  Each minibatch is
+    augmented with its own RNG, seeded from its index and the epoch seed, which is
+    drawn from the backend RNG, so the augmentations of an epoch do not depend on
+    `nworkers` and are reproduced from its state, also when resuming in the middle
+    of the epoch.  With `nworkers` 0 the minibatches are augmented in the training
+    process.
+
+    The examples are shuffled each epoch unless `shuffle` is False, and the last
+    minibatch of an epoch is filled with the first examples of the epoch.  For
+    evaluation, set `random_crop` to False and leave the other transforms off to take
+    the center crops.
+
+    The iterator can be sharded between the workers of a data parallel job (see
+    NervanaDataIterator.shard), each worker then augments its shard with RNGs seeded
+    from its rank as well.
+    """
+    shardable = True
+
+    def __init__(self, X, y=None, nclass=None, lshape=None, crop_size=None,
+                 random_crop=True, flip=False, scale=None, jitter=0.0, shuffle=True,
+                 nworkers=4, name=None):
+        """
+        Args:
+            X (ndarray): (# examples, C * H * W) images
+            y (ndarray, optional): labels of the images, or targets if nclass is None
+            nclass (int, optional): number of classes, the labels are then one hot encoded
+            lshape (tuple): (C, H, W) shape of the images
+            crop_size (tuple, optional): (height, width) of the crops, defaults to the
+                                         size of the images
+            random_crop (bool, optional): crop at random places, else at the center.
+                                          Defaults to True.
+            flip (bool, optional): flip half of the images at random. Defaults to False.
+            scale (tuple, optional): (min, max) range of the random zoom factor.
+                                     Defaults to None.
+            jitter (float, optional): standard deviation of the random factor of each
+                                      colour channel. Defaults to 0.
+            shuffle (bool, optional): visit the examples in a new order each epoch.
+                                      Defaults to True.
+            nworkers (int, optional): number of worker processes. Defaults to 4.
+            name (str, optional): name of the iterator
+        """
+        super(AugmentedImageIterator, self).__init__(name=name)
+        assert lshape is not None and len(lshape) == 3, "lshape must be (C, H, W)"
+        assert X.shape[1] == np.prod(lshape), \
+            "product of lshape {} does not match input feature size".format(lshape)
+        self.X = X
+        self.ndata = len(X)
+        assert self.ndata >= self.be.bsz
+        self.lshape = tuple(lshape)
+        crop_size = tuple(crop_size) if crop_size is not None else self.lshape[1:]
+        self.shape = (self.lshape[0],) + crop_size
+        self.nclass = nclass
+        self.shuffle = shuffle
+        self.nworkers = nworkers
+        self.params = dict(crop_size=crop_size, random_crop=random_crop, flip=flip,
+                           scale=scale, jitter=jitter)
+        self.seed = None
+        self.first = 0
+        self.workers = None
+
+        nout = int(np.prod(self.shape))
+        self.inpbuf = self.be.iobuf(nout)
+        self.bm_inpbuf = self.be.iobuf(nout, batch_major=True) if self.be.batch_major else None
+        self.y = y
+        self.ybuf = None
+        if y is not None:
+            if nclass is not None:
+                self.y = np.asarray(y, dtype=np.int32).reshape((-1, 1))
+                self.labelbuf = self.be.iobuf(1, dtype=np.int32)
+                self.ybuf = self.be.iobuf(nclass)
+            else:
+                self.y = np.asarray(y).reshape((self.ndata, -1))
+                self.ybuf = self.be.iobuf(self.y.shape[1])
+
+    @property
+    def nbatches(self):
+        """
+        Return the number of minibatches in an epoch.
+        """
+        if self.world_size > 1:
+            return self.shard_size(self.ndata) // self.be.bsz
+        return -(-self.ndata // self.be.bsz)
+
+    def reset(self):
+        """
+        Start the next epoch from its first minibatch, with a new order.
+        """
+        self.first = 0
+        self.seed = None
+
+    def get_state(self):
+        """
+        Get the state of the iterator at the start of an epoch.
+
+        Returns:
+            dict: seed of the order and augmentations of the epoch, and the epoch number
+                  when sharded
+        """
+        state = dict(seed=self.epoch_seed())
+        if self.world_size > 1:
+            state['epoch'] = self.epoch
+        return state
+
+    def set_state(self, state):
+        """
+        Restore the state returned by get_state.
+
+        Arguments:
+            state (dict): iterator state
+        """
+        self.seed = state['seed']
+        self.epoch = state.get('epoch', self.epoch)
+
+    def skip(self, nbatches):
+        """
+        Start the epoch after its first minibatches.
+
+        Arguments:
+            nbatches (int): number of minibatches to skip
+
+        Returns:
+            bool: True
+        """
+        self.first = nbatches
+        return True
+
+    def start_workers(self, nslots):
+        """
+        Allocate the shared memory batch slots and start the worker processes.
+        """
+        self.slot_shape = (nslots, int(np.prod(self.shape)), self.be.bsz)
+        self.slots = mp.RawArray(ctypes.c_float, int(np.prod(self.slot_shape)))
+        self.tasks = [mp.Queue() for _ in range(self.nworkers)]
+        self.done = mp.Queue()
+        self.workers = []
+        for wid in range(self.nworkers):
+            p = mp.Process(target=_augment_worker,
+                           args=(self.tasks[wid], self.done, self.X, self.lshape,
+                                 self.slots, self.slot_shape, self.params))
+            p.daemon = True
+            p.start()
+            self.workers.append(p)
+        return np.frombuffer(self.slots, dtype=np.float32).reshape(self.slot_shape)
+
+    def cleanup(self):
+        """
+        Stop the worker processes.
+        """
+        if getattr(self, 'workers', None) is None:
+            return
+        for q in self.tasks:
+            q.put(None)
+        for p in self.workers:
+            p.join()
+        self.workers = None
+
+    def __del__(self):
+        self.cleanup()
+
+    def minibatch(self, slot, rows):
+        """
+        Copy an augmented minibatch and the targets of its examples to the backend.
+        """
+        self.inpbuf.set(slot)
+        inputs = self.inpbuf
+        if self.bm_inpbuf is not None:
+            self.be.to_batch_major(self.inpbuf, self.shape, self.bm_inpbuf)
+            inputs = self.bm_inpbuf
+        if self.ybuf is None:
+            return (inputs, inputs)
+        if self.nclass is not None:
+            self.labelbuf.set(np.ascontiguousarray(self.y[rows].T))
+            self.be.onehot(self.labelbuf, axis=0, out=self.ybuf)
+        else:
+            self.ybuf.set(np.ascontiguousarray(self.y[rows].T))
+        return (inputs, self.ybuf)
+
+    def __iter__(self):
+        """
+        Yields the augmented minibatches of an epoch.
+
+        Yields:
+            tuple: The next minibatch of inputs and targets.
+        """
+        bsz = self.be.bsz
+        seed = self.epoch_seed()
+        order = np.arange(self.ndata)
+        if self.shuffle:
+            order = np.random.RandomState(seed).permutation(self.ndata)
+        if self.world_size > 1:
+            order = self.shard_order(order)
+            # the workers share the order seed, not the augmentations
+            seed = int(np.random.RandomState([seed, self.rank]).randint(2**31 - 1))
+        else:
+            # the last minibatch is filled with the first examples of the epoch
+            order = np.concatenate([order, order[:self.nbatches * bsz - self.ndata]])
+        batches = range(self.first, self.nbatches)
+        self.first = 0
+
+        if self.nworkers == 0:
+            out = np.empty((int(np.prod(self.shape)), bsz), dtype=np.float32)
+            images = self.X.reshape((-1,) + self.lshape)
+            for b in batches:
+                rows = order[b * bsz:(b + 1) * bsz]
+                rng = np.random.RandomState([seed, b])
+                augment_batch(images[rows], out, rng, **self.params)
+                yield self.minibatch(out, rows)
+            self.seed = None
+            self.epoch += 1
+            return
+
+        nslots = 2 * self.nworkers
+        slots = self.start_workers(nslots) if self.workers is None else \
+            np.frombuffer(self.slots, dtype=np.float32).reshape(self.slot_shape)
+        free = list(range(nslots))
+        ready = dict()
+        inflight = 0
+        pending = iter(batches)
+        try:
+            for b in batches:
+                # keep every slot busy
+                while len(free) > 0:
+                    nb = next(pending, None)
+                    if nb is None:
+                        break
+                    slot = free.pop()
+                    self.tasks[nb % self.nworkers].put(
+                        (nb, slot, order[nb * bsz:(nb + 1) * bsz], seed))
+                    inflight += 1
+                while b not in ready:
+                    done, slot, error = self.done.get()
+                    inflight -= 1
+                    if error is not None:
+                        raise RuntimeError('Augmentation worker failed:\n' + error)
+                    ready[done] = slot
+                slot = ready.pop(b)
+                yield self.minibatch(slots[slot], order[b * bsz:(b + 1) * bsz])
+                free.append(slot)
+            self.seed = None
+            self.epoch += 1
+        finally:
+            # wait for the minibatches of an epoch stopped early
+            while inflight > 0:
+                self.done.get()
+                inflight -= 1
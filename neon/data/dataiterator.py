@@ -27,6 +27,15 @@ class NervanaDataIterator(NervanaObject):
 
     For serialization, any data iterator should inherit from this class
     """
+    # seed of the random order (or augmentations) of the current epoch, see epoch_seed
+    seed = None
+    # data parallel sharding, see shard
+    shardable = False
+    rank = 0
+    world_size = 1
+    shard_seed = 0
+    epoch = 0
+
     def __init__(self, name=None):
         super(NervanaDataIterator, self).__init__(name)
 
@@ -48,6 +57,105 @@ class NervanaDataIterator(NervanaObject):
         """
         raise NotImplemented()
 
+    def get_state(self):
+        """
+        Get the state of the iterator at the start of an epoch, which is saved with
+        checkpoints taken in the middle of the epoch to resume training from them.
+
+        Returns:
+            dict: iterator state, restored with set_state
+        """
+        return dict()
+
+    def set_state(self, state):
+        """
+        Restore the state returned by get_state.
+
+        Arguments:
+            state (dict): iterator state
+        """
+        pass
+
+    def skip(self, nbatches):
+        """
+        Move past the first minibatches of the epoch without loading them.
+
+        Arguments:
+            nbatches (int): number of minibatches to skip
+
+        Returns:
+            bool: False if the iterator can not skip, the minibatches are then loaded
+                  and dropped instead
+        """
+        return False
+
+    def shard(self, rank, world_size, seed=0, epoch=0):
+        """
+        Iterate over the shard of one worker of a data parallel job.  Each epoch the
+        workers draw the same global order of the examples from seed and the epoch
+        number, and each iterates over its own contiguous slice of that order, so the
+        shards are disjoint and no communication between the workers is needed.  The
+        order is padded by wrapping around to a multiple of world_size minibatches, all
+        workers then have the same number of minibatches.  To resume a worker in the
+        middle of an epoch, shard it with that epoch and skip to the minibatch.
+
+        Arguments:
+            rank (int): index of the worker, from 0 to world_size - 1
+            world_size (int): number of workers
+            seed (int, optional): seed of the orders, the same for all workers.
+                                  Defaults to 0.
+            epoch (int, optional): number of the next epoch. Defaults to 0.
+        """
+        if not self.shardable:
+            raise NotImplementedError('%s does not support sharding' % self.__class__.__name__)
+        assert 0 <= rank < world_size, "rank must be in [0, world_size)"
+        self.rank = rank
+        self.world_size = world_size
+        self.shard_seed = seed
+        self.epoch = epoch
+
+    def epoch_seed(self):
+        """
+        Return the seed of the random order (or augmentations) of the current epoch,
+        drawing it from the backend RNG at the start of an epoch, or from the shard seed
+        when sharded.  Iterators clear self.seed at the end of an epoch and on reset.
+        """
+        if self.seed is None and self.world_size > 1:
+            self.seed = self.shard_epoch_seed()
+        elif self.seed is None:
+            self.seed = int(self.be.rng.randint(2**31 - 1))
+        return self.seed
+
+    def shard_epoch_seed(self):
+        """
+        Return the seed of the global order of the current epoch of a sharded iterator,
+        the same for all workers.
+        """
+        return int(np.random.RandomState([self.shard_seed, self.epoch]).randint(2**31 - 1))
+
+    def shard_size(self, ndata):
+        """
+        Return the number of examples of each shard of ndata examples, a whole number of
+        minibatches.
+        """
+        bsz = self.be.bsz
+        return -(-ndata // (self.world_size * bsz)) * bsz
+
+    def shard_order(self, order):
+        """
+        Return the slice of the global order of the examples of this worker.
+
+        Arguments:
+            order (ndarray): indices of all the examples in the order of the epoch
+
+        Returns:
+            ndarray: indices of the examples of the shard
+        """
+        n = self.shard_size(len(order))
+        # wrap around to fill the last minibatches
+        order = np.resize(order, n * self.world_size)
+        return order[self.rank * n:(self.rank + 1) * n]
+
 
 class ArrayIterator(NervanaDataIterator):
 
@@ -68,10 +176,20 @@ class ArrayIterator(NervanaDataIterator):
     formatted in (channel, height, width) order. The `lshape` keyword indicates the local shape of
     the images in (channel, height, width) format.
 
+    With a batch major backend the inputs are returned as (batch, feature) minibatches with images
+    in (height, width, channel) order, while the labels keep the (feature, batch) layout the
+    costs and metrics use.
+
     For classification tasks, the labels `y` should be integers from 0 to K-1, where K is the total
     number of classes. When `y` is not provided, the input features themselves will be returned
     as the target values (e.g. autoencoder).
 
+    Memory mapped arrays (e.g. from `np.load('X.npy', mmap_mode='r')`) are not copied to the
+    backend, the minibatches are gathered from the page cache instead, so processes training
+    on the same files share one copy of the data.  On the CPU backends, arrays of the backend
+    data type are not copied either, and the minibatches are gathered straight into the
+    tensors yielded.  The arrays must then not be modified while iterating.
+
     In regression tasks, where `y` is not a categorical label, set `make_onehot` to `False`.
     For example::
 
@@ -79,10 +197,19 @@ class ArrayIterator(NervanaDataIterator):
         y = 2*X + 1
         train = ArrayIterator(X=X, y=y, make_onehot=False)
 
+    With `shuffle` set, the examples are visited in a new random order each epoch, drawn
+    from the backend RNG at the start of the epoch and after a `reset`.  The examples of a
+    minibatch are gathered with one `take` from the data, so the data is not copied again.
+
+    The iterator can be sharded between the workers of a data parallel job, see
+    NervanaDataIterator.shard.
+
     For more information, see the Loading data section of the documentation.
     """
+    shardable = True
 
-    def __init__(self, X, y=None, nclass=None, lshape=None, make_onehot=True, name=None):
+    def __init__(self, X, y=None, nclass=None, lshape=None, make_onehot=True, name=None,
+                 shuffle=False):
         """
         During initialization, the input data will be converted to backend tensor objects
         (e.g. CPUTensor or GPUTensor). If the backend uses the GPU, the data is copied over to the
@@ -100,6 +227,8 @@ class ArrayIterator(NervanaDataIterator):
                 (e.g. # channels, height, width)
             make_onehot (bool, optional): True if y is a categorical label that has to be converted
                 to a one hot representation.
+            shuffle (bool, optional): Visit the examples in a new random order each epoch.
+                Defaults to False.
 
         """
         # Treat singletons like list so that iteration follows same syntax
@@ -108,8 +237,13 @@ class ArrayIterator(NervanaDataIterator):
         self.ndata = len(X[0])
         assert self.ndata >= self.be.bsz
         self.start = 0
+        # minibatches of the epoch skipped when resuming it, see skip
+        self.first = 0
         self.nclass = nclass
         self.ybuf = None
+        self.shuffle = shuffle
+        # seed of the order of the current epoch when shuffling
+        self.seed = None
 
         if make_onehot and nclass is None and y is not None:
             raise AttributeError('Must provide number of classes when creating onehot labels')
@@ -140,23 +274,110 @@ class ArrayIterator(NervanaDataIterator):
             self.shape = self.shape[0]
             self.lshape = lshape
 
-        # Helpers to make dataset, minibatch, unpacking function for transpose and onehot
+        # Helpers to make dataset, minibatch, unpacking function for transpose and onehot.
+        # The unpacking functions copy examples sel of the data, a slice or the indices of
+        # shuffled examples, into a slice of the batch.  The backend arrays are stored in
+        # the layout of the minibatch, so the shuffled examples are taken straight into it.
         def transpose_gen(z):
-            return (self.be.array(z), self.be.iobuf(z.shape[1]),
-                    lambda _in, _out: self.be.copy_transpose(_in, _out))
+            def unpack(_in, _sel, _out, _s):
+                if isinstance(_sel, slice):
+                    _out[:, _s] = _in[:, _sel]
+                else:
+                    self.be.take(_in, _sel, axis=1, out=_out[:, _s])
+            return (self.be.array(np.ascontiguousarray(z.T)), self.be.iobuf(z.shape[1]), unpack)
 
         def onehot_gen(z):
-            return (self.be.array(z.reshape((-1, 1)), dtype=np.int32), self.be.iobuf(nclass),
-                    lambda _in, _out: self.be.onehot(_in, axis=0, out=_out))
-
-        self.Xdev, self.Xbuf, self.unpack_func = list(zip(*[transpose_gen(x) for x in X]))
+            # labels of the shuffled examples
+            labels = self.be.iobuf(1, dtype=np.int32)
+
+            def unpack(_in, _sel, _out, _s):
+                if isinstance(_sel, slice):
+                    _in = _in[:, _sel]
+                else:
+                    _in = self.be.take(_in, _sel, axis=1, out=labels[:, :len(_sel)])
+                self.be.onehot(_in, axis=0, out=_out[:, _s])
+            return (self.be.array(z.reshape((1, -1)), dtype=np.int32), self.be.iobuf(nclass),
+                    unpack)
+
+        def copy_rows(_in, _sel, _out, _s):
+            if isinstance(_sel, slice):
+                _out[_s] = _in[_sel]
+            else:
+                self.be.take(_in, _sel, axis=0, out=_out[_s])
+
+        def batch_major_gen(z):
+            # examples are already rows, only move the channels of images last
+            if lshape is not None and len(lshape) > 1:
+                z = np.moveaxis(z.reshape((-1,) + tuple(lshape)), 1, -1).reshape(z.shape)
+            return (self.be.array(z), self.be.iobuf(z.shape[1], batch_major=True), copy_rows)
+
+        # host minibatches of the arrays kept on the host to copy to their device buffers
+        self.mapped_bufs = []
+        on_cpu = self.be.backend_name in ('cpu', 'mkl')
+
+        def keep_on_host(z):
+            # memory mapped arrays, and on the CPU arrays the backend can use as they are
+            return isinstance(z, np.memmap) or (on_cpu and z.dtype == self.be.default_dtype)
+
+        def host_gen(z, batch_major=False):
+            # the examples stay where they are, the minibatches are gathered with a
+            # transpose on the host, in a buffer the tensor wraps on the CPU backends
+            nfeat = z.shape[1]
+            host = np.empty((self.be.bsz, nfeat) if batch_major else (nfeat, self.be.bsz),
+                            dtype=self.be.default_dtype)
+            if on_cpu:
+                buf = self.be.tensor_cls(backend=self.be, ary=host, dtype=host.dtype)
+            else:
+                buf = self.be.iobuf(nfeat, batch_major=batch_major)
+                self.mapped_bufs.append((host, buf))
+            channels_last = batch_major and lshape is not None and len(lshape) > 1
+            # rows of the shuffled examples, the indices are valid so the take does not
+            # need the buffering of its output that range checks use
+            rows = np.empty((self.be.bsz, nfeat), dtype=z.dtype)
+            take_rows = batch_major and not channels_last and z.dtype == host.dtype
+
+            def unpack(_in, _sel, _out, _s):
+                if isinstance(_sel, slice):
+                    _in = _in[_sel]
+                elif take_rows:
+                    np.take(_in, _sel, axis=0, out=host[_s], mode='clip')
+                    return
+                else:
+                    _in = np.take(_in, _sel, axis=0, out=rows[:len(_sel)], mode='clip')
+                if channels_last:
+                    _in = np.moveaxis(_in.reshape((-1,) + tuple(lshape)), 1, -1)
+                    host[_s] = _in.reshape((_in.shape[0], -1))
+                elif batch_major:
+                    host[_s] = _in
+                else:
+                    host[:, _s] = _in.T
+            return (z, buf, unpack)
+
+        def input_gen(z):
+            if keep_on_host(z):
+                return host_gen(z, self.be.batch_major)
+            return batch_major_gen(z) if self.be.batch_major else transpose_gen(z)
+
+        self.Xdev, self.Xbuf, self.unpack_func = list(zip(*[input_gen(x) for x in X]))
 
         # Shallow copies for appending, iterating
         self.dbuf, self.hbuf = list(self.Xdev), list(self.Xbuf)
         self.unpack_func = list(self.unpack_func)
 
         if y is not None:
-            self.ydev, self.ybuf, yfunc = onehot_gen(y) if make_onehot else transpose_gen(y)
+            if make_onehot:
+                self.ydev, self.ybuf, yfunc = onehot_gen(y)
+            elif keep_on_host(y):
+                self.ydev, self.ybuf, yfunc = host_gen(y)
+            else:
+                self.ydev, self.ybuf, yfunc = transpose_gen(y)
+            self.dbuf.append(self.ydev)
+            self.hbuf.append(self.ybuf)
+            self.unpack_func.append(yfunc)
+        elif self.be.batch_major:
+            # autoencoder targets in the layout of the model outputs
+            ygen = host_gen if keep_on_host(X[0]) else transpose_gen
+            self.ydev, self.ybuf, yfunc = ygen(X[0])
             self.dbuf.append(self.ydev)
             self.hbuf.append(self.ybuf)
             self.unpack_func.append(yfunc)
@@ -166,7 +387,14 @@ class ArrayIterator(NervanaDataIterator):
         """
         Return the number of minibatches in this dataset.
         """
-        return -((self.start - self.ndata) // self.be.bsz)
+        return -((self.start + self.first * self.be.bsz - self.nexamples) // self.be.bsz)
+
+    @property
+    def nexamples(self):
+        """
+        Return the number of examples of an epoch, those of the shard when sharded.
+        """
+        return self.ndata if self.world_size == 1 else self.shard_size(self.ndata)
 
     def reset(self):
         """
@@ -175,6 +403,68 @@ class ArrayIterator(NervanaDataIterator):
         the last uneven minibatch. Not necessary when data is divisible by batch size
         """
         self.start = 0
+        self.first = 0
+        self.seed = None
+
+    def get_state(self):
+        """
+        Get the state of the iterator at the start of an epoch.
+
+        Returns:
+            dict: index of the first example of the epoch, seed of the order of the
+                  epoch when shuffling and the epoch number when sharded
+        """
+        state = dict(start=self.start)
+        if self.shuffle:
+            state['seed'] = self.epoch_seed()
+        if self.world_size > 1:
+            state['epoch'] = self.epoch
+        return state
+
+    def set_state(self, state):
+        """
+        Restore the state returned by get_state.
+
+        Arguments:
+            state (dict): iterator state
+        """
+        self.start = state['start']
+        self.first = 0
+        self.seed = state.get('seed')
+        self.epoch = state.get('epoch', self.epoch)
+
+    def skip(self, nbatches):
+        """
+        Start the epoch after its first minibatches, without loading them.  Only the
+        current epoch skips them.
+
+        Arguments:
+            nbatches (int): number of minibatches to skip
+
+        Returns:
+            bool: True
+        """
+        end = self.start + nbatches * self.be.bsz
+        if end >= self.nexamples:
+            # skipping the whole epoch moves on to the next one
+            self._next_epoch(end - self.nexamples)
+        else:
+            self.first = nbatches
+        return True
+
+    def _next_epoch(self, start):
+        """
+        Move on to the next epoch, which draws a new order.
+
+        Arguments:
+            start (int): index of its first example, the examples before it were in the
+                         last minibatch of the epoch that ended
+        """
+        self.first = 0
+        self.seed = None
+        self.epoch += 1
+        # shards are whole minibatches, the next epoch starts at its first one
+        self.start = start if self.world_size == 1 else 0
 
     def __iter__(self):
         """
@@ -183,19 +473,39 @@ class ArrayIterator(NervanaDataIterator):
         Yields:
             tuple: The next minibatch which includes both features and labels.
         """
-        for i1 in range(self.start, self.ndata, self.be.bsz):
-            bsz = min(self.be.bsz, self.ndata - i1)
+        order = None
+        if self.shuffle:
+            order = np.random.RandomState(self.epoch_seed()).permutation(self.ndata)
+        if self.world_size > 1:
+            order = self.shard_order(np.arange(self.ndata) if order is None else order)
+        if order is not None:
+            order = order.astype(np.int32)
+
+        nexamples = self.nexamples
+        first = self.start + self.first * self.be.bsz
+        self.first = 0
+        # the next epoch starts after the examples the last minibatch wraps around to
+        next_start = (self.start - nexamples) % self.be.bsz
+        for i1 in range(first, nexamples, self.be.bsz):
+            bsz = min(self.be.bsz, nexamples - i1)
             islice1, oslice1 = slice(0, bsz), slice(i1, i1 + bsz)
             islice2, oslice2 = None, None
             if self.be.bsz > bsz:
                 islice2, oslice2 = slice(bsz, None), slice(0, self.be.bsz - bsz)
-                self.start = self.be.bsz - bsz
+                self.start = next_start
 
+            if order is not None:
+                oslice1 = order[oslice1]
+                oslice2 = None if oslice2 is None else order[oslice2]
             for buf, dev, unpack_func in zip(self.hbuf, self.dbuf, self.unpack_func):
-                unpack_func(dev[oslice1], buf[:, islice1])
-                if oslice2:
-                    unpack_func(dev[oslice2], buf[:, islice2])
+                unpack_func(dev, oslice1, buf, islice1)
+                if oslice2 is not None:
+                    unpack_func(dev, oslice2, buf, islice2)
+            for host, buf in self.mapped_bufs:
+                buf.set(host)
 
             inputs = self.Xbuf[0] if len(self.Xbuf) == 1 else self.Xbuf
             targets = self.ybuf if self.ybuf else inputs
             yield (inputs, targets)
+
+        self._next_epoch(next_start)
@@ -15,15 +15,113 @@
 """
 Defines basic input datatset types.
 """
+import glob
 import os
 import h5py
 import logging
 import numpy as np
+import time
+from collections import OrderedDict, deque
+from multiprocessing.pool import ThreadPool
 
 from neon.data import ArrayIterator
 logger = logging.getLogger(__name__)
 
 
+class BlockReader(object):
+    """
+    Reads the rows of an HDF5 dataset in blocks aligned to the chunks of the dataset,
+    keeping the last blocks read in a least recently used cache.  The blocks are read
+    with read_direct into buffers that are reused once evicted from the cache.
+
+    The number of blocks and bytes read and the time spent reading them are counted
+    in nblocks_read, nbytes_read and read_time.
+    """
+    def __init__(self, dset, min_rows, nblocks=2):
+        """
+        Args:
+            dset (h5py.Dataset): 2-D dataset to read the rows of
+            min_rows (int): smallest number of rows in a block, rounded up to a whole
+                            number of chunks
+            nblocks (int, optional): number of blocks to keep in the cache
+        """
+        self.dset = dset
+        chunk_rows = dset.chunks[0] if dset.chunks is not None else 1
+        self.block_rows = -(-min_rows // chunk_rows) * chunk_rows
+        self.nblocks = max(nblocks, 1)
+        self.cache = OrderedDict()
+        self.nblocks_read, self.nbytes_read, self.read_time = 0, 0, 0.0
+
+    @property
+    def nblocks_total(self):
+        """
+        Number of blocks in the dataset.
+        """
+        return -(-self.dset.shape[0] // self.block_rows)
+
+    def block(self, index):
+        """
+        Return the rows of a block, reading it if it is not in the cache.
+
+        Arguments:
+            index (int): index of the block
+
+        Returns:
+            ndarray: rows of the block (the last block may be shorter)
+        """
+        r1 = index * self.block_rows
+        r2 = min(r1 + self.block_rows, self.dset.shape[0])
+        if index in self.cache:
+            # move to the most recently used end
+            buf = self.cache.pop(index)
+        else:
+            if len(self.cache) >= self.nblocks:
+                buf = self.cache.popitem(last=False)[1]
+            else:
+                buf = np.empty((self.block_rows,) + self.dset.shape[1:], dtype=self.dset.dtype)
+            t0 = time.time()
+            self.dset.read_direct(buf, source_sel=np.s_[r1:r2], dest_sel=np.s_[0:r2 - r1])
+            self.read_time += time.time() - t0
+            self.nblocks_read += 1
+            self.nbytes_read += buf[:r2 - r1].nbytes
+        self.cache[index] = buf
+        return buf[:r2 - r1]
+
+    def read_transposed(self, i1, i2, out):
+        """
+        Transpose rows i1 to i2 of the dataset into the columns of out, casting them
+        to the type of out in the same step.
+
+        Arguments:
+            i1 (int): first row
+            i2 (int): row after the last one
+            out (ndarray): (features, i2 - i1) array to write to
+        """
+        col = 0
+        while i1 < i2:
+            index, r1 = divmod(i1, self.block_rows)
+            rows = self.block(index)[r1:r1 + i2 - i1]
+            out[:, col:col + len(rows)] = rows.T
+            col += len(rows)
+            i1 += len(rows)
+
+    def read_rows_transposed(self, rows, out):
+        """
+        Transpose the given rows of the dataset into the columns of out, casting them
+        to the type of out in the same step.  The blocks are read in the order the rows
+        first appear, so rows in consecutive blocks are read sequentially.
+
+        Arguments:
+            rows (ndarray): indices of the rows
+            out (ndarray): (features, len(rows)) array to write to
+        """
+        blocks = rows // self.block_rows
+        _, first = np.unique(blocks, return_index=True)
+        for index in blocks[np.sort(first)]:
+            sel = blocks == index
+            out[:, sel] = self.block(index)[rows[sel] - index * self.block_rows].T
+
+
 class HDF5Iterator(ArrayIterator):
     """
     Data iterator which uses an HDF5 file as the source of the data, useful when
@@ -59,40 +157,103 @@ class HDF5Iterator(ArrayIterator):
 
     For cases where the output should be converted to a one-hot encoding (see Loading Data),
     use the `HDF5IteratorOneHot`. Or for autoencoder problems, use `HDFIteratorAutoencoder`.
+
+    With `block_batches` set, the datasets are read in blocks of at least that many
+    minibatches, aligned to the chunks of the datasets, and the last `cache_blocks`
+    blocks are kept in memory (see BlockReader).  An epoch then reads the file
+    sequentially in large reads instead of one read per minibatch.
+
+    With `shuffle` set, the examples are visited in a new order each epoch while the
+    file is still read in whole blocks: the blocks are permuted, then the examples
+    are shuffled within each group of `cache_blocks` consecutive blocks of the
+    permutation, the shuffle buffer.  Each block is read once per epoch (plus those
+    of the wrap around of the last minibatch).  The order is drawn from the backend
+    RNG and saved by get_state.  The number of blocks read and the read throughput
+    are logged at the end of each epoch.
+
+    With `memmap` set, contiguous (unchunked) datasets are memory mapped from the
+    file instead of read through h5py, the minibatches are then gathered from the
+    page cache, which processes reading the same file share.  Chunked datasets are
+    still read through h5py.
+
+    Sharded iterators (see NervanaDataIterator.shard) read the rows of their slice of
+    the order of the epoch, in blocks with `shuffle` set, so workers of the same job
+    each read about 1 / world_size of the blocks.
     """
-    def __init__(self, hdf_filename, name=None):
+    def __init__(self, hdf_filename, name=None, block_batches=None, cache_blocks=2,
+                 shuffle=False, memmap=False):
         """
         Args:
             hdf_filename (string): Path to the HDF5 datafile.
             name (string, optional): Name to assign this iterator. Defaults to None.
+            block_batches (int, optional): Read the datasets in chunk aligned blocks of at
+                                           least this many minibatches. Defaults to None,
+                                           one read per minibatch.
+            cache_blocks (int, optional): Number of blocks kept in memory when reading
+                                          in blocks, and blocks in the shuffle buffer.
+                                          Defaults to 2.
+            shuffle (bool, optional): Shuffle the examples each epoch, reading blocks of
+                                      one minibatch if block_batches is not set.
+                                      Defaults to False.
+            memmap (bool, optional): Memory map the contiguous datasets. Defaults to False.
         """
         super(ArrayIterator, self).__init__(name=name)
 
         self.hdf_filename = hdf_filename
+        if shuffle and block_batches is None:
+            block_batches = 1
+        self.block_batches = block_batches
+        self.cache_blocks = cache_blocks
+        self.shuffle = shuffle
+        self.memmap = memmap
+        # seed of the order of the current epoch when shuffling
+        self.seed = None
 
         if not os.path.isfile(hdf_filename):
             raise IOError('File not found %s' % hdf_filename)
         self.hdf_file = h5py.File(hdf_filename, mode='r', driver=None)
 
         # input data array
-        self.inp = self.hdf_file['input']
+        self.inp = self.map_dataset(self.hdf_file['input'])
         self.ndata = self.inp.shape[0]
 
         # must have at least 1 minibatch of data in the file
         assert self.ndata >= self.be.bsz
         self.start = 0
+        self.first = 0
 
         # the input array unflattened size
-        self.lshape = tuple(self.inp.attrs['lshape'])
+        self.lshape = tuple(self.hdf_file['input'].attrs['lshape'])
         self.shape = self.lshape
 
         if 'output' in self.hdf_file:
-            self.out = self.hdf_file['output']
+            self.out = self.map_dataset(self.hdf_file['output'])
 
         self.inpbuf = None
         self.outbuf = None
         self.allocated = False
 
+    def map_dataset(self, dset):
+        """
+        Return a read only memory map of a dataset when memory mapping and the dataset
+        is stored contiguously in the file, else the dataset.
+
+        Arguments:
+            dset (h5py.Dataset): dataset of the file
+
+        Returns:
+            np.memmap or h5py.Dataset
+        """
+        if not self.memmap:
+            return dset
+        offset = dset.id.get_offset()
+        if dset.chunks is not None or offset is None:
+            logger.warning('%s is not stored contiguously, it is read through h5py',
+                           dset.name)
+            return dset
+        return np.memmap(self.hdf_filename, dtype=dset.dtype, mode='r', offset=offset,
+                         shape=dset.shape)
+
     def allocate(self):
         """
         After the input and output (`self.inp` and `self.out)` have been
@@ -105,8 +266,85 @@ class HDF5Iterator(ArrayIterator):
         if not self.allocated:
             self.allocate_inputs()
             self.allocate_outputs()
+            self.inp_reader = self.block_reader(self.inp)
+            self.out_reader = None
+            if self.outbuf is not None:
+                # blocks of the outputs at least as large as those of the inputs, so the
+                # shuffle buffer of the inputs spans as many output blocks
+                rows = self.inp_reader.block_rows if self.inp_reader is not None else None
+                self.out_reader = self.block_reader(self.out, rows)
             self.allocated = True
 
+    def block_reader(self, dset, min_rows=None):
+        """
+        Return the BlockReader reading a dataset, or None if not reading in blocks or
+        the data is already in memory.
+
+        Arguments:
+            dset (h5py.Dataset or ndarray): input or output data
+            min_rows (int, optional): smallest number of rows in a block, defaults to
+                                      block_batches minibatches
+        """
+        if self.block_batches is None or not isinstance(dset, h5py.Dataset):
+            return None
+        if min_rows is None:
+            min_rows = self.block_batches * self.be.bsz
+        return BlockReader(dset, min_rows, self.cache_blocks)
+
+    def epoch_order(self):
+        """
+        Return the order of the examples in the current epoch when shuffling, drawing
+        a new one at the start of an epoch.
+
+        Returns:
+            ndarray: indices of the examples in the order they are visited
+        """
+        self.allocate()
+        rng = np.random.RandomState(self.epoch_seed())
+        if self.inp_reader is not None:
+            block_rows = self.inp_reader.block_rows
+        else:
+            # memory mapped input, blocks of the same size in the page cache
+            block_rows = self.block_batches * self.be.bsz
+        blocks = rng.permutation(-(-self.ndata // block_rows))
+        order = []
+        for w in range(0, len(blocks), self.cache_blocks):
+            # the rows of a window of blocks, shuffled together
+            rows = []
+            for k in blocks[w:w + self.cache_blocks]:
+                r1 = k * block_rows
+                rows.append(np.arange(r1, min(r1 + block_rows, self.ndata)))
+            rows = np.concatenate(rows)
+            rng.shuffle(rows)
+            order.append(rows)
+        return np.concatenate(order)
+
+    def load_rows(self, dset, reader, order, i1, i2, out):
+        """
+        Copy examples i1 to i2 of the epoch into the columns of a host minibatch.
+
+        Arguments:
+            dset (h5py.Dataset or ndarray): input or output data
+            reader (BlockReader): reader of dset, None to read from dset directly
+            order (ndarray): order of the examples when shuffling, None for file order
+            i1 (int): position in the epoch of the first example
+            i2 (int): position after the last one
+            out (ndarray): (features, i2 - i1) array to write to
+        """
+        if order is not None:
+            if reader is not None:
+                reader.read_rows_transposed(order[i1:i2], out)
+            elif isinstance(dset, h5py.Dataset):
+                # h5py reads increasing indices only
+                rows, inverse = np.unique(order[i1:i2], return_inverse=True)
+                out[:] = dset[rows.tolist()][inverse].T
+            else:
+                out[:] = dset[order[i1:i2]].T
+        elif reader is not None:
+            reader.read_transposed(i1, i2, out)
+        else:
+            out[:] = dset[i1:i2].T
+
     def allocate_inputs(self):
         """
         Allocates the host and device input data buffers
@@ -116,11 +354,9 @@ class HDF5Iterator(ArrayIterator):
         `self.mini_batch_in` is the on-host buffer for the input minibatch
         `self.mean` is the on-device buffer of the mean array
         """
-        # on device minibatch_buffer (input)
-        self.inpbuf = self.be.iobuf(self.inp.shape[1])
-
-        # setup host buffer for a mini_batch
-        self.mini_batch_in = np.zeros(self.inpbuf.shape)
+        # host buffer for a mini_batch of the backend type, the blocks are transposed
+        # into it and the on device minibatch_buffer (input) wraps it on the CPU
+        self.mini_batch_in, self.inpbuf, self.inp_mapped = self.host_iobuf(self.inp.shape[1])
 
         self.mean = None
         # the 'mean' dataset is the the mean values to subtract
@@ -139,6 +375,29 @@ class HDF5Iterator(ArrayIterator):
 
             self.mean = self.be.array(mns_)
 
+        # batch major copy of the preprocessed minibatch for batch major backends
+        self.bm_inpbuf = None
+        if self.be.batch_major:
+            self.bm_inpbuf = self.be.iobuf(self.inp.shape[1], batch_major=True)
+
+    def host_iobuf(self, nfeatures):
+        """
+        Allocate a device minibatch buffer and the host minibatch copied to it, both of
+        the backend data type.  On the CPU backends the device buffer wraps the host
+        minibatch, so there is nothing to copy.
+
+        Arguments:
+            nfeatures (int): number of features of an example
+
+        Returns:
+            tuple: host ndarray, device Tensor, and whether the Tensor wraps the ndarray
+        """
+        if self.be.backend_name in ('cpu', 'mkl'):
+            host = np.zeros((nfeatures, self.be.bsz), dtype=self.be.default_dtype)
+            return host, self.be.tensor_cls(backend=self.be, ary=host, dtype=host.dtype), True
+        dev = self.be.iobuf(nfeatures)
+        return np.zeros(dev.shape, dtype=dev.dtype), dev, False
+
     def allocate_outputs(self):
         """
         Allocates the host and device output data buffers
@@ -148,9 +407,9 @@ class HDF5Iterator(ArrayIterator):
         `self.mini_batch_out` is the on-host buffer for the output minibatch
         """
         self.outbuf = None
+        self.out_mapped = False
         if 'output' in self.hdf_file:
-            self.outbuf = self.be.iobuf(self.out.shape[1])
-            self.mini_batch_out = np.zeros(self.outbuf.shape)
+            self.mini_batch_out, self.outbuf, self.out_mapped = self.host_iobuf(self.out.shape[1])
 
     def gen_input(self, mini_batch):
         """
@@ -161,7 +420,8 @@ class HDF5Iterator(ArrayIterator):
             mini_batch (ndarray): M-by-N array where M is the flatten
                                   input vector size and N is the batch size
         """
-        self.inpbuf[:] = mini_batch
+        if not (self.inp_mapped and mini_batch is self.mini_batch_in):
+            self.inpbuf[:] = mini_batch
         # mean subtract
         if self.mean is not None:
             self.meansub_view[:] = -self.mean + self.meansub_view
@@ -175,7 +435,8 @@ class HDF5Iterator(ArrayIterator):
             mini_batch (ndarray): M-by-N array where M is the flatten
                                   output vector size and N is the batch size
         """
-        self.outbuf[:] = mini_batch
+        if not (self.out_mapped and mini_batch is self.mini_batch_out):
+            self.outbuf[:] = mini_batch
 
     def __del__(self):
         self.cleanup()
@@ -186,12 +447,6 @@ class HDF5Iterator(ArrayIterator):
         """
         self.hdf_file.close()
 
-    def reset(self):
-        """
-        Resets the index to zero.
-        """
-        self.start = 0
-
     def __iter__(self):
         """
         Defines a generator that can be used to iterate over this dataset.
@@ -208,32 +463,267 @@ class HDF5Iterator(ArrayIterator):
         mini_batch_in = self.mini_batch_in
         if self.outbuf is not None:
             mini_batch_out = self.mini_batch_out
-        for i1 in range(self.start, self.ndata, self.be.bsz):
-            i2 = min(i1 + self.be.bsz, self.ndata)
+        order = self.epoch_order() if self.shuffle else None
+        if self.world_size > 1:
+            order = self.shard_order(np.arange(self.ndata) if order is None else order)
+        if self.inp_reader is not None:
+            nblocks, nbytes, read_time = (self.inp_reader.nblocks_read,
+                                          self.inp_reader.nbytes_read,
+                                          self.inp_reader.read_time)
+        nexamples = self.nexamples
+        first = self.start + self.first * self.be.bsz
+        self.first = 0
+        next_start = (self.start - nexamples) % self.be.bsz
+        for i1 in range(first, nexamples, self.be.bsz):
+            i2 = min(i1 + self.be.bsz, nexamples)
             bsz = i2 - i1
-            if i2 == self.ndata:
-                self.start = self.be.bsz - bsz
+            if i2 == nexamples:
+                self.start = next_start
 
             # load mini batch on host
-            xdev = self.inp
-            mini_batch_in[:, :bsz] = xdev[i1:i2, :].T.astype(np.float32)
-            if self.be.bsz > bsz:
-                mini_batch_in[:, bsz:] = xdev[:(self.be.bsz - bsz), :].T.astype(np.float32)
+            if self.inp_reader is None and order is None and \
+                    isinstance(self.inp, h5py.Dataset):
+                xdev = self.inp
+                mini_batch_in[:, :bsz] = xdev[i1:i2, :].T
+                if self.be.bsz > bsz:
+                    mini_batch_in[:, bsz:] = xdev[:(self.be.bsz - bsz), :].T
+            else:
+                self.load_rows(self.inp, self.inp_reader, order, i1, i2, mini_batch_in[:, :bsz])
+                if self.be.bsz > bsz:
+                    self.load_rows(self.inp, self.inp_reader, order, 0, self.be.bsz - bsz,
+                                   mini_batch_in[:, bsz:])
 
             # push to device
             self.gen_input(mini_batch_in)
 
             if self.outbuf is not None:
-                mini_batch_out[:, :bsz] = self.out[i1:i2].T
+                self.load_rows(self.out, self.out_reader, order, i1, i2, mini_batch_out[:, :bsz])
                 if self.be.bsz > bsz:
-                    mini_batch_out[:, bsz:] = self.out[:(self.be.bsz - bsz)].T
+                    self.load_rows(self.out, self.out_reader, order, 0, self.be.bsz - bsz,
+                                   mini_batch_out[:, bsz:])
 
                 self.gen_output(mini_batch_out)
 
             inputs = self.inpbuf
+            if self.bm_inpbuf is not None:
+                self.be.to_batch_major(self.inpbuf, self.lshape, self.bm_inpbuf)
+                inputs = self.bm_inpbuf
             targets = self.outbuf
             yield (inputs, targets)
 
+        self._next_epoch(next_start)
+        if self.inp_reader is not None:
+            reader = self.inp_reader
+            read_time = reader.read_time - read_time
+            logger.info('%s read %d of %d input blocks (%s), %.1f MB/s', self.hdf_filename,
+                        reader.nblocks_read - nblocks, reader.nblocks_total,
+                        'shuffled' if self.shuffle else 'sequential',
+                        (reader.nbytes_read - nbytes) / 1e6 / max(read_time, 1e-9))
+
+
+class ShardedHDF5Iterator(HDF5Iterator):
+    """
+    Iterates over several HDF5 files (shards) with the same datasets as one dataset,
+    e.g. one file per day of data.  For example::
+
+        train_set = ShardedHDF5Iterator('/data/train/*.h5', nreaders=4)
+
+    The shards are read in blocks of `block_batches` minibatches by a pool of
+    `nreaders` threads, which read ahead of the minibatch being computed, several
+    shards at a time when the blocks of a shard run out.  The examples are visited
+    shard after shard, in a new shard order each epoch with `shuffle` set.  With
+    `nranks` workers, each one iterates over every `nranks`-th shard, starting at
+    its `rank`.
+
+    The `lshape`, `mean` and `nclass` attributes are those of the first shard, all the
+    shards must have the same number of input (and output) features.
+    """
+    # the files are split between workers with rank and nranks instead
+    shardable = False
+
+    def __init__(self, shards, name=None, block_batches=4, nreaders=4, shuffle=False,
+                 rank=0, nranks=1):
+        """
+        Args:
+            shards (str or list): Glob pattern or list of the paths of the HDF5 files.
+            name (string, optional): Name to assign this iterator. Defaults to None.
+            block_batches (int, optional): Number of minibatches read at once from a
+                                           shard. Defaults to 4.
+            nreaders (int, optional): Number of reader threads. Defaults to 4.
+            shuffle (bool, optional): Visit the shards in a new order each epoch.
+                                      Defaults to False.
+            rank (int, optional): Index of this worker. Defaults to 0.
+            nranks (int, optional): Number of workers the shards are split between.
+                                    Defaults to 1.
+        """
+        super(ArrayIterator, self).__init__(name=name)
+
+        if isinstance(shards, str):
+            filenames = sorted(glob.glob(os.path.expandvars(os.path.expanduser(shards))))
+        else:
+            filenames = list(shards)
+        if len(filenames) == 0:
+            raise IOError('No HDF5 files found for %s' % shards)
+        for fn in filenames:
+            if not os.path.isfile(fn):
+                raise IOError('File not found %s' % fn)
+        filenames = filenames[rank::nranks]
+        if len(filenames) == 0:
+            raise ValueError('No shards for rank %d of %d' % (rank, nranks))
+
+        self.hdf_filenames = filenames
+        self.hdf_files = [h5py.File(fn, mode='r', driver=None) for fn in filenames]
+        self.hdf_filename, self.hdf_file = filenames[0], self.hdf_files[0]
+        self.inps = [f['input'] for f in self.hdf_files]
+        self.outs = None
+        if 'output' in self.hdf_file:
+            self.outs = [f['output'] for f in self.hdf_files]
+        for fn, f in zip(filenames, self.hdf_files):
+            if f['input'].shape[1:] != self.inps[0].shape[1:] or \
+                    ('output' in f) != (self.outs is not None) or \
+                    (self.outs is not None and f['output'].shape[1:] != self.outs[0].shape[1:]):
+                raise ValueError('%s does not have the datasets of %s' % (fn, filenames[0]))
+
+        self.inp = self.inps[0]
+        if self.outs is not None:
+            self.out = self.outs[0]
+            if 'nclass' in self.out.attrs:
+                self.nclass = int(self.out.attrs['nclass'])
+        self.shard_rows = [inp.shape[0] for inp in self.inps]
+        self.ndata = sum(self.shard_rows)
+
+        # must have at least 1 minibatch of data in the files
+        assert self.ndata >= self.be.bsz
+        self.start = 0
+        self.first = 0
+
+        self.lshape = tuple(self.inp.attrs['lshape'])
+        self.shape = self.lshape
+
+        self.block_batches = block_batches
+        self.nreaders = nreaders
+        self.shuffle = shuffle
+        self.memmap = False
+        self.seed = None
+        self.pool = None
+
+        self.inpbuf = None
+        self.outbuf = None
+        self.allocated = False
+
+    def block_reader(self, dset, min_rows=None):
+        # the shards are read in blocks by the reader threads
+        return None
+
+    def epoch_blocks(self):
+        """
+        Return the blocks of the current epoch, in the order they are visited.
+
+        Returns:
+            list: (shard index, first row, row after the last one) of each block
+        """
+        order = range(len(self.inps))
+        if self.shuffle:
+            order = np.random.RandomState(self.epoch_seed()).permutation(len(self.inps))
+        block_rows = self.block_batches * self.be.bsz
+        return [(s, r1, min(r1 + block_rows, self.shard_rows[s]))
+                for s in order for r1 in range(0, self.shard_rows[s], block_rows)]
+
+    def read_block(self, block):
+        """
+        Read the rows of a block from its shard, called from the reader threads.
+
+        Arguments:
+            block (tuple): shard index, first row and row after the last one
+
+        Returns:
+            tuple: input rows, and output rows or None
+        """
+        s, r1, r2 = block
+        return (self.inps[s][r1:r2], None if self.outs is None else self.outs[s][r1:r2])
+
+    def __iter__(self):
+        """
+        Defines a generator that can be used to iterate over this dataset.
+
+        Yields:
+            tuple: The next minibatch. A minibatch includes both features and
+            labels.
+        """
+        if not self.allocated:
+            self.allocate()
+        if self.pool is None:
+            self.pool = ThreadPool(self.nreaders)
+        bsz = self.be.bsz
+        mini_batch_in = self.mini_batch_in
+        mini_batch_out = self.mini_batch_out if self.outbuf is not None else None
+
+        def minibatch():
+            self.gen_input(mini_batch_in)
+            if mini_batch_out is not None:
+                self.gen_output(mini_batch_out)
+            inputs = self.inpbuf
+            if self.bm_inpbuf is not None:
+                self.be.to_batch_major(self.inpbuf, self.lshape, self.bm_inpbuf)
+                inputs = self.bm_inpbuf
+            return (inputs, self.outbuf)
+
+        # move past the blocks before the start of the epoch
+        blocks = self.epoch_blocks()
+        index, offset = 0, self.start + self.first * bsz
+        self.first = 0
+        while offset >= blocks[index][2] - blocks[index][1]:
+            offset -= blocks[index][2] - blocks[index][1]
+            index += 1
+
+        # blocks being read, keeping every reader busy
+        pending = deque()
+        nahead = 2 * self.nreaders
+        filled = 0
+        for i in range(index, len(blocks)):
+            while len(pending) < nahead and i + len(pending) < len(blocks):
+                pending.append(self.pool.apply_async(self.read_block,
+                                                     (blocks[i + len(pending)],)))
+            x, y = pending.popleft().get()
+            while offset < len(x):
+                n = min(bsz - filled, len(x) - offset)
+                mini_batch_in[:, filled:filled + n] = x[offset:offset + n].T
+                if mini_batch_out is not None:
+                    mini_batch_out[:, filled:filled + n] = y[offset:offset + n].T
+                filled += n
+                offset += n
+                if filled == bsz:
+                    filled = 0
+                    yield minibatch()
+            offset = 0
+
+        self.start = 0
+        if filled > 0:
+            # the last minibatch wraps around to the start of the epoch
+            self.start = bsz - filled
+            i = 0
+            while filled < bsz:
+                x, y = self.read_block(blocks[i])
+                n = min(bsz - filled, len(x))
+                mini_batch_in[:, filled:filled + n] = x[:n].T
+                if mini_batch_out is not None:
+                    mini_batch_out[:, filled:filled + n] = y[:n].T
+                filled += n
+                i += 1
+            yield minibatch()
+        # the next epoch draws a new order
+        self.seed = None
+
+    def cleanup(self):
+        """
+        Closes the HDF files and stops the reader threads.
+        """
+        if getattr(self, 'pool', None) is not None:
+            self.pool.terminate()
+            self.pool = None
+        for f in getattr(self, 'hdf_files', []):
+            f.close()
+
 
 class HDF5IteratorOneHot(HDF5Iterator):
     """
@@ -264,13 +754,24 @@ class HDF5IteratorOneHot(HDF5Iterator):
     attribute specifying the number of total output classes which is needed
     for generating the one-hot encoding.
     """
-    def __init__(self, hdf_filename, name=None):
+    def __init__(self, hdf_filename, name=None, block_batches=None, cache_blocks=2,
+                 shuffle=False, memmap=False):
         """
         Args:
             hdf_filename (string): Path to the HDF5 datafile.
             name (string, optional): Name to assign this iterator. Defaults to None.
+            block_batches (int, optional): Read the input in chunk aligned blocks of at
+                                           least this many minibatches. Defaults to None.
+            cache_blocks (int, optional): Number of blocks kept in memory when reading
+                                          in blocks, and blocks in the shuffle buffer.
+                                          Defaults to 2.
+            shuffle (bool, optional): Shuffle the examples each epoch. Defaults to False.
+            memmap (bool, optional): Memory map the input if contiguous. Defaults to False.
         """
-        super(HDF5IteratorOneHot, self).__init__(hdf_filename, name=name)
+        super(HDF5IteratorOneHot, self).__init__(hdf_filename, name=name,
+                                                 block_batches=block_batches,
+                                                 cache_blocks=cache_blocks,
+                                                 shuffle=shuffle, memmap=memmap)
         if 'output' in self.hdf_file:
             assert 'nclass' in self.hdf_file['output'].attrs, 'Missing nclass attribute'
             self.nclass = int(self.hdf_file['output'].attrs['nclass'])
@@ -288,6 +789,17 @@ class HDF5IteratorOneHot(HDF5Iterator):
         self.be.onehot(self.argmax_buf, axis=0, out=self.outbuf)
 
 
+class ShardedHDF5IteratorOneHot(ShardedHDF5Iterator, HDF5IteratorOneHot):
+    """
+    ShardedHDF5Iterator with one hot conversion of the target data, see
+    HDF5IteratorOneHot.  The output datasets must have the 'nclass' attribute.
+    """
+    def __init__(self, shards, **kwargs):
+        super(ShardedHDF5IteratorOneHot, self).__init__(shards, **kwargs)
+        if self.outs is not None:
+            assert hasattr(self, 'nclass'), 'Missing nclass attribute'
+
+
 class HDF5IteratorAutoencoder(HDF5Iterator):
     """
     Extends the base HDF5Iterator class for an autoencoder model.
@@ -301,4 +813,5 @@ class HDF5IteratorAutoencoder(HDF5Iterator):
             tuple: The next minibatch containing the inputs and the targets (here target=inputs)
         """
         for x, t in super(HDF5IteratorAutoencoder, self).__iter__():
-            yield (x, x)
+            # the targets are compared to the model outputs in the (feature, batch) layout
+            yield (x, self.inpbuf)
@@ -0,0 +1,329 @@
+# ----------------------------------------------------------------------------
+# Copyright 2016 Nervana Systems Inc.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ----------------------------------------------------------------------------
+"""
+Write datasets in the HDF5 layout read by HDF5Iterator.
+"""
+import csv
+import logging
+import os
+from collections import deque
+from glob import glob
+from itertools import islice
+from multiprocessing import Pool, cpu_count
+
+import h5py
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class HDF5Writer(object):
+    """
+    Writes examples to an HDF5 file in the layout read by HDF5Iterator: an `input`
+    dataset with the `lshape` attribute, an optional `output` dataset (with the
+    `nclass` attribute for class labels) and an optional `mean` dataset.  For example::
+
+        with HDF5Writer('train.h5', lshape=(3, 32, 32), nclass=10) as writer:
+            for X, y in blocks:
+                writer.write(X, y)
+
+    The examples are appended as they are written, so only the block being written is
+    held in memory.  The datasets are chunked in whole minibatches of `batch_size`
+    examples, the minibatches read by the iterator then map to whole chunks.  The mean
+    of the inputs is accumulated as they are written and saved when the writer is
+    closed.
+    """
+
+    def __init__(self, filename, lshape, nclass=None, batch_size=128, chunk_batches=1,
+                 mean='image', dtype=None):
+        """
+        Args:
+            filename (str): path of the HDF5 file to write
+            lshape (tuple): shape of an input example, e.g. (channels, height, width)
+            nclass (int, optional): number of classes of the outputs, which are then
+                                    written as integer labels. Defaults to None.
+            batch_size (int, optional): minibatch size of the training the file is for.
+                                        Defaults to 128.
+            chunk_batches (int, optional): number of minibatches in a chunk. Defaults to 1.
+            mean (str or ndarray, optional): 'image' to save the mean input, 'channel' the
+                                             mean of each channel, an array to save as the
+                                             mean (e.g. that of the training set), or None.
+                                             Defaults to 'image'.
+            dtype (data-type, optional): type of the input dataset. Defaults to the type of
+                                         the first examples written.
+        """
+        assert isinstance(mean, np.ndarray) or mean in ('image', 'channel', None), \
+            "mean must be 'image', 'channel', None or an array"
+        self.filename = filename
+        self.lshape = tuple(lshape)
+        self.nfeatures = int(np.prod(self.lshape))
+        self.nclass = nclass
+        self.chunk_rows = batch_size * chunk_batches
+        self.mean = mean
+        self.dtype = dtype
+        self.ndata = 0
+        self.sum = np.zeros(self.nfeatures, dtype=np.float64)
+        self.hdf_file = h5py.File(filename, 'w')
+        self.inp = None
+        self.out = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def create_dataset(self, name, nfeatures, dtype):
+        """
+        Create an extensible dataset chunked in whole minibatches.
+        """
+        return self.hdf_file.create_dataset(name, (0, nfeatures), dtype=dtype,
+                                            maxshape=(None, nfeatures),
+                                            chunks=(self.chunk_rows, nfeatures))
+
+    def write(self, X, y=None):
+        """
+        Append examples to the file.
+
+        Arguments:
+            X (ndarray): (# examples, # features) inputs, the features in the order of
+                         lshape
+            y (ndarray, optional): outputs of the examples, class labels if nclass is
+                                   set. Must be given for every write or none.
+        """
+        X = np.asarray(X).reshape((len(X), -1))
+        assert X.shape[1] == self.nfeatures, \
+            "product of lshape {} does not match input feature size".format(self.lshape)
+        if self.inp is None:
+            self.inp = self.create_dataset('input', self.nfeatures, self.dtype or X.dtype)
+            self.inp.attrs['lshape'] = self.lshape
+            if y is not None:
+                y = np.asarray(y).reshape((len(X), -1))
+                self.out = self.create_dataset('output', y.shape[1],
+                                               np.int32 if self.nclass else y.dtype)
+                if self.nclass:
+                    self.out.attrs['nclass'] = self.nclass
+        assert (y is None) == (self.out is None), "outputs must be written for all examples"
+
+        n1, n2 = self.ndata, self.ndata + len(X)
+        self.inp.resize(n2, axis=0)
+        self.inp[n1:n2] = X
+        if y is not None:
+            y = np.asarray(y).reshape((len(X), -1))
+            self.out.resize(n2, axis=0)
+            self.out[n1:n2] = y
+        if self.mean in ('image', 'channel'):
+            self.sum += X.sum(axis=0, dtype=np.float64)
+        self.ndata = n2
+
+    def close(self):
+        """
+        Write the mean and close the file.
+
+        Returns:
+            ndarray: mean written, or None
+        """
+        if self.hdf_file is None:
+            return None
+        mean = None
+        if isinstance(self.mean, np.ndarray):
+            mean = self.mean
+        elif self.mean is not None and self.ndata > 0:
+            mean = self.sum / self.ndata
+            if self.mean == 'channel':
+                mean = mean.reshape((self.lshape[0], -1)).mean(axis=1)
+        if mean is not None:
+            mean = mean.reshape((-1, 1)).astype(np.float32)
+            self.hdf_file.create_dataset('mean', data=mean)
+        self.hdf_file.close()
+        self.hdf_file = None
+        logger.info('Wrote %d examples to %s', self.ndata, self.filename)
+        return mean
+
+
+def write_arrays(filename, X, y=None, lshape=None, block_rows=4096, **kwargs):
+    """
+    Write arrays of examples (e.g. memory mapped .npy files) to an HDF5 file, a block of
+    examples at a time.
+
+    Arguments:
+        filename (str): path of the HDF5 file to write
+        X (ndarray): (# examples, # features) inputs
+        y (ndarray, optional): outputs of the examples
+        lshape (tuple, optional): shape of an input example, defaults to (# features,)
+        block_rows (int, optional): number of examples read from the arrays at a time
+        kwargs: other arguments of HDF5Writer (e.g. nclass, batch_size, mean)
+
+    Returns:
+        ndarray: mean written, or None
+    """
+    lshape = lshape if lshape is not None else (int(np.prod(X.shape[1:])),)
+    with HDF5Writer(filename, lshape, **kwargs) as writer:
+        for i1 in range(0, len(X), block_rows):
+            i2 = min(i1 + block_rows, len(X))
+            writer.write(X[i1:i2], None if y is None else y[i1:i2])
+        return writer.close()
+
+
+def write_csv(filename, csv_path, lshape=None, label_column=None, block_rows=4096,
+              delimiter=',', skip_header=False, nworkers=None, **kwargs):
+    """
+    Write the rows of a CSV file of numbers to an HDF5 file.  Blocks of rows are parsed
+    by a pool of processes, a few blocks ahead of the block being written.
+
+    Arguments:
+        filename (str): path of the HDF5 file to write
+        csv_path (str): path of the CSV file, one example per row
+        lshape (tuple, optional): shape of an input example, defaults to (# features,)
+        label_column (int, optional): column of the output of the examples, written as
+                                      an integer label if nclass is given. Defaults to
+                                      None, no outputs.
+        block_rows (int, optional): number of rows parsed at a time
+        delimiter (str, optional): column separator. Defaults to ','.
+        skip_header (bool, optional): skip the first row. Defaults to False.
+        nworkers (int, optional): number of processes. Defaults to the number of CPUs.
+        kwargs: other arguments of HDF5Writer (e.g. nclass, batch_size, mean)
+
+    Returns:
+        ndarray: mean written, or None
+    """
+    nahead = 2 * (nworkers or cpu_count())
+    pool = Pool(nworkers)
+    writer = None
+    try:
+        with open(csv_path) as f:
+            if skip_header:
+                next(f)
+            pending = deque()
+            lines = iter(f)
+            while True:
+                while len(pending) < nahead:
+                    block = list(islice(lines, block_rows))
+                    if len(block) == 0:
+                        break
+                    pending.append(pool.apply_async(
+                        _parse_csv_rows,
+                        ((block, delimiter, label_column, bool(kwargs.get('nclass'))),)))
+                if len(pending) == 0:
+                    break
+                parsed = pending.popleft().get()
+                if parsed is None:
+                    continue
+                data, y = parsed
+                if writer is None:
+                    lshape = lshape if lshape is not None else (data.shape[1],)
+                    writer = HDF5Writer(filename, lshape, **kwargs)
+                writer.write(data, y)
+    finally:
+        pool.terminate()
+    if writer is None:
+        raise IOError('No rows found in %s' % csv_path)
+    return writer.close()
+
+
+def _parse_csv_rows(args):
+    """
+    Parse a block of CSV lines, run by the processes of write_csv.
+
+    Arguments:
+        args (tuple): lines, column separator, column of the outputs (or None) and
+                      whether the outputs are integer labels
+
+    Returns:
+        tuple: (# rows, # features) inputs and the outputs (or None), None if the
+               block has no rows
+    """
+    lines, delimiter, label_column, labels = args
+    rows = [row for row in csv.reader(lines, delimiter=delimiter) if len(row) > 0]
+    if len(rows) == 0:
+        return None
+    data = np.array(rows, dtype=np.float32)
+    y = None
+    if label_column is not None:
+        y = data[:, label_column]
+        data = np.delete(data, label_column, axis=1)
+        if labels:
+            y = y.astype(np.int32)
+    return data, y
+
+
+def _load_image(args):
+    """
+    Decode an image file and resize it, run by the processes of write_image_dir.
+
+    Arguments:
+        args (tuple): path of the image, (height, width) to resize to and number of
+                      channels (1 or 3)
+
+    Returns:
+        ndarray: flattened (channel, height, width) pixels
+    """
+    from PIL import Image
+    path, (height, width), channels = args
+    im = Image.open(path).convert('L' if channels == 1 else 'RGB')
+    if im.size != (width, height):
+        im = im.resize((width, height), Image.BILINEAR)
+    im = np.asarray(im, dtype=np.uint8).reshape((height, width, channels))
+    return np.transpose(im, (2, 0, 1)).flatten()
+
+
+def write_image_dir(filename, image_dir, target_size, channels=3, file_pattern='*.jpg',
+                    nworkers=None, block_rows=1024, **kwargs):
+    """
+    Write the images of a directory to an HDF5 file, the images of each class in a
+    subdirectory named after the class.  The images are decoded and resized by a pool
+    of processes and written a block at a time, as uint8 (channel, height, width)
+    inputs with the index of the class of each image (in sorted order of the
+    subdirectories) as its output.
+
+    Arguments:
+        filename (str): path of the HDF5 file to write
+        image_dir (str): directory of the class subdirectories
+        target_size (tuple): (height, width) the images are resized to
+        channels (int, optional): 3 for color or 1 for grayscale. Defaults to 3.
+        file_pattern (str, optional): pattern of the image file names. Defaults to '*.jpg'.
+        nworkers (int, optional): number of processes. Defaults to the number of CPUs.
+        block_rows (int, optional): number of images written at a time
+        kwargs: other arguments of HDF5Writer (e.g. batch_size, mean)
+
+    Returns:
+        list: class names, in the order of their labels
+    """
+    image_dir = os.path.expanduser(image_dir)
+    classes = sorted(d for d in os.listdir(image_dir)
+                     if os.path.isdir(os.path.join(image_dir, d)))
+    files = [(path, label) for label, cls in enumerate(classes)
+             for path in sorted(glob(os.path.join(image_dir, cls, file_pattern)))]
+    if len(files) == 0:
+        raise IOError('No images found in %s' % image_dir)
+    tasks = [(path, tuple(target_size), channels) for path, _ in files]
+    labels = np.array([label for _, label in files], dtype=np.int32)
+
+    lshape = (channels,) + tuple(target_size)
+    pool = Pool(nworkers)
+    try:
+        with HDF5Writer(filename, lshape, nclass=len(classes), dtype=np.uint8,
+                        **kwargs) as writer:
+            block = []
+            for im in pool.imap(_load_image, tasks, chunksize=16):
+                block.append(im)
+                if len(block) == block_rows:
+                    writer.write(np.stack(block), labels[writer.ndata:writer.ndata + len(block)])
+                    block = []
+            if len(block) > 0:
+                writer.write(np.stack(block), labels[writer.ndata:writer.ndata + len(block)])
+    finally:
+        pool.terminate()
+    return classes
@@ -14,15 +14,94 @@
 # ----------------------------------------------------------------------------
 
 from collections import Counter
+import copy
 import numpy as np
 import os
 
-from neon import logger as neon_logger
+from neon import NervanaObject, logger as neon_logger
 from neon.data.dataiterator import NervanaDataIterator
 from neon.data.datasets import Dataset
+from neon.layers.container import MergeMultistream, Sequential
+from neon.layers.recurrent import Recurrent
+from neon.util.beamsearch import beam_search
 from neon.util.compat import xrange
 
 
+def _step_copy(layer):
+    """
+    Make a shallow copy of a configured layer that shares the parameters of the
+    original but will get its own buffers when configured and allocated again.
+    """
+    step = copy.copy(layer)
+    for attr in ('outputs', 'inputs', 'deltas', 'x', 'y', 'in_deltas', 'outputs_t',
+                 'prev_layer', 'next_layer'):
+        if hasattr(step, attr):
+            setattr(step, attr, None)
+    if isinstance(step, Recurrent):
+        # state is carried across steps and cleared explicitly by the decoder
+        step.reset_cells = False
+    return step
+
+
+class CaptionDecoder(NervanaObject):
+    """
+    Single time step view of a trained image captioning model.
+
+    The model is expected to have the layout built by ``examples/image_caption.py``:
+    a MergeMultistream with a recurrent merge of an image path and a sentence path,
+    followed by the recurrent and output layers.  The layers following the merge and
+    the sentence path are copied so that they process one time step of the minibatch
+    per fprop call while sharing the weights of the model.  The hidden and cell
+    states of the recurrent layers are kept between calls, so decoding a sentence
+    of length L costs L single step fprops instead of L full unrolls.
+
+    Arguments:
+        model (Model): Trained image captioning model.
+    """
+
+    def __init__(self, model, name=None):
+        super(CaptionDecoder, self).__init__(name)
+        merge = model.layers.layers[0]
+        assert isinstance(merge, MergeMultistream) and merge.merge == "recurrent", \
+            "Caption model must start with a recurrent MergeMultistream"
+        self.image_path, sent_path = merge.layers
+
+        self.word_path = Sequential([_step_copy(l) for l in sent_path.layers])
+        self.word_path.configure((sent_path.in_shape[0], 1))
+        self.word_path.allocate()
+
+        self.rnn_path = Sequential([_step_copy(l) for l in model.layers.layers[1:]])
+        self.rnn_path.configure((merge.out_shape[0], 1))
+        self.rnn_path.allocate()
+
+        self.step_in = self.be.iobuf(merge.out_shape[0])
+        self.states = [buf for l in self.rnn_path.layers if isinstance(l, Recurrent)
+                       for buf in l.bufs_to_reset]
+
+    def reset(self):
+        """
+        Clear the recurrent states before decoding a new minibatch of sentences.
+        """
+        for buf in self.states:
+            buf[:] = 0
+
+    def step(self, inputs, image=False):
+        """
+        Advance the model by one time step.
+
+        Arguments:
+            inputs (Tensor): image features (image_size, batch_size) for the first step
+                             or one hot words (vocab_size, batch_size) afterwards.
+            image (bool, optional): True if inputs are the image features.
+
+        Returns:
+            Tensor: word probabilities of shape (vocab_size, batch_size)
+        """
+        path = self.image_path if image else self.word_path
+        self.step_in[:] = path.fprop(inputs, inference=True)
+        return self.rnn_path.fprop(self.step_in, inference=True)
+
+
 class ImageCaption(NervanaDataIterator):
     """
     This class loads in the sentences and CNN image features for image captioning
@@ -197,17 +276,27 @@ class ImageCaption(NervanaDataIterator):
         Returns:
             list containing sentences
         """
-
-        sents = []
-
         if not isinstance(prob, np.ndarray):
             prob = prob.get()
-        words = [self.index_to_vocab[x] for x in np.argmax(prob, axis=0).tolist()]
+        return self.idx_to_sents(np.argmax(prob, axis=0).reshape((-1, self.be.bsz)))
+
+    def idx_to_sents(self, words):
+        """
+        Convert word indices to sentences.
 
-        for sent_index in xrange(self.be.bsz):
+        Args:
+            words (ndarray): Word indices of shape (steps, batch_size), row i holds
+                             the i-th word of each sentence.
+
+        Returns:
+            list containing sentences
+        """
+        sents = []
+        steps = min(words.shape[0], self.max_sentence_length)
+        for sent_index in xrange(words.shape[1]):
             sent = []
-            for i in xrange(self.max_sentence_length):
-                word = words[self.be.bsz * i + sent_index]
+            for i in xrange(steps):
+                word = self.index_to_vocab[int(words[i, sent_index])]
                 sent.append(word)
                 if (i > 0 and word == self.end_token) or i >= 20:
                     break
@@ -215,30 +304,26 @@ class ImageCaption(NervanaDataIterator):
 
         return sents
 
-    def predict(self, model):
+    def predict(self, model, beam_size=1):
         """
         Given a model, generate sentences from this dataset.
 
+        Sentences are generated incrementally, running the recurrent layers one time
+        step per word with their state carried over from the previous word.
+
         Args:
             model (Model): Image captioning model.
+            beam_size (int, optional): Number of hypotheses kept for each image.
+                                       Defaults to 1 (greedy decoding).
 
         Returns:
             list, list containing predicted sentences and target sentences
         """
         sents = []
         targets = []
-        y = self.be.zeros(self.dev_X.shape)
+        decoder = CaptionDecoder(model)
         for mb_idx, (x, t) in enumerate(self):
-            y.fill(0)
-            # Repeatedly generate next word in sentence and choose max prob word each time.
-            for step in range(1, self.max_sentence_length + 1):
-                prob = model.fprop((x[0], y), inference=True).get()[:, :-self.be.bsz].copy()
-                pred = np.argmax(prob, axis=0)
-                prob.fill(0)
-                for i in range(step * self.be.bsz):
-                    prob[pred[i], i] = 1
-                y[:] = prob
-            sents += self.prob_to_word(y)
+            sents += self.idx_to_sents(self.decode(decoder, x[0], beam_size))
             # Test set, keep list of targets
             if isinstance(self, ImageCaptionTest):
                 targets += t[0]
@@ -248,6 +333,65 @@ class ImageCaption(NervanaDataIterator):
 
         return sents, targets
 
+    def decode(self, decoder, image, beam_size=1):
+        """
+        Generate the words of one minibatch of captions.
+
+        Args:
+            decoder (CaptionDecoder): Single step view of the captioning model.
+            image (Tensor): Image features of shape (image_size, batch_size).
+            beam_size (int, optional): Number of hypotheses kept for each image.
+                                       Defaults to 1 (greedy decoding).
+
+        Returns:
+            ndarray: word indices of shape (max_sentence_length, batch_size)
+        """
+        if beam_size > 1:
+            return self._beam_search(decoder, image, beam_size)
+        return self._greedy_search(decoder, image)
+
+    def _greedy_search(self, decoder, image):
+        """
+        Pick the most likely word at every step.  Argmax and one hot conversion of
+        the chosen words stay on the backend, the words are fetched once at the end.
+        """
+        words = self.be.empty((self.max_sentence_length, self.be.bsz), dtype=np.int32)
+        word = self.be.iobuf(1, dtype=np.int32)
+        onehot = self.be.iobuf(self.vocab_size)
+
+        decoder.reset()
+        prob = decoder.step(image, image=True)
+        for step in xrange(self.max_sentence_length):
+            if step > 0:
+                prob = decoder.step(onehot)
+            word[:] = self.be.argmax(prob, axis=0)
+            words[step] = word
+            onehot[:] = self.be.onehot(word, axis=0)
+
+        return words.get()
+
+    def _beam_search(self, decoder, image, beam_size):
+        """
+        Keep the beam_size most likely partial sentences for each image, see
+        neon.util.beamsearch.beam_search.  Each step runs one single step fprop per
+        hypothesis, so the cost is beam_size times the cost of greedy decoding.
+        """
+        word = self.be.iobuf(1, dtype=np.int32)
+        onehot = self.be.iobuf(self.vocab_size)
+
+        def step(prev):
+            if prev is None:
+                return decoder.step(image, image=True)
+            word.set(prev[np.newaxis, :])
+            onehot[:] = self.be.onehot(word, axis=0)
+            return decoder.step(onehot)
+
+        decoder.reset()
+        # the sentences start with the end token
+        return beam_search(self.be, step, decoder.states, self.vocab_size, beam_size,
+                           self.max_sentence_length,
+                           end_index=self.vocab_to_index[self.end_token], end_after=1)
+
     def bleu_score(self, sents, targets):
         """
         Compute the BLEU score from a list of predicted sentences and reference sentences
@@ -0,0 +1,271 @@
+# ----------------------------------------------------------------------------
+# Copyright 2016 Nervana Systems Inc.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ----------------------------------------------------------------------------
+"""
+Prefetching wrapper for data iterators.
+"""
+from future import standard_library
+standard_library.install_aliases()  # triggers E402, hence noqa below
+import logging  # noqa
+import numpy as np  # noqa
+import queue  # noqa
+import threading  # noqa
+
+from neon.backends.backend import Tensor  # noqa
+from neon.data.dataiterator import NervanaDataIterator  # noqa
+
+logger = logging.getLogger(__name__)
+
+
+def _flatten(batch, leaves):
+    """
+    Collect the tensors of a (possibly nested) minibatch tuple into leaves and return
+    the structure of the minibatch, with the tensors replaced by their index in leaves.
+    """
+    if isinstance(batch, Tensor):
+        leaves.append(batch)
+        return len(leaves) - 1
+    if isinstance(batch, (tuple, list)):
+        return type(batch)(_flatten(x, leaves) for x in batch)
+    return _Other(batch)
+
+
+def _unflatten(struct, leaves):
+    """
+    Inverse of _flatten, rebuild a minibatch from its structure and tensors.
+    """
+    if isinstance(struct, int):
+        return leaves[struct]
+    if isinstance(struct, _Other):
+        return struct.value
+    return type(struct)(_unflatten(x, leaves) for x in struct)
+
+
+class _Other(object):
+    """
+    Placeholder for the minibatch items that are not tensors (e.g. reference sentences),
+    which are passed through as they are.
+    """
+    def __init__(self, value):
+        self.value = value
+
+
+class PrefetchIterator(NervanaDataIterator):
+    """
+    Wraps a data iterator to assemble its minibatches on a background thread while the
+    model computes on the previous ones.  For example::
+
+        train = PrefetchIterator(HDF5Iterator('train.h5'), depth=4)
+
+    The thread runs the wrapped iterator ahead by up to `depth` minibatches and copies
+    each one to one of `depth` host staging buffers, since the wrapped iterator reuses
+    its tensors.  The staging buffers are allocated once and reused across epochs.
+    The minibatches are then copied to two sets of device tensors in turn, so the
+    minibatch yielded last stays valid while the next one is loaded.
+
+    The wrapped iterator is only used from the background thread while an epoch is
+    running, attributes it updates as it goes (e.g. a batch index) run ahead of the
+    minibatch being computed.  Other attributes (e.g. shape, ndata) are those of the
+    wrapped iterator.
+    """
+
+    def __init__(self, dataset, depth=2, name=None):
+        """
+        Args:
+            dataset (NervanaDataIterator): iterator to prefetch the minibatches of
+            depth (int, optional): number of host staging buffers, the most minibatches
+                                   loaded ahead of the one being computed
+            name (str, optional): name of the iterator
+        """
+        super(PrefetchIterator, self).__init__(name=name)
+        assert depth >= 1, "depth must be at least 1"
+        self.dataset = dataset
+        self.depth = depth
+        self.devbufs = [None, None]
+        self.staging = [None] * depth
+        self.thread = None
+        self.stop = None
+
+    def __getattr__(self, name):
+        # only called for the attributes not found on the wrapper
+        if name == 'dataset':
+            raise AttributeError(name)
+        return getattr(self.dataset, name)
+
+    @property
+    def nbatches(self):
+        """
+        Return the number of minibatches of the wrapped iterator.
+        """
+        return self.dataset.nbatches
+
+    @property
+    def ndata(self):
+        """
+        Return the number of examples of the wrapped iterator.
+        """
+        return self.dataset.ndata
+
+    def reset(self):
+        """
+        Stop loading ahead and reset the wrapped iterator.
+        """
+        self._join()
+        self.dataset.reset()
+
+    def get_state(self):
+        """
+        Get the state of the wrapped iterator at the start of an epoch.
+
+        Returns:
+            dict: iterator state, restored with set_state
+        """
+        return self.dataset.get_state()
+
+    def set_state(self, state):
+        """
+        Restore the state returned by get_state.
+
+        Arguments:
+            state (dict): iterator state
+        """
+        self._join()
+        self.dataset.set_state(state)
+
+    def skip(self, nbatches):
+        """
+        Move the wrapped iterator past the first minibatches of the epoch.
+
+        Arguments:
+            nbatches (int): number of minibatches to skip
+
+        Returns:
+            bool: whether the wrapped iterator could skip them
+        """
+        self._join()
+        return self.dataset.skip(nbatches)
+
+    def shard(self, rank, world_size, seed=0, epoch=0):
+        """
+        Shard the wrapped iterator, see NervanaDataIterator.shard.
+        """
+        self._join()
+        self.dataset.shard(rank, world_size, seed=seed, epoch=epoch)
+
+    def _load(self, full, free, stop):
+        """
+        Body of the background thread, puts the host copies of the minibatches of the
+        wrapped iterator in full, taking the index of a staging buffer from free for each.
+        """
+        ctx = getattr(self.be, 'ctx', None)
+        if ctx is not None:
+            # device copies need the context of the backend in this thread
+            ctx.push()
+        try:
+            for batch in self.dataset:
+                index = free.get()
+                if index is None or stop.is_set():
+                    return
+                leaves = []
+                struct = _flatten(batch, leaves)
+                full.put((struct, index, self._to_host(index, leaves)))
+            full.put(None)
+        except Exception as e:
+            logger.exception("Prefetching a minibatch failed")
+            full.put(e)
+        finally:
+            if ctx is not None:
+                ctx.pop()
+
+    def _join(self):
+        """
+        Stop the background thread of an epoch that was not iterated to its end.
+        """
+        if self.thread is None:
+            return
+        self.stop.set()
+        # the thread may be waiting for a staging buffer
+        self.free.put(None)
+        while self.thread.is_alive():
+            try:
+                self.full.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        self.thread.join()
+        self.thread = None
+
+    def _to_host(self, index, leaves):
+        """
+        Copy tensors to the host arrays of staging buffer index, allocating them the first
+        time or if the minibatch shapes changed.
+        """
+        bufs = self.staging[index]
+        if bufs is None or len(bufs) != len(leaves) or \
+                any(b.shape != x.shape or b.dtype != x.dtype for b, x in zip(bufs, leaves)):
+            bufs = [np.empty(x.shape, dtype=x.dtype) for x in leaves]
+            self.staging[index] = bufs
+        for b, x in zip(bufs, leaves):
+            x.get(out=b)
+        return bufs
+
+    def _to_device(self, index, host):
+        """
+        Copy host arrays to the device tensors of buffer set index, allocating them the
+        first time or if the minibatch shapes changed.
+        """
+        bufs = self.devbufs[index]
+        if bufs is None or len(bufs) != len(host) or \
+                any(b.shape != h.shape or b.dtype != h.dtype for b, h in zip(bufs, host)):
+            bufs = [self.be.array(h, dtype=h.dtype) for h in host]
+            self.devbufs[index] = bufs
+        else:
+            for b, h in zip(bufs, host):
+                b.set(h)
+        return bufs
+
+    def __iter__(self):
+        """
+        Yields the minibatches of the wrapped iterator, loaded on a background thread.
+
+        Yields:
+            tuple: The next minibatch of the wrapped iterator.
+        """
+        self._join()
+        self.full, self.free = queue.Queue(), queue.Queue()
+        for index in range(self.depth):
+            self.free.put(index)
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self._load, args=(self.full, self.free, self.stop),
+                                       name="neon-prefetch")
+        self.thread.daemon = True
+        self.thread.start()
+
+        try:
+            index = 0
+            while True:
+                item = self.full.get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                struct, staged, host = item
+                leaves = self._to_device(index, host)
+                # the staging buffer is free once copied to the device
+                self.free.put(staged)
+                yield _unflatten(struct, leaves)
+                index = 1 - index
+            self.thread.join()
+            self.thread = None
+        finally:
+            self._join()
@@ -21,6 +21,7 @@ from operator import add
 from neon import NervanaObject
 from neon.layers.layer import Layer, BranchNode, Dropout, DataTransform, LookupTable
 from neon.layers.recurrent import Recurrent, get_steps
+from neon.util.beamsearch import beam_search
 from neon.util.persist import load_class
 from functools import reduce
 
@@ -236,6 +237,9 @@ class Sequential(LayerContainer):
         layers (list): List of objects which can be either a list of layers
                        (including layer containers).
     """
+
+    supports_batch_major = True
+
     def __init__(self, layers, name=None):
         super(Sequential, self).__init__(name)
 
@@ -908,6 +912,8 @@ class RoiPooling(Sequential):
     the following layers will allocate buffers accordingly.
     """
 
+    supports_batch_major = False
+
     def __init__(self, layers, bprop_enabled=False, HW=(7, 7),
                  spatial_scale=0.0625, name=None):
         if layers:
@@ -1258,6 +1264,8 @@ class Decoder(Sequential):
             for l in self.layers:
                 if l.owns_output:
                     l.outputs = None
+                if isinstance(l, LookupTable):
+                    l.inputs = l.outputs_t = None
             self.allocate(shared_outputs=None)  # re-allocate deltas, but not weights
             for l in self.layers:
                 l.name += "'"
@@ -1446,6 +1454,109 @@ class Seq2Seq(LayerContainer):
 
         return x
 
+    def generate(self, inputs, num_steps=None, beam_size=1, end_index=None):
+        """
+        Generate output sequences for one minibatch of inputs one token at a time.
+
+        The encoder is run once and its final states start the decoder, which is
+        then advanced a single time step per generated token.  Unlike the inference
+        fprop, the chosen token (rather than the output distribution) is fed back as
+        the next decoder input.
+
+        Arguments:
+            inputs (Tensor): Encoder input for one minibatch.
+            num_steps (int, optional): Maximum number of tokens to generate.
+                                       Defaults to the decoder sequence length.
+            beam_size (int, optional): Number of hypotheses kept for each sequence.
+                                       Defaults to 1 (greedy decoding).
+            end_index (int, optional): Token that terminates a sequence.  Once a
+                                       sequence produced it the remaining positions are
+                                       filled with end_index, and generation stops when
+                                       every sequence of the minibatch has ended.
+
+        Returns:
+            numpy.ndarray: token indices of shape (num_steps, batch_size)
+        """
+        self.decoder.switch_mode(inference=True)
+        if num_steps is None:
+            num_steps = self.decoder.full_steps
+
+        self.encoder.fprop(inputs, inference=True, beta=0.0)
+        init_state_list = self.encoder.get_final_states(self.decoder_connections)
+
+        if beam_size > 1:
+            tokens = self._beam_search(init_state_list, num_steps, beam_size, end_index)
+        else:
+            tokens = self._greedy_search(init_state_list, num_steps, end_index)
+
+        self.revert_tensors()
+        return tokens
+
+    def _decoder_input(self):
+        """
+        Decoder input buffer for a single time step, zero for the first step.
+        """
+        if self.hasLUT:
+            return self.be.iobuf(1)
+        return self.be.iobuf((self.out_shape[0], 1))
+
+    def _set_decoder_input(self, z, token):
+        if self.hasLUT:
+            z[:] = token
+        else:
+            z[:] = self.be.onehot(token, axis=0)
+
+    def _greedy_search(self, init_state_list, num_steps, end_index):
+        """
+        Pick the most likely token at every step.
+        """
+        bsz = self.be.bsz
+        z = self._decoder_input()
+        token = self.be.iobuf(1, dtype=np.int32)
+        tokens = np.zeros((num_steps, bsz), dtype=np.int32)
+        finished = np.zeros(bsz, dtype=bool)
+
+        for t in range(num_steps):
+            y = self.decoder.fprop(z, inference=True, init_state_list=init_state_list)
+            init_state_list = [recurrent.final_state() for recurrent in self.decoder._recurrent]
+
+            token[:] = self.be.argmax(y, axis=0)
+            tokens[t] = token.get()
+
+            if end_index is not None:
+                tokens[t, finished] = end_index
+                finished |= tokens[t] == end_index
+                if finished.all():
+                    tokens[t + 1:] = end_index
+                    break
+
+            self._set_decoder_input(z, token)
+
+        return tokens
+
+    def _beam_search(self, init_state_list, num_steps, beam_size, end_index):
+        """
+        Keep the beam_size most likely partial sequences for each input, see
+        neon.util.beamsearch.beam_search.
+        """
+        recurrent = self.decoder._recurrent
+        # final state (used as init_state of the next step) and cell state if any
+        live = [[l.final_state_buffer] + l.bufs_to_reset[1:] for l in recurrent]
+        live = [buf for bufs in live for buf in bufs]
+        z = self._decoder_input()
+        token = self.be.iobuf(1, dtype=np.int32)
+
+        def step(prev):
+            init = init_state_list
+            if prev is not None:
+                init = [l.final_state_buffer for l in recurrent]
+                token.set(prev[np.newaxis, :])
+                self._set_decoder_input(z, token)
+            return self.decoder.fprop(z, inference=True, init_state_list=init)
+
+        return beam_search(self.be, step, live, self.out_shape[0], beam_size, num_steps,
+                           end_index)
+
     def bprop(self, error, inference=False, alpha=1.0, beta=0.0):
         """
         Backpropagation for sequence to sequence container. Calls Decoder container
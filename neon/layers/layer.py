@@ -20,6 +20,7 @@ import numpy as np
 from neon import NervanaObject
 from neon.backends import Autodiff
 from neon.backends.backend import Tensor
+from neon.transforms import Identity, Rectlin, Explin
 
 
 logger = logging.getLogger(__name__)
@@ -52,6 +53,9 @@ class Layer(NervanaObject):
             distributed backends (see gen_backend for details).
     """
 
+    # layers that can keep their activations in the batch major layout
+    supports_batch_major = False
+
     def __init__(self, name=None, parallelism="Unknown"):
         super(Layer, self).__init__(name)
         self.outputs = None
@@ -95,6 +99,9 @@ class Layer(NervanaObject):
             in_obj (int, tuple, Layer, Tensor or dataset): object that provides shape
                                                            information for layer
         """
+        if self.be.batch_major and not self.supports_batch_major:
+            raise NotImplementedError("%s does not support the batch major layout" %
+                                      self.classnm)
         if isinstance(in_obj, Layer):
             self.prev_layer = in_obj
             self.in_shape = in_obj.out_shape
@@ -126,7 +133,8 @@ class Layer(NervanaObject):
             return
         if self.owns_output:
             self.outputs = self.be.iobuf(self.out_shape, shared=shared_outputs,
-                                         parallelism=self.parallelism)
+                                         parallelism=self.parallelism,
+                                         batch_major=self.be.batch_major)
 
     def allocate_deltas(self, global_deltas):
         global_deltas.proc_layer(self)
@@ -149,7 +157,8 @@ class Layer(NervanaObject):
                 self.deltas = self.prev_layer.deltas
             else:
                 self.deltas = self.be.iobuf(self.in_shape, shared=delta_buffers.buffers[0],
-                                            parallelism=self.parallelism)
+                                            parallelism=self.parallelism,
+                                            batch_major=self.be.batch_major)
                 delta_buffers.buffers.reverse()
         else:
             self.deltas = None
@@ -437,6 +446,8 @@ class Pooling(Layer):
         name (str, optional): layer name. Defaults to "PoolingLayer"
     """
 
+    supports_batch_major = True
+
     def __init__(self, fshape, op="max", strides={}, padding={},
                  name=None):
         super(Pooling, self).__init__(name)
@@ -498,17 +509,16 @@ class Pooling(Layer):
             self.out_shape = (K, M, P, Q) if len(self.in_shape) == 4 else (K, P, Q)
         return self
 
-    def set_deltas(self, delta_buffers):
+    def allocate(self, shared_outputs=None):
         """
-        Use pre-allocated (by layer containers) list of buffers for backpropagated error.
-        Only set deltas for layers that own their own deltas
-        Only allocate space if layer owns its own deltas (e.g., bias and activation work in-place,
-        so do not own their deltas).
+        Allocate output buffer to store activations from fprop, and the locations of the
+        maxima for max pooling.
 
         Arguments:
-            delta_buffers (list): list of pre-allocated tensors (provided by layer container)
+            shared_outputs (Tensor, optional): pre-allocated tensor for activations to be
+                                               computed into
         """
-        super(Pooling, self).set_deltas(delta_buffers)
+        super(Pooling, self).allocate(shared_outputs)
         if self.op == "max":
             self.argmax = self.be.empty(self.outputs.shape, dtype=np.uint8)
         else:
@@ -639,7 +649,7 @@ class ParameterLayer(Layer):
     def set_params(self, pdict):
         """
         Set layer parameters (weights). Allocate space for other parameters but do not initialize
-        them.
+        them.  Parameters given as backend tensors are used without a copy.
 
         Arguments:
             pdict (dict, ndarray): dictionary or ndarray with layer parameters
@@ -655,7 +665,7 @@ class ParameterLayer(Layer):
                 # this attr has already been allocated
                 # get set the values
                 attr.set(pdict['params'][key])
-            elif type(pdict['params'][key]) is np.ndarray:
+            elif isinstance(pdict['params'][key], np.ndarray):
                 setattr(self, key, self.be.array(pdict['params'][key], **self.get_param_attrs()))
             else:
                 setattr(self, key, pdict['params'][key])
@@ -668,6 +678,8 @@ class ParameterLayer(Layer):
             # if states was not serialized then leave
             # this empty, the optimizer will initialize it
             self.states = []
+        elif not self.states and all(isinstance(s, Tensor) for s in pdict['states']):
+            self.states = list(pdict['states'])
         else:
             # this needs to be done in two steps for MGPU backend
             if self.states is None or len(self.states) == 0:
@@ -696,10 +708,17 @@ class Convolution(ParameterLayer):
         init (Initializer, optional): Initializer object to use for
             initializing layer weights
         name (str, optional): layer name. Defaults to "ConvolutionLayer"
+        groups (int, optional): number of groups to split the input and output
+            feature maps into.  Each output feature map is only connected to
+            the input feature maps of its group, groups equal to the number of
+            input feature maps gives a depthwise convolution.  Only supported
+            on the CPU backend.  Defaults to 1.
     """
 
+    supports_batch_major = True
+
     def __init__(self, fshape, strides={}, padding={}, init=None, bsum=False,
-                 name=None, parallelism="Data"):
+                 name=None, parallelism="Data", groups=1):
         super(Convolution, self).__init__(init, name, parallelism)
         self.nglayer = None
         self.bsum = bsum
@@ -711,6 +730,9 @@ class Convolution(ParameterLayer):
         self.fshape = fshape
         self.strides = strides
         self.padding = padding
+        self.groups = groups
+        if groups > 1:
+            self.convparams['groups'] = groups
 
         if isinstance(fshape, tuple) or isinstance(fshape, list):
             fkeys = ('R', 'S', 'K') if len(fshape) == 3 else ('T', 'R', 'S', 'K')
@@ -753,6 +775,9 @@ class Convolution(ParameterLayer):
         super(Convolution, self).configure(in_obj)
         if self.nglayer is None:
             assert isinstance(self.in_shape, tuple)
+            if self.groups > 1 and self.be.backend_name != 'cpu':
+                raise NotImplementedError("Grouped convolution is only supported "
+                                          "on the cpu backend")
             ikeys = ('C', 'H', 'W') if len(self.in_shape) == 3 else ('C', 'D', 'H', 'W')
             shapedict = {k: x for k, x in zip(ikeys, self.in_shape)}
             shapedict['N'] = self.be.bsz
@@ -934,6 +959,8 @@ class Linear(ParameterLayer):
         name (str, optional): Layer name. Defaults to "LinearLayer"
     """
 
+    supports_batch_major = True
+
     def __init__(self, nout, init, bsum=False, name=None, parallelism="Disabled"):
         super(Linear, self).__init__(init, name, parallelism)
         self.nout = nout
@@ -958,6 +985,8 @@ class Linear(ParameterLayer):
         """
         super(Linear, self).configure(in_obj)
         (self.nin, self.nsteps) = interpret_in_shape(self.in_shape)
+        assert self.nsteps == 1 or not self.be.batch_major, \
+            "Sequence inputs are not supported with the batch major layout"
         self.out_shape = (self.nout, self.nsteps)
         if self.weight_shape is None:
             self.weight_shape = (self.nout, self.nin)
@@ -978,7 +1007,14 @@ class Linear(ParameterLayer):
             Tensor: output data
         """
         self.inputs = inputs
-        if self.actual_bsz is None and self.actual_seq_len is None:
+        if self.be.batch_major:
+            # (N, nout) = (N, nin) . (nin, nout)
+            bsz = self.be.bsz if self.actual_bsz is None else self.actual_bsz
+            self.be.compound_dot(A=self.inputs[:bsz], B=self.W.T, C=self.outputs[:bsz],
+                                 beta=beta)
+            if self.batch_sum is not None:
+                self.be.sum(self.outputs.T, axis=1, out=self.batch_sum)
+        elif self.actual_bsz is None and self.actual_seq_len is None:
             self.be.compound_dot(A=self.W, B=self.inputs, C=self.outputs, beta=beta,
                                  bsum=self.batch_sum)
         else:
@@ -1007,6 +1043,11 @@ class Linear(ParameterLayer):
         Returns:
             Tensor: deltas to propagate to the adjacent lower layer
         """
+        if self.be.batch_major:
+            if self.deltas:
+                self.be.compound_dot(A=error, B=self.W, C=self.deltas, alpha=alpha, beta=beta)
+            self.be.compound_dot(A=error.T, B=self.inputs, C=self.dW)
+            return self.deltas
         if self.deltas:
             self.be.compound_dot(A=self.W.T, B=error, C=self.deltas, alpha=alpha, beta=beta)
         self.be.compound_dot(A=error, B=self.inputs.T, C=self.dW)
@@ -1026,6 +1067,8 @@ class BinaryLinear(Linear):
         name (str, optional): Layer name. Defaults to "BinaryLinearLayer"
     """
 
+    supports_batch_major = False
+
     def __str__(self):
         return "BinaryLinear Layer '%s': %d inputs, %d outputs" % (
                self.name, self.nin, self.nout)
@@ -1079,6 +1122,8 @@ class Bias(ParameterLayer):
         name (str, optional): Layer name. Defaults to "BiasLayer"
     """
 
+    supports_batch_major = True
+
     def __init__(self, init, name=None):
         super(Bias, self).__init__(init, name)
         self.y = None
@@ -1125,7 +1170,7 @@ class Bias(ParameterLayer):
         """
         self.outputs = self.inputs = inputs
         if self.y is None or self.y.base is not self.outputs:
-            self.y = self.outputs.reshape((self.bias_size, -1))
+            self.y = self.be.feature_view(self.outputs, self.bias_size)
         self.y[:] = self.y + self.W
         return self.outputs
 
@@ -1140,7 +1185,7 @@ class Bias(ParameterLayer):
             Tensor: deltas to propagate to the adjacent lower layer
         """
         if self.deltas is None:
-            self.deltas = error.reshape(self.y.shape)
+            self.deltas = self.be.feature_view(error, self.bias_size)
         self.be.sum(self.deltas, axis=1, out=self.dW)
         return error
 
@@ -1159,6 +1204,8 @@ class Activation(Layer):
         name (str, optional): Layer name. Defaults to "ActivationLayer"
     """
 
+    supports_batch_major = True
+
     def __init__(self, transform, name=None):
         super(Activation, self).__init__(name)
         self.transform = transform
@@ -1198,7 +1245,12 @@ class Activation(Layer):
             Tensor: output data
         """
         self.outputs = self.inputs = inputs
-        self.outputs[:] = self.transform(self.inputs)
+        if self.be.batch_major:
+            # transforms such as softmax reduce over the features on the first axis
+            self.be.feature_view(self.outputs)[:] = self.transform(
+                self.be.feature_view(self.inputs))
+        else:
+            self.outputs[:] = self.transform(self.inputs)
         return self.outputs
 
     def bprop(self, error):
@@ -1215,6 +1267,275 @@ class Activation(Layer):
         return self.deltas
 
 
+class FusedEpilogue(object):
+
+    """
+    Mixin for layers that add a learned bias and apply an activation to their
+    outputs as part of the producing GEMM or convolution, instead of running
+    separate Bias and Activation layers over the whole output tensor.
+
+    Not intended to be used directly.
+    """
+
+    def init_bias(self):
+        """
+        Allocate and initialize the bias and its gradient buffer.
+        """
+        self.b = self.be.empty((self.out_shape[0], 1), **self.get_param_attrs())
+        self.db = self.be.empty_like(self.b)
+        if isinstance(self.bias, Tensor) or isinstance(self.bias, np.ndarray):
+            self.b[:] = self.bias
+        elif self.bias is not None:
+            self.bias.fill(self.b)
+        else:
+            self.b[:] = 0
+        self.states = [[], []]
+
+    @property
+    def y(self):
+        """
+        View of the outputs with one row per bias element.
+        """
+        if self._y is None or self._y.base is not self.outputs:
+            self._y = self.be.feature_view(self.outputs, self.out_shape[0])
+        return self._y
+
+    @property
+    def compound_args(self):
+        """
+        Backend compound kernel arguments for the activation, or None if the
+        activation is not elementwise rectified or exponential linear.
+        """
+        if self.activation is None or isinstance(self.activation, Identity):
+            return {}
+        elif isinstance(self.activation, Rectlin):
+            return dict(relu=True, slope=self.activation.slope)
+        elif isinstance(self.activation, Explin):
+            return dict(explin=True, alpha=self.activation.alpha)
+        return None
+
+    def fprop_epilogue(self):
+        """
+        Add the bias and apply the activation to the outputs.
+        """
+        if self.compound_args is not None:
+            self.be.compound_fprop_bias_act(self.y, self.b, **self.compound_args)
+        else:
+            self.y[:] = self.y + self.b
+            outputs = self.be.feature_view(self.outputs)
+            outputs[:] = self.activation(outputs)
+
+    def bprop_epilogue(self, error):
+        """
+        Apply the activation derivative to error in place and compute the bias gradient,
+        in a single pass for the activations supported by the backend compound kernel.
+        """
+        error_view = self.be.feature_view(error, self.out_shape[0])
+        if self.compound_args is not None:
+            self.be.compound_bprop_bias_act(error_view, self.y, self.db, **self.compound_args)
+        else:
+            error[:] = self.activation.bprop(self.outputs) * error
+            self.be.sum(error_view, axis=1, out=self.db)
+        return error
+
+    def get_params(self):
+        return [((self.W, self.dW), self.states[0]), ((self.b, self.db), self.states[1])]
+
+    def get_description(self, get_weights=False, keep_states=True):
+        serial_dict = Layer.get_description(self)
+        if get_weights:
+            serial_dict['params'] = {'W': self.W.get(), 'b': self.b.get()}
+            if keep_states:
+                serial_dict['states'] = [[s.get() for s in slist] for slist in self.states]
+        return serial_dict
+
+    def set_params(self, pdict):
+        for key, val in pdict['params'].items():
+            if isinstance(getattr(self, key, None), Tensor):
+                getattr(self, key).set(val)
+            elif isinstance(val, Tensor):
+                setattr(self, key, val)
+            else:
+                setattr(self, key, self.be.array(val, **self.get_param_attrs()))
+        if self.dW is None:
+            self.dW = self.be.empty_like(self.W)
+        if self.db is None:
+            self.db = self.be.empty_like(self.b)
+
+    def set_states(self, pdict):
+        if 'states' not in pdict:
+            self.states = [[], []]
+        elif not any(self.states):
+            self.states = [[x if isinstance(x, Tensor) else
+                            self.be.array(x, **self.get_param_attrs()) for x in slist]
+                           for slist in pdict['states']]
+        else:
+            for dlist, slist in zip(self.states, pdict['states']):
+                for dst, src in zip(dlist, slist):
+                    dst.set(src)
+
+
+class FusedLinear(FusedEpilogue, Linear):
+
+    """
+    A fully connected layer that adds a learned bias and applies an activation
+    to the outputs of the dot product in one pass.
+
+    Computes the same as a Linear, Bias and Activation layer sequence.
+
+    Arguments:
+        nout (int, tuple): Desired size or shape of layer output
+        init (Initializer, optional): Initializer object to use for
+            initializing layer weights
+        bias (Initializer, optional): Initializer object to use for
+            initializing layer bias.  Defaults to zeros.
+        activation (Transform, optional): Transform to apply to the biased outputs
+        name (str, optional): Layer name. Defaults to "FusedLinearLayer"
+    """
+
+    def __init__(self, nout, init, bias=None, activation=None, name=None,
+                 parallelism="Disabled"):
+        super(FusedLinear, self).__init__(nout, init, name=name, parallelism=parallelism)
+        self.bias = bias
+        self.activation = activation
+        self.b = None
+        self.db = None
+        self._y = None
+
+    def __str__(self):
+        return "FusedLinear Layer '%s': %d inputs, %d outputs, %s activation" % (
+               self.name, self.nin, self.nout,
+               self.activation.classnm if self.activation else "no")
+
+    def allocate(self, shared_outputs=None):
+        super(FusedLinear, self).allocate(shared_outputs)
+        if self.b is None:
+            self.init_bias()
+
+    def fprop(self, inputs, inference=False, beta=0.0):
+        """
+        Apply the forward pass transformation to the input data.
+
+        Arguments:
+            inputs (Tensor): input data
+            inference (bool): is inference only
+            beta (float, optional): scale to apply to the outputs
+
+        Returns:
+            Tensor: output data
+        """
+        super(FusedLinear, self).fprop(inputs, inference=inference, beta=beta)
+        self.fprop_epilogue()
+        return self.outputs
+
+    def bprop(self, error, alpha=1.0, beta=0.0):
+        """
+        Apply the backward pass transformation to the input data.
+
+        Arguments:
+            error (Tensor): deltas back propagated from the adjacent higher layer
+            alpha (float, optional): scale to apply to input for activation
+                                     gradient bprop.  Defaults to 1.0
+            beta (float, optional): scale to apply to output activation
+                                    gradient bprop.  Defaults to 0.0
+
+        Returns:
+            Tensor: deltas to propagate to the adjacent lower layer
+        """
+        error = self.bprop_epilogue(error)
+        return super(FusedLinear, self).bprop(error, alpha=alpha, beta=beta)
+
+
+class FusedConvolution(FusedEpilogue, Convolution):
+
+    """
+    A convolutional layer that adds a learned bias and applies an activation to
+    the outputs of the convolution in one pass.  The bias and rectified linear
+    activations are applied by the convolution kernel itself.
+
+    Computes the same as a Convolution, Bias and Activation layer sequence.
+
+    Arguments:
+        fshape (tuple(int)): three dimensional shape of convolution window
+        strides (int, dict, optional): strides to apply convolution
+            window over. An int applies to both dimensions, or a dict with
+            str_h and str_w applies to h and w dimensions distinctly.  Defaults
+            to str_w = str_h = None
+        padding (int, dict, optional): padding to apply to edges of
+            input. An int applies to both dimensions, or a dict with pad_h
+            and pad_w applies to h and w dimensions distinctly.  Defaults
+            to pad_w = pad_h = None
+        init (Initializer, optional): Initializer object to use for
+            initializing layer weights
+        bias (Initializer, optional): Initializer object to use for
+            initializing layer bias.  Defaults to zeros.
+        activation (Transform, optional): Transform to apply to the biased outputs
+        name (str, optional): layer name. Defaults to "FusedConvolutionLayer"
+        groups (int, optional): number of groups to split the input and output
+            feature maps into.  Defaults to 1.
+    """
+
+    def __init__(self, fshape, strides={}, padding={}, init=None, bias=None,
+                 activation=None, name=None, parallelism="Data", groups=1):
+        super(FusedConvolution, self).__init__(fshape, strides=strides, padding=padding,
+                                               init=init, name=name, parallelism=parallelism,
+                                               groups=groups)
+        self.bias = bias
+        self.activation = activation
+        self.b = None
+        self.db = None
+        self._y = None
+
+    def __str__(self):
+        return "Fused" + super(FusedConvolution, self).__str__() + ", %s activation" % (
+               self.activation.classnm if self.activation else "no")
+
+    def allocate(self, shared_outputs=None):
+        super(FusedConvolution, self).allocate(shared_outputs)
+        if self.b is None:
+            self.init_bias()
+
+    def fprop(self, inputs, inference=False, beta=0.0):
+        """
+        Apply the forward pass transformation to the input data.
+
+        Arguments:
+            inputs (Tensor): input data
+            inference (bool): is inference only
+            beta (float, optional): scale to apply to the outputs
+
+        Returns:
+            Tensor: output data
+        """
+        self.inputs = inputs
+        args = self.compound_args
+        if beta == 0 and args is not None and not args.get('explin'):
+            # bias and relu are applied by the convolution kernel
+            self.be.fprop_conv(self.nglayer, inputs, self.W, self.outputs, bias=self.b,
+                               relu=args.get('relu', False), slope=args.get('slope', 0.0))
+        else:
+            self.be.fprop_conv(self.nglayer, inputs, self.W, self.outputs, beta=beta)
+            self.fprop_epilogue()
+        return self.outputs
+
+    def bprop(self, error, alpha=1.0, beta=0.0):
+        """
+        Apply the backward pass transformation to the input data.
+
+        Arguments:
+            error (Tensor): deltas back propagated from the adjacent higher layer
+            alpha (float, optional): scale to apply to input for activation
+                                     gradient bprop.  Defaults to 1.0
+            beta (float, optional): scale to apply to output activation
+                                    gradient bprop.  Defaults to 0.0
+
+        Returns:
+            Tensor: deltas to propagate to the adjacent lower layer
+        """
+        error = self.bprop_epilogue(error)
+        return super(FusedConvolution, self).bprop(error, alpha=alpha, beta=beta)
+
+
 class Reshape(Layer):
 
     """
@@ -1390,6 +1711,17 @@ class CompoundLayer(list):
         self.bias = bias
         self.base_name = name
 
+    def can_fuse(self):
+        """
+        True if the bias and activation can be computed in the epilogue of the
+        producing layer, which is supported for Bias with Rectlin, Explin or Identity
+        activations on the CPU backend.
+        """
+        return (self.bias is not None and not self.batch_norm and
+                (self.activation is None or
+                 isinstance(self.activation, (Identity, Rectlin, Explin))) and
+                getattr(NervanaObject.be, 'backend_name', None) == 'cpu')
+
     def init_base_name(self):
         if self.base_name is None:
             self.base_name = self[-1].name
@@ -1422,14 +1754,23 @@ class Affine(CompoundLayer):
             functions to apply
         name (str): the root name for the layer, suffixes are automatically
             generated for the component layers
+        fuse (bool, optional): on the CPU backend, implement a bias with a Rectlin,
+            Explin or Identity activation as a single FusedLinear layer.
+            Defaults to False, so the layers match serialized weights and the layer
+            names of MultiOptimizer, Model.optimize_for_inference fuses them once
+            the weights are loaded.
 
     """
 
     def __init__(self, nout, init, bias=None,
                  batch_norm=False, activation=None, name=None,
-                 parallelism="Disabled"):
+                 parallelism="Disabled", fuse=False):
         super(Affine, self).__init__(bias=bias, batch_norm=batch_norm,
                                      activation=activation, name=name)
+        if fuse and self.can_fuse():
+            self.append(FusedLinear(nout, init, bias=bias, activation=activation,
+                                    name=name, parallelism=parallelism))
+            return
         self.append(Linear(nout, init, bsum=batch_norm, name=name,
                            parallelism=parallelism))
         self.add_postfilter_layers()
@@ -1496,6 +1837,13 @@ class Conv(CompoundLayer):
             functions to apply
         name (str): the root name for the layer, suffixes are automatically
             generated for the component layers
+        fuse (bool, optional): on the CPU backend, implement a bias with a Rectlin,
+            Explin or Identity activation as a single FusedConvolution layer.
+            Defaults to False, so the layers match serialized weights and the layer
+            names of MultiOptimizer, Model.optimize_for_inference fuses them once
+            the weights are loaded.
+        groups (int, optional): number of groups to split the input and output
+            feature maps into, see Convolution.  Defaults to 1.
 
     """
 
@@ -1503,12 +1851,19 @@ class Conv(CompoundLayer):
                  bias=None,
                  batch_norm=False,
                  activation=None,
-                 name=None):
+                 name=None,
+                 fuse=False,
+                 groups=1):
         super(Conv, self).__init__(bias=bias, batch_norm=batch_norm,
                                    activation=activation, name=name)
+        if fuse and self.can_fuse():
+            self.append(FusedConvolution(fshape=fshape, strides=strides, padding=padding,
+                                         init=init, bias=bias, activation=activation,
+                                         name=name, groups=groups))
+            return
         self.append(Convolution(fshape=fshape, strides=strides, padding=padding,
                                 init=init, bsum=batch_norm,
-                                name=name))
+                                name=name, groups=groups))
         self.add_postfilter_layers()
 
 
@@ -1648,6 +2003,8 @@ class Dropout(Layer):
        keep (float): fraction of the inputs that should be stochastically kept.
     """
 
+    supports_batch_major = True
+
     def __init__(self, keep=0.5, name=None):
         super(Dropout, self).__init__(name)
         self.keep = keep
@@ -1689,7 +2046,8 @@ class Dropout(Layer):
                                                computed into
         """
         super(Dropout, self).allocate(shared_outputs)
-        self.keep_mask = self.be.iobuf(self.out_shape, parallelism=self.parallelism)
+        self.keep_mask = self.be.iobuf(self.out_shape, parallelism=self.parallelism,
+                                       batch_major=self.be.batch_major)
 
     def fprop(self, inputs, inference=False):
         """
@@ -1996,6 +2354,8 @@ class BatchNorm(Layer):
     .. [Ioffe2015] http://arxiv.org/abs/1502.03167
     """
 
+    supports_batch_major = True
+
     def __init__(self, rho=0.9, eps=1e-3, name=None, binary=False):
         super(BatchNorm, self).__init__(name)
         self.allparams = None
@@ -2046,7 +2406,7 @@ class BatchNorm(Layer):
                                                computed into
         """
         super(BatchNorm, self).allocate(shared_outputs)
-        self.y = self.outputs.reshape((self.nfm, -1))
+        self.y = self.be.feature_view(self.outputs, self.nfm)
         self.xvar = self.be.zeros((self.nfm, 1), dtype=self.stats_dtype)
         if self.allparams is None:
             self.init_params(self.nfm)
@@ -2095,7 +2455,7 @@ class BatchNorm(Layer):
             Tensor: output data
         """
         if self.inputs is None or self.inputs.base is not inputs:
-            self.inputs = inputs.reshape((self.nfm, -1))
+            self.inputs = self.be.feature_view(inputs, self.nfm)
 
         if inference:
             return self._fprop_inference(self.inputs, beta)
@@ -2103,10 +2463,11 @@ class BatchNorm(Layer):
         if self.compute_batch_sum:
             self.xsum[:] = self.be.sum(self.inputs, axis=1)
 
+        # batch major outputs can only be written through the feature view
         self.be.compound_fprop_bn(
             self.inputs, self.xsum, self.xvar, self.gmean, self.gvar, self.gamma,
-            self.beta, self.outputs, self.eps, self.rho, beta, self.relu,
-            binary=self.binary)
+            self.beta, self.y if self.be.batch_major else self.outputs, self.eps, self.rho,
+            beta, self.relu, binary=self.binary)
 
         return self.outputs
 
@@ -2134,9 +2495,12 @@ class BatchNorm(Layer):
         """
         assert alpha == 1.0 and beta == 0.0
         if not self.error_view:
-            self.error_view = error.reshape((self.nfm, -1))
+            self.error_view = self.be.feature_view(error, self.nfm)
 
-        self.be.compound_bprop_bn(self.deltas, self.grad_gamma, self.grad_beta,
+        deltas = self.deltas
+        if self.be.batch_major:
+            deltas = self.be.feature_view(self.deltas, self.nfm)
+        self.be.compound_bprop_bn(deltas, self.grad_gamma, self.grad_beta,
                                   self.error_view,
                                   self.inputs, self.xsum, self.xvar, self.gamma,
                                   self.eps, binary=self.binary)
@@ -2172,6 +2536,8 @@ class BatchNorm(Layer):
             for key, val in pdict['params'].items():
                 if isinstance(getattr(self, key), Tensor):
                     getattr(self, key).set(val)
+                elif isinstance(val, Tensor):
+                    setattr(self, key, val)
                 else:
                     setattr(self, key, self.be.array(val, **self.get_param_attrs()))
 
@@ -2194,7 +2560,8 @@ class BatchNorm(Layer):
 
     def set_states(self, pdict):
         if not any(self.states):
-            self.states = [[self.be.array(x, **self.get_param_attrs()) for x in slist]
+            self.states = [[x if isinstance(x, Tensor) else
+                            self.be.array(x, **self.get_param_attrs()) for x in slist]
                            for slist in pdict['states']]
         else:
             for dlist, slist in zip(self.states, pdict['states']):
@@ -2208,6 +2575,8 @@ class BatchNormAutodiff(BatchNorm):
     An example to use autodiff in batchnorm.
     """
 
+    supports_batch_major = False
+
     def __init__(self, rho=0.99, eps=1e-6, name=None):
         super(BatchNormAutodiff, self).__init__(rho, eps, name)
 
@@ -12,4 +12,5 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 # ----------------------------------------------------------------------------
-from neon.models.model import Model
+from neon.models.model import Model, load_inference
+from neon.models.serving import InferenceServer
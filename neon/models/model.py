@@ -19,17 +19,175 @@ import logging
 
 from neon import __version__ as __neon_version__
 from neon import NervanaObject, logger as neon_logger
-from neon.backends.backend import Block
+from neon.backends.backend import Block, Tensor
 from neon.transforms import CrossEntropyBinary, Logistic
-from neon.util.persist import load_obj, save_obj, load_class
+from neon.util.persist import load_obj, save_obj, load_class, save_packed, load_packed
 from neon.util.modeldesc import ModelDescription
 from neon.layers import Sequential, Activation, Tree, SingleOutputTree, Seq2Seq
-from neon.layers.container import DeltasTree
+from neon.layers import (Linear, Convolution, Bias, BatchNorm, Dropout, BranchNode,
+                         FusedLinear, FusedConvolution)
+from neon.layers.container import DeltasTree, LayerContainer
+from neon.transforms import Identity
 import numpy as np
 
 logger = logging.getLogger(__name__)
 
 
+def _is_identity(layer):
+    """
+    True for layers that leave their inputs unchanged during inference.
+    """
+    if type(layer) is Dropout:
+        return layer.caffe_mode
+    return type(layer) is Activation and isinstance(layer.transform, Identity)
+
+
+def _fuse_producer(layer, in_scale, chain):
+    """
+    Fold the inference transformations of the layers in chain into the weights and
+    bias of the Linear or Convolution layer that produces their inputs.
+
+    Arguments:
+        layer (Layer): Linear or Convolution layer
+        in_scale (float): scale applied to the inputs of layer by a preceding Dropout
+        chain (list): Bias, BatchNorm, Dropout and Activation layers following layer
+
+    Returns:
+        Layer: layer with its weights scaled, or a fused layer replacing layer and chain
+    """
+    W = layer.W.get().astype(np.float64) * in_scale
+    if not chain:
+        layer.W.set(W)
+        return layer
+
+    nout = layer.out_shape[0]
+    scale = np.ones((nout, 1))
+    shift = np.zeros((nout, 1))
+    activation = None
+    outputs = layer.outputs
+    for l in chain:
+        if type(l) is Bias:
+            shift += l.W.get()
+        elif type(l) is Dropout and not l.caffe_mode:
+            scale *= l.keep
+            shift *= l.keep
+        elif type(l) is BatchNorm:
+            g = l.gamma.get() / np.sqrt(l.gvar.get() + l.eps)
+            scale *= g
+            shift = (shift - l.gmean.get()) * g + l.beta.get()
+        elif type(l) is Activation:
+            activation = l.transform
+        if l.owns_output:
+            outputs = l.outputs
+
+    if type(layer) is Linear:
+        fused = FusedLinear(layer.nout, layer.init, activation=activation,
+                            name=layer.name, parallelism=layer.parallelism)
+        W = W * scale
+    else:
+        fused = FusedConvolution(layer.fshape, layer.strides, layer.padding, layer.init,
+                                 activation=activation, name=layer.name,
+                                 parallelism=layer.parallelism, groups=layer.groups)
+        W = W * scale.T  # filters are (C * R * S, K)
+
+    fused.configure(layer.in_shape)
+    fused.prev_layer = layer.prev_layer
+    fused.outputs = outputs
+    fused.actual_bsz, fused.actual_seq_len = layer.actual_bsz, layer.actual_seq_len
+    fused.allocate()
+    fused.W.set(W)
+    fused.b.set(shift)
+    return fused
+
+
+def _fold_sequential(container):
+    """
+    Rewrite the layers of container and of any Sequential nested in it for inference.
+    """
+    if isinstance(container, Seq2Seq):
+        return
+    if type(container) is not Sequential:
+        for l in container.layers:
+            if isinstance(l, LayerContainer):
+                _fold_sequential(l)
+        return
+
+    layers = container.layers
+    folded = []
+    in_scale = 1.0
+    idx = 0
+    while idx < len(layers):
+        l = layers[idx]
+        idx += 1
+        if isinstance(l, LayerContainer):
+            _fold_sequential(l)
+        elif type(l) in (FusedLinear, FusedConvolution):
+            l = _fuse_producer(l, in_scale, [])
+            in_scale = 1.0
+        elif type(l) in (Linear, Convolution):
+            chain = []
+            while idx < len(layers) and type(layers[idx]) in (Bias, BatchNorm, Dropout,
+                                                              Activation):
+                n = layers[idx]
+                if type(n) is BatchNorm and (n.binary or n.relu):
+                    break
+                chain.append(n)
+                idx += 1
+                if type(n) is Activation:
+                    break
+            l = _fuse_producer(l, in_scale, chain)
+            in_scale = 1.0
+        elif folded and _is_identity(l):
+            continue
+        elif (folded and type(l) is Dropout and idx < len(layers) and
+              type(layers[idx]) in (Linear, Convolution, FusedLinear, FusedConvolution)):
+            # scaling the inputs of the next layer is the same as scaling its weights
+            in_scale *= l.keep
+            continue
+        folded.append(l)
+
+    for prev, l in zip(folded[:-1], folded[1:]):
+        prev.set_next(l)
+    container.layers = folded
+    container._layers = [x for x in folded if type(x) is not BranchNode]
+
+
+def _bind_arrays(item, be, owned=False):
+    """
+    Return a copy of a layer description with the memory mapped arrays of the params
+    and states replaced by backend tensors that are views of the mapping, and all
+    arrays if the description is owned (e.g. just read from a file).  Only the CPU
+    backends can bind host memory, and only arrays of the backend data type are bound,
+    others are left to be copied by the layers.  The description itself is not
+    modified.
+    """
+    if be.backend_name not in ('cpu', 'mkl'):
+        return item
+
+    def bind(val):
+        if isinstance(val, np.ndarray) and val.dtype == be.default_dtype and \
+                (isinstance(val, np.memmap) or
+                 (owned and val.flags.c_contiguous and val.flags.writeable)):
+            ary = np.asarray(val)
+            return be.tensor_cls(backend=be, ary=ary, dtype=ary.dtype)
+        if isinstance(val, list):
+            return [bind(v) for v in val]
+        return val
+
+    if isinstance(item, dict):
+        bound = dict()
+        for key, val in item.items():
+            if key == 'params' and isinstance(val, dict):
+                val = {k: bind(v) for k, v in val.items()}
+            elif key == 'states' and isinstance(val, list):
+                val = bind(val)
+            bound[key] = _bind_arrays(val, be, owned)
+        return bound
+    if isinstance(item, list):
+        return [_bind_arrays(val, be, owned) for val in item]
+    return item
+
+
 class Model(NervanaObject):
     """
     Class which stores a list of layers describing the model. Can train the layer
@@ -56,9 +214,15 @@ class Model(NervanaObject):
         self.epoch_index = 0
         self.finished = False
         self.initialized = False
+        self.inference_only = False
         self.cost = None
         self.nbatches = 0
         self.ndata = 0
+        # training progress for resuming mid-epoch, see serialize
+        self.minibatch_markers = []
+        self.mb_index = None
+        self.dataset_state = None
+        self.resume_state = None
 
         if dataset is not None:
             logger.warning('dataset is a deprecated argument and will be ignored')
@@ -97,7 +261,7 @@ class Model(NervanaObject):
             # is thrown leave transform.shortcut as is (do nothing)
             pass
 
-    def initialize(self, dataset, cost=None):
+    def initialize(self, dataset, cost=None, inference=False):
         """
         Propagate shapes through the layers to configure, then allocate space.
 
@@ -105,9 +269,12 @@ class Model(NervanaObject):
             dataset (NervanaDataIterator): Dataset iterator to perform initialization on
             cost (Cost): Defines the function which the model is minimizing based
                          on the output of the last layer and the input labels.
+            inference (bool, optional): Only allocate what fprop needs, the model can
+                                        not be trained.  Defaults to False.
         """
         if self.initialized:
             return
+        self.inference_only = inference
 
         # Propagate shapes through the layers to configure
         prev_input = dataset
@@ -119,7 +286,20 @@ class Model(NervanaObject):
 
         # Now allocate space
         self.layers.allocate()
-        self.layers.allocate_deltas()
+        if not inference:
+            self.layers.allocate_deltas()
+        if self.be.batch_major:
+            # the layers run batch major, the cost, metrics and callbacks see the
+            # outputs and the output deltas in the (feature, batch) layout
+            self.fm_outputs = self.be.iobuf(self.layers.out_shape)
+            if not inference:
+                self.bm_deltas = self.be.iobuf(self.layers.out_shape, batch_major=True)
+        # batch size the buffers are allocated for, see set_batch_size
+        self.alloc_bsz = self.be.bsz
+        self._full_buffers = None
+        self._nglayers = dict()
+        self._layer_buffers = dict()
+        self._partial_inputs = dict()
         self.initialized = True
 
     def allocate_deltas(self):
@@ -165,14 +345,20 @@ class Model(NervanaObject):
         self.total_cost = np.empty([1, 1], dtype=np.float32)
         self.optimizer = optimizer
         self.initialize(dataset, cost)
+        assert not self.inference_only, "Model was initialized for inference only"
 
         callbacks.on_train_begin(num_epochs)
+        # a checkpoint taken in the middle of an epoch resumes from its next minibatch
+        resume, self.resume_state = self.resume_state, None
         while self.epoch_index < num_epochs and not self.finished:
+            if resume is not None:
+                dataset.set_state(resume['dataset'])
             self.nbatches = dataset.nbatches
 
             callbacks.on_epoch_begin(self.epoch_index)
 
-            self._epoch_fit(dataset, callbacks)
+            self._epoch_fit(dataset, callbacks, resume)
+            resume = None
 
             callbacks.on_epoch_end(self.epoch_index)
 
@@ -180,17 +366,34 @@ class Model(NervanaObject):
 
         callbacks.on_train_end()
 
-    def _epoch_fit(self, dataset, callbacks):
+    def _epoch_fit(self, dataset, callbacks, resume=None):
         """
         Helper function for fit which performs training on a dataset for one epoch.
 
         Arguments:
             dataset (NervanaDataIterator): Dataset iterator to perform fit on
+            callbacks (Callbacks): Defines callbacks to run at the end of each mini-batch
+            resume (dict, optional): training state of a checkpoint taken in the middle
+                                     of this epoch, the epoch continues after the
+                                     minibatches it had completed
         """
         epoch = self.epoch_index
         self.total_cost[:] = 0
+        self.dataset_state = dataset.get_state()
+        nbatches = dataset.nbatches
+        skip = 0
+        if resume is not None:
+            skip = resume['minibatch']
+            self.total_cost[:] = resume['total_cost']
+            np.random.set_state(resume['np_rng_state'])
+        first = skip if skip > 0 and dataset.skip(skip) else 0
+        self.mb_index = skip
+
         # iterate through minibatches of the dataset
-        for mb_idx, (x, t) in enumerate(dataset):
+        minibatches = enumerate(dataset, first) if first < nbatches else []
+        for mb_idx, (x, t) in minibatches:
+            if mb_idx < skip:
+                continue
             callbacks.on_minibatch_begin(epoch, mb_idx)
             self.be.begin(Block.minibatch, mb_idx)
 
@@ -206,8 +409,13 @@ class Model(NervanaObject):
             self.optimizer.optimize(self.layers_to_optimize, epoch=epoch)
 
             self.be.end(Block.minibatch, mb_idx)
+            self.mb_index = mb_idx + 1
             callbacks.on_minibatch_end(epoch, mb_idx)
 
+        markers = self.minibatch_markers
+        markers.append((markers[-1] if markers else 0) + self.mb_index)
+        self.mb_index = None
+
         # now we divide total cost by the number of batches,
         # so it was never total cost, but sum of averages
         # across all the minibatches we trained on
@@ -218,13 +426,18 @@ class Model(NervanaObject):
         Forward propagates a minibatch x through the model.
 
         Arguments:
-            x (Tensor): Input minibatch data.
+            x (Tensor): Input minibatch data.  Batch major when the backend
+                uses the batch major layout.
             inference (bool): Flag for performing training or inference
                 Only affects batch norm and dropout layers.
 
         Returns:
             Tensor: the output of the final layer in the model
         """
+        if self.be.batch_major:
+            outputs = self.layers.fprop(x, inference)
+            self.be.to_feature_major(outputs, self.layers.out_shape, self.fm_outputs)
+            return self.fm_outputs
         return self.layers.fprop(x, inference)
 
     def bprop(self, delta):
@@ -237,6 +450,10 @@ class Model(NervanaObject):
         Returns:
             Tensor: Deltas to propagate to the next layer
         """
+        assert not self.inference_only, "Model was initialized for inference only"
+        if self.be.batch_major:
+            self.be.to_batch_major(delta, self.layers.out_shape, self.bm_deltas)
+            return self.layers.bprop(self.bm_deltas)
         return self.layers.bprop(delta)
 
     def eval(self, dataset, metric):
@@ -258,14 +475,19 @@ class Model(NervanaObject):
             ndata = dataset.ndata*dataset.seq_length
         else:
             ndata = dataset.ndata
+        # the padding of a partial last minibatch is not computed
+        trim = not hasattr(dataset, 'seq_length') and self._can_bind_batch_size()
         for x, t in dataset:
-            x = self.fprop(x, inference=True)
+            bsz = min(ndata - nprocessed, self.be.bsz)
+            if trim and bsz < self.be.bsz:
+                x = self._fprop_partial(x, bsz)
+            else:
+                x = self.fprop(x, inference=True)
 
             # This logic is for handling partial batch sizes at the end of the dataset
             nsteps = x.shape[1] // self.be.bsz if not isinstance(x, list) else \
                 x[0].shape[1] // self.be.bsz
 
-            bsz = min(ndata - nprocessed, self.be.bsz)
             running_error += metric(x, t, calcrange=slice(0, nsteps * bsz)) * nsteps * bsz
             nprocessed += bsz * nsteps
         running_error /= nprocessed
@@ -287,8 +509,13 @@ class Model(NervanaObject):
         x = self.layers.layers[-1].outputs
         assert not isinstance(x, list), "Can not get_outputs with Branch terminal"
         Ypred = None
+        trim = not hasattr(dataset, 'seq_length') and self._can_bind_batch_size()
         for idx, (x, t) in enumerate(dataset):
-            x = self.fprop(x, inference=True)
+            bsz = min(dataset.ndata - idx * self.be.bsz, self.be.bsz)
+            if trim and bsz < self.be.bsz:
+                x = self._fprop_partial(x, bsz)
+            else:
+                x = self.fprop(x, inference=True)
             if Ypred is None:
                 (dim0, dim1) = x.shape
                 Ypred = np.empty((n * dim1, dim0), dtype=x.dtype)
@@ -303,6 +530,47 @@ class Model(NervanaObject):
 
         return Ypred[:dataset.ndata]
 
+    def optimize_for_inference(self):
+        """
+        Rewrite the layer graph of an initialized model for faster inference.
+
+        BatchNorm, Bias and Dropout scaling following a Linear or Convolution layer are
+        folded into its weights and bias, and a following Activation is applied in the
+        same pass as the bias by replacing the pair with a FusedLinear or
+        FusedConvolution layer.  Dropout layers that only scale the inputs of the next
+        Linear or Convolution layer are folded into its weights, and layers that are
+        identities at inference are dropped.  Outputs of fprop with inference=True are
+        unchanged, but the model can no longer be trained.
+        """
+        assert self.initialized, "Model must be initialized before optimize_for_inference"
+        _fold_sequential(self.layers)
+        self.inference_only = True
+
+    def generate(self, dataset, num_steps=None, beam_size=1, end_index=None):
+        """
+        Generate output sequences for the dataset with a Seq2Seq model, running
+        the encoder once per minibatch and the decoder one time step per token.
+
+        Arguments:
+            dataset (NervanaDataIterator): Dataset iterator providing the encoder inputs
+            num_steps (int, optional): Maximum number of tokens to generate.
+            beam_size (int, optional): Number of hypotheses kept for each sequence.
+            end_index (int, optional): Token that terminates a sequence.
+
+        Returns:
+            Host numpy array: token indices of shape (ndata, num_steps)
+        """
+        assert isinstance(self.layers, Seq2Seq), "generate requires a Seq2Seq model"
+        self.initialize(dataset)
+        dataset.reset()
+        tokens = []
+        for x, t in dataset:
+            if isinstance(x, tuple):
+                x = x[0]  # conditional datasets also provide the decoder inputs
+            tokens.append(self.layers.generate(x, num_steps, beam_size, end_index).T)
+
+        return np.concatenate(tokens)[:dataset.ndata]
+
     def get_description(self, get_weights=False, keep_states=False):
         """
         Gets a description of the model required to reconstruct the model with
@@ -357,7 +625,11 @@ class Model(NervanaObject):
                                  the serialized parameters and set the learning
                                  states as well
         """
-        self.deserialize(load_obj(param_path), load_states=load_states)
+        pdict = load_obj(param_path)
+        if not hasattr(self, 'layers') and 'model' in pdict:
+            # the layers to be created take the arrays read from the file as they are
+            pdict = dict(pdict, model=_bind_arrays(pdict['model'], self.be, owned=True))
+        self.deserialize(pdict, load_states=load_states)
         logger.info('Model weights loaded from %s', param_path)
 
     def load_weights(self, weight_path):
@@ -394,6 +666,10 @@ class Model(NervanaObject):
 
         if 'epoch_index' in model_dict:
             self.epoch_index = model_dict['epoch_index']
+        if load_states and 'train_state' in model_dict:
+            train_state = model_dict['train_state']
+            self.minibatch_markers = list(train_state['minibatch_markers'])
+            self.resume_state = train_state if 'minibatch' in train_state else None
         if 'model' not in model_dict:
             logger.error('Using old model serialization format. '
                          'Serialized the model into new format')
@@ -415,10 +691,13 @@ class Model(NervanaObject):
         typ = model_dict['model']['type']
         main_container = load_class(typ)
 
+        weights = model_dict['model']
         if not hasattr(self, 'layers'):
-            self.layers = main_container.gen_class(model_dict['model']['config'])
+            self.layers = main_container.gen_class(weights['config'])
+            # the new layers take the memory mapped arrays of a packed file as they are
+            weights = _bind_arrays(weights, self.be)
 
-        self.layers.load_weights(model_dict['model'], load_states)
+        self.layers.load_weights(weights, load_states)
 
         if load_states and 'rng_state' in model_dict['backend']:
             try:
@@ -436,6 +715,11 @@ class Model(NervanaObject):
         """
         Creates a dictionary storing the layer parameters and epochs complete.
 
+        During fit the dictionary also stores the training progress.  Taken in the
+        middle of an epoch (e.g. from a minibatch callback) it holds the completed
+        minibatches of the epoch, the state of the dataset at its start, the numpy
+        rng state and the running cost, and fit resumes from the next minibatch.
+
         Arguments:
             fn (str): file to save pkl formatted model dictionary
             keep_states (bool): Whether to save optimizer states.
@@ -447,6 +731,14 @@ class Model(NervanaObject):
         # get the model dict with the weights
         pdict = self.get_description(get_weights=True, keep_states=keep_states)
         pdict['epoch_index'] = self.epoch_index + 1
+        if self.minibatch_markers or self.mb_index is not None:
+            pdict['train_state'] = dict(minibatch_markers=list(self.minibatch_markers))
+        if self.mb_index is not None:
+            pdict['epoch_index'] = self.epoch_index
+            pdict['train_state'].update(minibatch=self.mb_index,
+                                        dataset=self.dataset_state,
+                                        np_rng_state=np.random.get_state(),
+                                        total_cost=float(self.total_cost[0, 0]))
         if self.initialized:
             pdict['train_input_shape'] = self.layers.in_shape
         if fn is not None:
@@ -454,21 +746,184 @@ class Model(NervanaObject):
             return
         return pdict
 
-    def set_batch_size(self, N):
+    def export_inference(self, fn):
         """
-        Set the actual minibatch size, so even though the buffers are allocated considering
-        excessive padding, the processing for some layers may be shortened.
-        Currently most of the neon layers don't use that to control the processing. The
-        interface is here only for when someone wants to set that information and experiment.
+        Saves the configured layers and their weights for inference to a packed file,
+        see neon.util.persist.save_packed.  Optimizer states, the cost and the rng
+        state are left out.  Load the model with load_inference.
 
         Arguments:
-            N:
+            fn (str): file to save the packed model to
+        """
+        assert self.initialized, "Model must be initialized before export"
+        pdict = self.get_description(get_weights=True, keep_states=False)
+        pdict['backend'].pop('rng_state', None)
+        pdict.pop('cost', None)
+        pdict.pop('optimizer', None)
+        pdict['epoch_index'] = self.epoch_index
+        pdict['train_input_shape'] = self.layers.in_shape
+        save_packed(pdict, fn)
+
+    def set_batch_size(self, N, reallocate=False):
+        """
+        Set the minibatch size the model computes.
 
-        Returns:
+        An initialized model with a single pathway of layers is bound to N samples of the
+        buffers it was allocated with, without allocating them again: the backend batch
+        size becomes N, every layer runs its kernels on N samples and fprop takes and
+        returns minibatches of N samples.  N can not exceed the batch size the model was
+        allocated for.  Otherwise only the actual minibatch size of the layers is set,
+        which some layers use to shorten their processing.
 
+        With reallocate set, the backend batch size is changed to N and the buffers of an
+        initialized model are allocated again at that size, keeping the learned parameters.
+        With N == 1 the CPU backend convolution and pooling layers switch to kernels for a
+        single sample, which is the lowest latency setup for serving requests one at a time.
+
+        Arguments:
+            N (int): minibatch size
+            reallocate (bool, optional): reallocate the layer buffers for a backend batch
+                                         size of N.  Defaults to False.
         """
+        if reallocate:
+            self.be.bsz = N
+            if self.initialized:
+                self._reallocate()
+            return
+        if self.initialized and self._can_bind_batch_size():
+            return self._bind_batch_size(N)
         return self.layers.set_batch_size(N)
 
+    def _can_bind_batch_size(self):
+        """
+        Whether the buffers of the model can be bound to a smaller batch size.  Layer
+        containers other than the model's own Sequential hand out views of their buffers to
+        the layers they contain, so only models with a single pathway qualify.
+        """
+        return type(self.layers) is Sequential and \
+            not any(isinstance(l, (LayerContainer, BranchNode)) for l in self.layers.layers)
+
+    def _bind_batch_size(self, N):
+        """
+        Bind the layers and the cost to a batch size of N.  The outputs of every layer and
+        the cost buffers become views of the first N samples worth of memory of the buffers
+        allocated at initialization, the delta buffers are views of the shared delta pool
+        and the backend layer objects and the other buffers the layers allocate (e.g.
+        dropout masks) for each batch size are created once and cached.
+        """
+        if N > self.alloc_bsz:
+            raise ValueError("Batch size %d exceeds the allocated batch size %d, use "
+                             "reallocate=True" % (N, self.alloc_bsz))
+        if N == self.be.bsz:
+            return
+
+        layers = self.layers.layers
+        if self._full_buffers is None:
+            # (owner, attribute, batch major, buffer allocated for alloc_bsz)
+            bm = self.be.batch_major
+            self._full_buffers = [(l, 'outputs', bm, l.outputs) for l in layers if l.owns_output]
+            if bm:
+                self._full_buffers.append((self, 'fm_outputs', False, self.fm_outputs))
+                if not self.inference_only:
+                    self._full_buffers.append((self, 'bm_deltas', True, self.bm_deltas))
+            if self.cost is not None:
+                self._full_buffers += [(self.cost, 'outputs', False, self.cost.outputs),
+                                       (self.cost, 'deltas', False, self.cost.deltas)]
+        nglayers = [(l, l.nglayer) for l in layers if getattr(l, 'nglayer', None) is not None]
+        self._nglayers[self.be.bsz] = nglayers
+
+        prev_bsz, self.be.bsz = self.be.bsz, N
+        if N in self._nglayers:
+            for l, nglayer in self._nglayers[N]:
+                l.nglayer = nglayer
+        else:
+            for l, _ in nglayers:
+                l.nglayer = None
+            self.layers.configure(self.layers.in_shape)
+
+        for l in layers:
+            if not l.owns_output:
+                l.outputs = None
+        for obj, attr, batch_major, buf in self._full_buffers:
+            rows, cols = buf.shape
+            if batch_major:
+                shape = (rows // self.alloc_bsz * N, cols)
+            else:
+                shape = (rows, cols // self.alloc_bsz * N)
+            setattr(obj, attr, buf if shape == buf.shape else buf.share(shape))
+        if N in self._layer_buffers:
+            for l, bufs in self._layer_buffers[N]:
+                for attr, buf in bufs.items():
+                    setattr(l, attr, buf)
+        else:
+            # the layers allocate their buffers and the views they derive from their outputs
+            before = self._layer_tensors()
+            self.layers.allocate()
+            after = self._layer_tensors()
+            changed = [[k for k, v in a.items() if b.get(k) is not v]
+                       for (_, b), (_, a) in zip(before, after)]
+            if prev_bsz not in self._layer_buffers:
+                self._layer_buffers[prev_bsz] = [(l, {k: b[k] for k in keys if k in b})
+                                                 for keys, (l, b) in zip(changed, before)]
+            self._layer_buffers[N] = [(l, {k: a[k] for k in keys})
+                                      for keys, (l, a) in zip(changed, after)]
+        if not self.inference_only:
+            self.layers.set_deltas(self.layers.global_deltas)
+
+    def _layer_tensors(self):
+        """
+        Return the tensors held by the attributes of the layers other than their outputs,
+        as (layer, {attribute: tensor}) pairs.
+        """
+        return [(l, {k: v for k, v in vars(l).items() if isinstance(v, Tensor) and
+                     k != 'outputs'})
+                for l in self.layers.layers]
+
+    def _fprop_partial(self, x, N):
+        """
+        Forward propagate only the first N samples of a padded minibatch x at inference.
+
+        Returns:
+            Tensor: the outputs of the model in a full minibatch buffer, only the first N
+                    columns hold outputs
+        """
+        bsz = self.be.bsz
+        if getattr(self, 'partial_outputs', None) is None or \
+                self.partial_outputs.shape[1] != bsz:
+            self.partial_outputs = self.be.iobuf(self.layers.out_shape)
+        self._bind_batch_size(N)
+        try:
+            xin = self._partial_inputs.get(N)
+            if xin is None:
+                xin = self.be.iobuf(self.layers.in_shape, batch_major=self.be.batch_major)
+                self._partial_inputs[N] = xin
+            xin[:] = x[:N] if self.be.batch_major else x[:, :N]
+            self.partial_outputs[:, :N] = self.fprop(xin, inference=True)
+        finally:
+            self._bind_batch_size(bsz)
+        return self.partial_outputs
+
+    def _reallocate(self):
+        """
+        Configure and allocate an initialized model again for the current backend batch
+        size.  Activation, delta and backend layer buffers are sized by the batch size and
+        dropped, parameters and their states are kept.  The views of the delta buffers the
+        layers and costs cache on their first bprop are dropped with them.
+        """
+        costs = [self.cost] + list(getattr(self.cost, 'costs', [])) if self.cost else []
+        for l in [self.layers] + list(self.layers.layers_fprop()) + costs:
+            if getattr(l, 'nglayer', None) is not None:
+                l.nglayer = None
+            if hasattr(l, 'outputs'):
+                l.outputs = None
+            for view in ('deltas', 'error_view', 'error_views', 'in_deltas', 'in_deltas_f',
+                         'in_deltas_b'):
+                if getattr(l, view, None) is not None:
+                    setattr(l, view, None)
+        self.global_deltas = None
+        self.initialized = False
+        self.initialize(self.layers.in_shape, self.cost, inference=self.inference_only)
+
     def set_seq_len(self, S):
         """
         Set the actual minibatch sequence length, so even though the buffers are allocated
@@ -488,7 +943,9 @@ class Model(NervanaObject):
                   niterations=20, nskip=2):
         """
         Measure runtime for computing fprop and bprop separately, as well as
-        full minibatch run times. For inference case, only the fprop is measured.
+        full minibatch run times. For inference case, only the fprop is measured,
+        along with the latency of a single request: the fprop of one sample with the
+        model reallocated for a batch size of 1 (see set_batch_size).
 
         Arguments:
              dataset (NervanaDataIterator) Dataset iterator to perform fit on
@@ -503,7 +960,7 @@ class Model(NervanaObject):
              inference (bool, optional): Is inference use case
              optimizer (Optimizer): Defines the learning rule for updating the model parameters.
         Returns:
-            dictionary with fprop, bprop run times
+            dictionary with fprop, bprop (and latency) run times
         """
         # initialize model
         if inference is False and (cost is None or optimizer is None):
@@ -558,6 +1015,22 @@ class Model(NervanaObject):
                 if count >= niterations + nskip:
                     break
 
+        if inference and not isinstance(self.layers.in_shape, list):
+            # the latency of a single request when the model runs with a batch size of 1
+            bsz = self.be.bsz
+            times['latency'] = np.full(niterations + nskip, -1.0)
+            self.set_batch_size(1, reallocate=True)
+            try:
+                x = self.be.iobuf(self.layers.in_shape, batch_major=self.be.batch_major)
+                for count in range(niterations + nskip):
+                    self.be.record_mark(fprop_start)
+                    self.fprop(x, inference=True)
+                    self.be.record_mark(fprop_end)
+                    self.be.synchronize_mark(fprop_end)
+                    times['latency'][count] = self.be.get_time(fprop_start, fprop_end)
+            finally:
+                self.set_batch_size(bsz, reallocate=True)
+
         # print results
         header = ('Func', 'Mean', 'Median', 'Min', 'Max', 'Units')
         stats = tuple(stat.lower() for stat in header[1:-1])
@@ -579,3 +1052,27 @@ class Model(NervanaObject):
             neon_logger.display(fmt_nums.format(units='msec', func=step, **out_stats[step]))
         neon_logger.display(sep)
         return out_stats
+
+
+def load_inference(fn, mmap_mode='c'):
+    """
+    Loads a model saved by Model.export_inference, initialized for inference.
+
+    The file is memory mapped and on the CPU backends the weights are bound to
+    views of the mapping (see Model.deserialize), so loading reads no weights
+    until they are used and processes serving the same file share its pages.
+    Other backends copy the weights to the device.
+
+    Arguments:
+        fn (str): packed model file
+        mmap_mode (str, optional): memory map mode, 'c' (the default) lets the
+                                   weights be changed in memory only, 'r' makes
+                                   them read only and None reads the file
+
+    Returns:
+        Model: model allocated without deltas, it can not be trained
+    """
+    pdict = load_packed(fn, mmap_mode=mmap_mode)
+    model = Model(pdict, weights_only=True)
+    model.initialize(pdict['train_input_shape'], inference=True)
+    return model
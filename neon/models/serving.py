@@ -0,0 +1,364 @@
+# ----------------------------------------------------------------------------
+# Copyright 2016 Nervana Systems Inc.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ----------------------------------------------------------------------------
+"""
+Micro-batching inference server.
+
+Concurrent single sample requests are gathered into minibatches that are
+forward propagated by one worker thread, so the model runs at close to its
+batch throughput while each request waits at most a bounded time.
+"""
+from __future__ import division
+import logging
+import threading
+import time
+
+import numpy as np
+
+from neon import NervanaObject
+from neon.util import compat  # noqa, installs the python 3 standard library names
+import json  # noqa
+import queue  # noqa
+from http.server import BaseHTTPRequestHandler, HTTPServer  # noqa
+from socketserver import ThreadingMixIn  # noqa
+try:
+    from concurrent.futures import Future  # noqa
+except ImportError:
+    # python 2 without the futures backport, see InferenceServer
+    Future = None
+
+logger = logging.getLogger(__name__)
+
+
+class _Request(object):
+    """
+    A single sample waiting to be computed.
+    """
+    __slots__ = ('x', 'future', 'arrival')
+
+    def __init__(self, x):
+        self.x = x
+        self.future = Future()
+        self.arrival = time.time()
+
+
+class InferenceServer(NervanaObject):
+    """
+    Serve inference requests for single samples with micro-batches.
+
+    Requests are queued by any number of threads (or coroutines through
+    predict_async).  A worker thread takes the first waiting request, gathers
+    more until the micro-batch holds max_batch samples or the first request
+    has waited max_latency seconds, runs one fprop and resolves the future of
+    every request with the outputs of its sample.
+
+    Models with a single pathway of layers compute exactly the samples of a
+    micro-batch (see Model.set_batch_size), other models compute a full
+    minibatch of the backend batch size.
+
+    Samples are flat numpy arrays with the features in the order of the
+    model's input shape, e.g. (C, H, W), for either layout of the backend.
+
+    Requests are accepted while the server is running, between start and stop,
+    the futures of the others fail with a RuntimeError.  On python 2 the server
+    needs the futures package (the concurrent.futures backport).
+
+    Arguments:
+        model (Model): model to serve, initialized for inference
+        max_batch (int, optional): maximum number of samples per micro-batch.
+                                   Defaults to the batch size the model was
+                                   allocated for.
+        max_latency (float, optional): maximum time in seconds the first
+                                       request of a micro-batch waits for
+                                       more requests.  Defaults to 0.005.
+        name (str, optional): name of the server
+    """
+
+    def __init__(self, model, max_batch=None, max_latency=0.005, name=None):
+        super(InferenceServer, self).__init__(name)
+        if Future is None:
+            raise ImportError("InferenceServer needs concurrent.futures, "
+                              "install the futures package on python 2")
+        assert model.initialized, "Model must be initialized before serving"
+        self.model = model
+        self.max_batch = model.alloc_bsz if max_batch is None else max_batch
+        assert 0 < self.max_batch <= model.alloc_bsz, \
+            "max_batch exceeds the batch size the model was allocated for"
+        self.max_latency = max_latency
+
+        self.bind_batch = model._can_bind_batch_size()
+        self.in_shape = model.layers.in_shape
+        self.nfeatures = int(np.prod(self.in_shape))
+        self.inputs = self.be.iobuf(self.in_shape, batch_major=self.be.batch_major)
+        if self.be.batch_major:
+            self.fm_inputs = self.be.iobuf(self.in_shape)
+
+        self.requests = queue.Queue()
+        self.worker = None
+        self.http_server = None
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self):
+        """
+        Start the worker thread.
+        """
+        if self.worker is None:
+            self.worker = threading.Thread(target=self._run, name="neon-inference")
+            self.worker.daemon = True
+            self.worker.start()
+
+    def stop(self):
+        """
+        Stop the HTTP front end, compute the requests already queued, stop the
+        worker thread and restore the batch size of the model.
+        """
+        if self.http_server is not None:
+            self.http_server.shutdown()
+            self.http_server.server_close()
+            self.http_server = None
+        with self.lock:
+            worker, self.worker = self.worker, None
+            if worker is not None:
+                self.requests.put(None)
+        if worker is not None:
+            worker.join()
+            # requests queued after the worker stopped
+            while not self.requests.empty():
+                self._reject(self.requests.get())
+            if self.bind_batch:
+                self.model.set_batch_size(self.model.alloc_bsz)
+
+    def submit(self, x):
+        """
+        Queue a sample for inference.
+
+        Arguments:
+            x (numpy.ndarray): sample with the number of input features of the model
+
+        Returns:
+            concurrent.futures.Future: resolves to the (nout,) outputs of the model
+        """
+        x = np.asarray(x).reshape(-1)
+        if x.size != self.nfeatures:
+            raise ValueError("Sample has %d features, the model expects %d" %
+                             (x.size, self.nfeatures))
+        request = _Request(x)
+        with self.lock:
+            if self.worker is not None:
+                self.requests.put(request)
+                return request.future
+        self._reject(request)
+        return request.future
+
+    def _reject(self, request):
+        """
+        Fail the future of a request the server will not compute.
+        """
+        if request is not None:
+            request.future.set_exception(RuntimeError("The inference server is not running"))
+
+    def predict(self, x, timeout=None):
+        """
+        Compute the outputs of the model for a sample, blocking until they are ready.
+
+        Arguments:
+            x (numpy.ndarray): sample with the number of input features of the model
+            timeout (float, optional): seconds to wait for the result
+
+        Returns:
+            numpy.ndarray: (nout,) outputs of the model
+        """
+        return self.submit(x).result(timeout)
+
+    def predict_async(self, x, loop=None):
+        """
+        Queue a sample for inference from a coroutine.
+
+        Arguments:
+            x (numpy.ndarray): sample with the number of input features of the model
+            loop (asyncio.AbstractEventLoop, optional): event loop the result is
+                                                        delivered to
+
+        Returns:
+            asyncio.Future: awaitable that resolves to the (nout,) outputs of the model
+        """
+        import asyncio
+        return asyncio.wrap_future(self.submit(x), loop=loop)
+
+    def _run(self):
+        """
+        Worker loop gathering requests into micro-batches.
+        """
+        stopping = False
+        while not stopping:
+            first = self.requests.get()
+            if first is None:
+                break
+            batch = [first]
+            deadline = first.arrival + self.max_latency
+            while len(batch) < self.max_batch:
+                try:
+                    request = self.requests.get(timeout=max(deadline - time.time(), 0))
+                except queue.Empty:
+                    break
+                if request is None:
+                    stopping = True
+                    break
+                batch.append(request)
+            self._compute(batch)
+
+    def _compute(self, batch):
+        """
+        Forward propagate a micro-batch and resolve the futures of its requests.
+        """
+        start = time.time()
+        N = len(batch) if self.bind_batch else self.model.alloc_bsz
+        samples = np.zeros((self.nfeatures, N), dtype=batch[0].x.dtype)
+        for i, request in enumerate(batch):
+            samples[:, i] = request.x
+
+        try:
+            if self.bind_batch:
+                self.model.set_batch_size(N)
+            if self.be.batch_major:
+                fm_inputs = self.fm_inputs.share((self.nfeatures, N))
+                fm_inputs.set(samples)
+                inputs = self.inputs.share((N, self.nfeatures))
+                self.be.to_batch_major(fm_inputs, self.in_shape, inputs)
+            else:
+                inputs = self.inputs.share((self.nfeatures, N))
+                inputs.set(samples)
+            outputs = self.model.fprop(inputs, inference=True).get()
+        except Exception as e:
+            logger.exception("Inference failed for a micro-batch of %d requests", len(batch))
+            for request in batch:
+                request.future.set_exception(e)
+            return
+
+        end = time.time()
+        for i, request in enumerate(batch):
+            request.future.set_result(outputs[:, i].copy())
+
+        with self.lock:
+            self.nrequests += len(batch)
+            self.nbatches += 1
+            waits = [start - request.arrival for request in batch]
+            self.queue_wait += sum(waits)
+            self.max_queue_wait = max([self.max_queue_wait] + waits)
+            self.compute_time += end - start
+            self.max_compute_time = max(self.max_compute_time, end - start)
+
+    def reset_stats(self):
+        """
+        Reset the request statistics.
+        """
+        with self.lock:
+            self.nrequests = 0
+            self.nbatches = 0
+            self.queue_wait = 0.0
+            self.max_queue_wait = 0.0
+            self.compute_time = 0.0
+            self.max_compute_time = 0.0
+
+    def stats(self):
+        """
+        Statistics of the requests served since the last reset.
+
+        Returns:
+            dict: number of requests and micro-batches, the mean micro-batch size, the
+                  mean and maximum time in msec requests waited in the queue and the
+                  mean and maximum compute time in msec of a micro-batch
+        """
+        with self.lock:
+            nbatches = max(self.nbatches, 1)
+            nrequests = max(self.nrequests, 1)
+            return dict(requests=self.nrequests,
+                        batches=self.nbatches,
+                        mean_batch_size=self.nrequests / nbatches,
+                        mean_queue_wait=1000 * self.queue_wait / nrequests,
+                        max_queue_wait=1000 * self.max_queue_wait,
+                        mean_compute_time=1000 * self.compute_time / nbatches,
+                        max_compute_time=1000 * self.max_compute_time)
+
+    def serve_http(self, host='127.0.0.1', port=0):
+        """
+        Start a local HTTP front end for testing in a background thread.
+
+        POST a JSON object {"inputs": sample} or {"inputs": [sample, ...]} to any path
+        to get {"outputs": ...} back in the same nesting, GET /stats returns the
+        statistics of the server.
+
+        Arguments:
+            host (str, optional): address to bind to.  Defaults to localhost.
+            port (int, optional): port to listen on, 0 picks a free port.
+
+        Returns:
+            tuple: (host, port) the front end listens on
+        """
+        self.start()
+        self.http_server = _ThreadingHTTPServer((host, port), _InferenceHandler)
+        self.http_server.inference_server = self
+        thread = threading.Thread(target=self.http_server.serve_forever, name="neon-http")
+        thread.daemon = True
+        thread.start()
+        return self.http_server.server_address
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _InferenceHandler(BaseHTTPRequestHandler):
+    """
+    JSON request handler of the HTTP front end.
+    """
+
+    def _reply(self, code, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/stats':
+            self._reply(200, self.server.inference_server.stats())
+        else:
+            self._reply(404, {'error': 'unknown path %s' % self.path})
+
+    def do_POST(self):
+        server = self.server.inference_server
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            inputs = np.array(json.loads(self.rfile.read(length).decode('utf-8'))['inputs'],
+                              dtype=np.float64)
+            single = inputs.ndim == 1
+            futures = [server.submit(x) for x in ([inputs] if single else inputs)]
+            outputs = [f.result().tolist() for f in futures]
+        except Exception as e:
+            self._reply(400, {'error': str(e)})
+            return
+        self._reply(200, {'outputs': outputs[0] if single else outputs})
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
@@ -0,0 +1,103 @@
+# ----------------------------------------------------------------------------
+# Copyright 2016 Nervana Systems Inc.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ----------------------------------------------------------------------------
+"""
+Beam search over the outputs of single time step decoders.
+"""
+import numpy as np
+
+
+def beam_search(be, step, live, nout, beam_size, num_steps, end_index=None, end_after=0):
+    """
+    Keep the beam_size most likely partial sequences for each input of a minibatch.
+
+    The decoder runs one time step per hypothesis and step.  The decoder states of all
+    the hypotheses are stored side by side in (rows, beam_size * bsz) buffers and
+    reordered on the device after every step.  Hypotheses that produced the end token
+    can only be extended by the end token, at no cost, so their score stays fixed.
+
+    Arguments:
+        be (Backend): backend of the decoder
+        step (function): runs the decoder for one time step from the states in live and
+                         returns the (nout, bsz) output probabilities.  Called with None
+                         for the first step, then with the (bsz,) tokens the hypothesis
+                         produced in the previous step.
+        live (list): tensors holding the states of the decoder, updated by step
+        nout (int): number of tokens
+        beam_size (int): number of hypotheses kept for each input
+        num_steps (int): number of steps to decode
+        end_index (int, optional): token ending a sequence, None to decode num_steps
+        end_after (int, optional): first step at which the end token ends a hypothesis,
+                                   e.g. 1 for sequences starting with the end token.
+                                   Defaults to 0.
+
+    Returns:
+        ndarray: (num_steps, bsz) tokens of the most likely sequence of each input, the
+                 steps after all the sequences ended hold the end token
+    """
+    bsz, nbeam = be.bsz, beam_size
+    cols = np.arange(bsz)
+    states = [be.empty((buf.shape[0], nbeam * bsz)) for buf in live]
+    states_tmp = [be.empty_like(s) for s in states]
+    reorder = be.empty((1, nbeam * bsz), dtype=np.int32)
+    logprob = be.empty((nout, nbeam * bsz))
+
+    tokens = np.zeros((num_steps, nbeam, bsz), dtype=np.int32)
+    scores = np.full((nbeam, bsz), -np.inf, dtype=np.float32)
+    scores[0] = 0  # hypotheses start out identical, only expand the first one
+    finished = np.zeros((nbeam, bsz), dtype=bool)
+
+    for t in range(num_steps):
+        for beam in range(nbeam):
+            block = slice(beam * bsz, (beam + 1) * bsz)
+            if t > 0:
+                for buf, state in zip(live, states):
+                    buf[:] = state[:, block]
+                prob = step(tokens[t - 1, beam])
+            elif beam == 0:
+                prob = step(None)
+            # the first step is shared by all the hypotheses
+            for buf, state in zip(live, states):
+                state[:, block] = buf
+            logprob[:, block] = be.safelog(prob)
+
+        cand = logprob.get().reshape((nout, nbeam, bsz)).transpose(1, 0, 2)
+        cand = scores[:, np.newaxis, :] + cand
+        if end_index is not None:
+            # finished hypotheses can only be extended by the end token at no cost
+            done_beam, done_col = np.nonzero(finished)
+            cand[done_beam, :, done_col] = -np.inf
+            cand[done_beam, end_index, done_col] = scores[done_beam, done_col]
+
+        cand = cand.reshape((nbeam * nout, bsz))
+        top = np.argsort(-cand, axis=0, kind='mergesort')[:nbeam]
+        src, new_token = top // nout, top % nout
+
+        scores = cand[top, cols]
+        tokens[:t] = tokens[:t][:, src, cols]
+        tokens[t] = new_token
+
+        if end_index is not None:
+            finished = finished[src, cols] | ((new_token == end_index) & (t >= end_after))
+            if finished.all():
+                tokens[t + 1:] = end_index
+                break
+
+        reorder.set((src * bsz + cols).reshape((1, -1)))
+        for state, tmp in zip(states, states_tmp):
+            tmp[:] = state.take(reorder, axis=1)
+            state[:] = tmp
+
+    best = np.argmax(scores, axis=0)
+    return tokens[:, best, cols]
@@ -16,13 +16,20 @@ import importlib
 import logging
 import os
 import pkgutil
+import struct
 import sys
+import threading
 import appdirs
+import numpy as np
 
 from neon.util.compat import pickle, pickle_load
 
 logger = logging.getLogger(__name__)
 
+PACKED_MAGIC = b'NEONPACK'
+PACKED_EXT = '.npk'
+CHUNKED_MAGIC = b'NEONCHNK'
+
 
 def get_cache_dir(subdir=None):
     """
@@ -92,6 +99,11 @@ def save_obj(obj, save_path):
     extension in brackets):
 
         * python pickle (.pkl)
+        * packed file with raw, aligned arrays that load as memory maps (.npk),
+          see save_packed
+
+    The object is written to a temporary file next to save_path that is then
+    renamed, so an existing file at save_path is never left partially written.
 
     Arguments:
         obj (object): the python object to be saved.
@@ -107,7 +119,66 @@ def save_obj(obj, save_path):
     logger.debug("serializing object to: %s", save_path)
     ensure_dirs_exist(save_path)
 
-    pickle.dump(obj, open(save_path, 'wb'), 2)
+    tmp_path = save_path + '.tmp'
+    if save_path.endswith(PACKED_EXT):
+        save_packed(obj, tmp_path)
+    else:
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(obj, f, 2)
+    os.rename(tmp_path, save_path)
+
+
+class CheckpointWriter(object):
+    """
+    Runs checkpoint writes in a background thread, one at a time.
+
+    The caller passes a snapshot of what to save (e.g. the output of
+    Model.serialize, which copies the tensors), so training can continue while
+    the snapshot is pickled and written.  A write requested while the previous
+    one is still running waits for it and runs synchronously, which keeps at
+    most one snapshot in flight.  The thread is not a daemon, so pending writes
+    complete before the interpreter exits.
+    """
+
+    def __init__(self):
+        self.thread = None
+        self.error = None
+
+    def write(self, func, *args):
+        """
+        Run a write function, in the background unless a write is still running.
+
+        Arguments:
+            func (function): function doing the write, e.g. save_obj
+            args: arguments of func
+        """
+        if self.thread is not None and self.thread.is_alive():
+            logger.info("Previous checkpoint write still running, writing synchronously")
+            self.wait()
+            func(*args)
+            return
+        self.wait()
+        self.thread = threading.Thread(target=self._run, args=(func, args),
+                                       name="neon-checkpoint")
+        self.thread.start()
+
+    def _run(self, func, args):
+        try:
+            func(*args)
+        except Exception as e:
+            logger.exception("Checkpoint write failed")
+            self.error = e
+
+    def wait(self):
+        """
+        Wait for the pending write and raise the error it failed with, if any.
+        """
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
 
 
 def load_obj(load_path):
@@ -116,6 +187,8 @@ def load_obj(load_path):
     currently support the following file formats:
 
         * python pickle (.pkl)
+        * packed file (.npk), the arrays are copy on write memory maps of the file
+        * chunked file written by save_chunked (any extension)
 
     Arguments:
         load_path (str): where to the load the serialized object (full path
@@ -124,11 +197,18 @@ def load_obj(load_path):
     """
     if isinstance(load_path, str):
         load_path = os.path.expandvars(os.path.expanduser(load_path))
+        if load_path.endswith(PACKED_EXT):
+            return load_packed(load_path)
         if load_path.endswith('.gz'):
             import gzip
             load_path = gzip.open(load_path, 'rb')
         else:
-            load_path = open(load_path, 'rb')
+            fname = load_path
+            load_path = open(fname, 'rb')
+            if load_path.read(len(CHUNKED_MAGIC)) == CHUNKED_MAGIC:
+                load_path.close()
+                return load_chunked(fname)
+            load_path.seek(0)
     fname = load_path.name
 
     logger.debug("deserializing object from:  %s", fname)
@@ -142,17 +222,390 @@ def load_obj(load_path):
         raise AttributeError(msg)
 
 
+class PackedArray(object):
+    """
+    Reference to an array stored in the data block of a packed file.
+
+    Arguments:
+        offset (int): byte offset of the array in the data block
+        shape (tuple): shape of the array
+        dtype (str): numpy dtype string of the array
+    """
+
+    def __init__(self, offset, shape, dtype):
+        self.offset = offset
+        self.shape = shape
+        self.dtype = dtype
+
+
+def save_packed(obj, save_path, alignment=64):
+    """
+    Dumps a python data structure to a packed file.  Every numeric numpy array
+    in the (nested dict, list and tuple) structure is stored raw in one
+    contiguous data block, each aligned to alignment bytes, and the rest of the
+    structure is pickled into the header.  The arrays of a packed file can be
+    memory mapped on load, see load_packed.
+
+    Arguments:
+        obj (object): the python object to be saved
+        save_path (str): where to write the packed file (full path and file name)
+        alignment (int, optional): byte alignment of the arrays.  Defaults to 64.
+    """
+    arrays = []
+
+    def pack(item, offset):
+        if isinstance(item, np.ndarray) and not item.dtype.hasobject:
+            offset = -(-offset // alignment) * alignment
+            arrays.append((offset, item))
+            return PackedArray(offset, item.shape, item.dtype.str), offset + item.nbytes
+        if isinstance(item, dict):
+            packed = dict()
+            for key, val in item.items():
+                packed[key], offset = pack(val, offset)
+            return packed, offset
+        if isinstance(item, (list, tuple)):
+            packed = []
+            for val in item:
+                val, offset = pack(val, offset)
+                packed.append(val)
+            return type(item)(packed), offset
+        return item, offset
+
+    packed, _ = pack(obj, 0)
+    header = pickle.dumps(packed, 2)
+    start = len(PACKED_MAGIC) + 16 + len(header)
+    data_offset = -(-start // alignment) * alignment
+
+    save_path = os.path.expandvars(os.path.expanduser(save_path))
+    logger.debug("packing object to: %s", save_path)
+    ensure_dirs_exist(save_path)
+    with open(save_path, 'wb') as f:
+        f.write(PACKED_MAGIC)
+        f.write(struct.pack('<QQ', len(header), data_offset))
+        f.write(header)
+        position = start
+        for offset, ary in arrays:
+            f.write(b'\0' * (data_offset + offset - position))
+            f.write(np.ascontiguousarray(ary).data)
+            position = data_offset + offset + ary.nbytes
+
+
+def load_packed(load_path, mmap_mode='c'):
+    """
+    Loads a packed file written by save_packed.  With a memory map the arrays are
+    views of the mapped file, so loading does not read or copy the array data.
+
+    Arguments:
+        load_path (str): where to load the packed file from (full path and file name)
+        mmap_mode (str, optional): numpy memory map mode of the arrays, 'r' for read
+                                   only, 'c' for copy on write (the default) or None to
+                                   read the arrays into memory
+
+    Returns:
+        the python object with the arrays restored
+    """
+    load_path = os.path.expandvars(os.path.expanduser(load_path))
+    logger.debug("loading packed object from: %s", load_path)
+    with open(load_path, 'rb') as f:
+        if f.read(len(PACKED_MAGIC)) != PACKED_MAGIC:
+            raise ValueError("%s is not a packed file" % load_path)
+        header_len, data_offset = struct.unpack('<QQ', f.read(16))
+        packed = pickle_load(f)
+
+    # the file is mapped from its start, which keeps the arrays aligned in memory
+    block = None if mmap_mode is None else np.memmap(load_path, dtype=np.uint8, mode=mmap_mode)
+
+    def unpack(item):
+        if isinstance(item, PackedArray):
+            dtype = np.dtype(item.dtype)
+            count = int(np.prod(item.shape))
+            offset = data_offset + item.offset
+            if block is None:
+                # np.fromfile only takes an offset from numpy 1.17
+                with open(load_path, 'rb') as f:
+                    f.seek(offset)
+                    return np.fromfile(f, dtype, count).reshape(item.shape)
+            return block[offset:offset + count * dtype.itemsize].view(dtype).reshape(item.shape)
+        if isinstance(item, dict):
+            return {key: unpack(val) for key, val in item.items()}
+        if isinstance(item, (list, tuple)):
+            return type(item)(unpack(val) for val in item)
+        return item
+
+    return unpack(packed)
+
+
+class ChunkedArray(object):
+    """
+    Array stored in compressed chunks in a chunked file.
+
+    Arguments:
+        shape (tuple): shape of the array
+        dtype (str): numpy dtype string of the array
+        chunks (list): compressed bytes of each chunk, None for the chunks that are
+                       the same as in the base file
+    """
+
+    def __init__(self, shape, dtype, chunks):
+        self.shape = shape
+        self.dtype = dtype
+        self.chunks = chunks
+
+
+def _compressor(compression):
+    if compression == 'zlib':
+        import zlib
+        return zlib.compress, zlib.decompress
+    if compression == 'lzma':
+        try:
+            import lzma
+        except ImportError:
+            try:
+                from backports import lzma
+            except ImportError:
+                raise ImportError("lzma compression needs python 3 or the backports.lzma "
+                                  "package, use 'zlib'")
+        return lzma.compress, lzma.decompress
+    if compression is None:
+        return bytes, bytes
+    raise ValueError("Unknown compression %s, use 'zlib', 'lzma' or None" % compression)
+
+
+class _SerialExecutor(object):
+    """
+    Stand-in for a ThreadPoolExecutor that runs the tasks as they are submitted.
+    """
+
+    class _Done(object):
+        def __init__(self, value):
+            self.value = value
+
+        def result(self):
+            return self.value
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def submit(self, func, *args):
+        return self._Done(func(*args))
+
+
+def _executor(nthreads):
+    """
+    Return a pool of nthreads threads, or a serial executor on python 2 without the
+    futures package (the concurrent.futures backport).
+    """
+    try:
+        from concurrent.futures import ThreadPoolExecutor
+    except ImportError:
+        logger.warning("concurrent.futures not found, processing the chunks in one thread")
+        return _SerialExecutor()
+    return ThreadPoolExecutor(max_workers=nthreads)
+
+
+def _array_paths(item, path=()):
+    """
+    Generate the (path, array) pairs of the numeric arrays in a nested structure.
+    """
+    if isinstance(item, np.ndarray) and not item.dtype.hasobject:
+        yield path, item
+    elif isinstance(item, dict):
+        for key, val in item.items():
+            for pair in _array_paths(val, path + (key,)):
+                yield pair
+    elif isinstance(item, (list, tuple)):
+        for ind, val in enumerate(item):
+            for pair in _array_paths(val, path + (ind,)):
+                yield pair
+
+
+def _replace_arrays(item, func, path=()):
+    """
+    Copy a nested structure with every numeric array replaced by func(path, array).
+    """
+    if isinstance(item, ChunkedArray) or \
+            (isinstance(item, np.ndarray) and not item.dtype.hasobject):
+        return func(path, item)
+    if isinstance(item, dict):
+        return {key: _replace_arrays(val, func, path + (key,)) for key, val in item.items()}
+    if isinstance(item, (list, tuple)):
+        return type(item)(_replace_arrays(val, func, path + (ind,))
+                          for ind, val in enumerate(item))
+    return item
+
+
+def _byte_chunks(ary, chunk_size):
+    data = memoryview(np.ascontiguousarray(ary).reshape(-1).view(np.uint8))
+    return [data[i:i + chunk_size] for i in range(0, max(len(data), 1), chunk_size)]
+
+
+def save_chunked(obj, save_path, base=None, compression='zlib', chunk_size=1 << 20,
+                 nthreads=4):
+    """
+    Dumps a python data structure to a chunked file.  Every numeric numpy array in the
+    (nested dict, list and tuple) structure is split into chunks of chunk_size bytes
+    that are compressed by a pool of nthreads threads (in a single thread on python 2
+    without the futures package).
+
+    Given a base, the file is a delta of it: only the chunks that differ from the
+    chunks of the base at the same place in the structure are stored, e.g. the
+    parameters of frozen layers are not.  load_obj reads the base file when loading
+    the delta, so it has to be kept next to it.
+
+    Arguments:
+        obj (object): the python object to be saved
+        save_path (str): where to write the chunked file (full path and file name)
+        base (tuple, optional): (path, digests) of a full chunked file, as returned
+                                by save_chunked
+        compression (str, optional): 'zlib' (the default), 'lzma' (python 3 or the
+                                     backports.lzma package) or None
+        chunk_size (int, optional): chunk size in bytes.  Defaults to 1 MB.
+        nthreads (int, optional): number of compression threads.  Defaults to 4.
+
+    Returns:
+        tuple: (save_path, digests), the base of later deltas for a full file, the base
+               passed in for a delta
+    """
+    import hashlib
+    compress, _ = _compressor(compression)
+    base_path, base_digests = base if base is not None else (None, dict())
+    save_path = os.path.expandvars(os.path.expanduser(save_path))
+
+    def process(chunk, base_digest):
+        if sys.version_info[0] < 3:
+            # python 2 compressors do not take memoryviews
+            chunk = chunk.tobytes()
+        # hashing and compressing release the GIL for large buffers
+        digest = hashlib.sha1(chunk).digest()
+        if digest == base_digest:
+            return digest, None
+        return digest, compress(chunk)
+
+    with _executor(nthreads) as pool:
+        futures = dict()
+        for path, ary in _array_paths(obj):
+            chunks = _byte_chunks(ary, chunk_size)
+            old = base_digests.get(path)
+            if old is None or len(old) != len(chunks):
+                old = [None] * len(chunks)
+            futures[path] = [pool.submit(process, chunk, digest)
+                             for chunk, digest in zip(chunks, old)]
+
+        digests = dict()
+
+        def chunked(path, ary):
+            results = [f.result() for f in futures[path]]
+            digests[path] = [digest for digest, _ in results]
+            return ChunkedArray(ary.shape, ary.dtype.str, [data for _, data in results])
+
+        packed = _replace_arrays(obj, chunked)
+
+    header = dict(compression=compression, chunk_size=chunk_size,
+                  base=None if base_path is None else os.path.relpath(
+                      base_path, os.path.dirname(save_path)),
+                  obj=packed)
+    logger.debug("saving chunked object to: %s", save_path)
+    ensure_dirs_exist(save_path)
+    tmp_path = save_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(CHUNKED_MAGIC)
+        pickle.dump(header, f, 2)
+    os.rename(tmp_path, save_path)
+    return base if base is not None else (save_path, digests)
+
+
+def load_chunked(load_path, nthreads=4):
+    """
+    Loads a chunked file written by save_chunked, reading the base of a delta.
+
+    Arguments:
+        load_path (str): where to load the chunked file from (full path and file name)
+        nthreads (int, optional): number of decompression threads.  Defaults to 4.
+
+    Returns:
+        the python object with the arrays restored
+    """
+    load_path = os.path.expandvars(os.path.expanduser(load_path))
+    logger.debug("loading chunked object from: %s", load_path)
+    with open(load_path, 'rb') as f:
+        if f.read(len(CHUNKED_MAGIC)) != CHUNKED_MAGIC:
+            raise ValueError("%s is not a chunked file" % load_path)
+        header = pickle_load(f)
+    _, decompress = _compressor(header['compression'])
+    chunk_size = header['chunk_size']
+
+    base_arrays = dict()
+    if header['base'] is not None:
+        base_path = os.path.join(os.path.dirname(load_path), header['base'])
+        base_arrays = dict(_array_paths(load_chunked(base_path, nthreads)))
+
+    def fill(dst, chunk):
+        dst[:] = np.frombuffer(decompress(chunk), dtype=np.uint8)
+
+    with _executor(nthreads) as pool:
+        futures = []
+
+        def unchunk(path, item):
+            ary = np.empty(item.shape, dtype=np.dtype(item.dtype))
+            data = ary.reshape(-1).view(np.uint8)
+            base = base_arrays[path].reshape(-1).view(np.uint8) if path in base_arrays \
+                else None
+            for ind, chunk in enumerate(item.chunks):
+                dst = data[ind * chunk_size:(ind + 1) * chunk_size]
+                if chunk is None:
+                    dst[:] = base[ind * chunk_size:(ind + 1) * chunk_size]
+                else:
+                    futures.append(pool.submit(fill, dst, chunk))
+            return ary
+
+        obj = _replace_arrays(header['obj'], unchunk)
+        for f in futures:
+            f.result()
+    return obj
+
+
+# classes by module path and by class name (None for names of several classes),
+# NervanaObject subclasses are registered when they are defined
+_class_registry = dict()
+_class_names = dict()
+
+
+def register_class(cls):
+    """
+    Register a class to be found by load_class without importing modules.
+
+    Arguments:
+        cls (class): class to register
+    """
+    _class_registry[cls.__module__ + '.' + cls.__name__] = cls
+    if _class_names.get(cls.__name__, cls) is not cls:
+        _class_names[cls.__name__] = None
+    else:
+        _class_names[cls.__name__] = cls
+
+
 def load_class(ctype):
     """
     Helper function to take a string with the neon module and
     classname then import and return  the class object
 
+    Registered classes are looked up first, see register_class.
+
     Arguments:
         ctype (str): string with the neon module and class
                      (e.g. 'neon.layers.layer.Linear')
     Returns:
         class
     """
+    clss = _class_registry.get(ctype)
+    if clss is None and '.' not in ctype:
+        clss = _class_names.get(ctype)
+    if clss is not None:
+        return clss
+
     # extract class name and import neccessary module.
     class_path = ctype
     parts = class_path.split('.')
@@ -0,0 +1,118 @@
+# ----------------------------------------------------------------------------
+# Copyright 2016 Nervana Systems Inc.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ----------------------------------------------------------------------------
+"""
+Test the batch major layout of the CPU backend against the default layout
+"""
+import numpy as np
+import pytest
+
+from neon.backends import gen_backend
+from neon.data import ArrayIterator
+from neon.initializers import Gaussian, Uniform
+from neon.layers import (Affine, Conv, Pooling, GeneralizedCost, LSTM,
+                         MergeBroadcast, Sequential)
+from neon.models import Model
+from neon.transforms import SumSquared, Explin, Rectlin, Softmax, Tanh
+
+bsz = 16
+lshape = (3, 8, 8)
+nclass = 5
+
+
+def make_layers(pool_op):
+    init = Gaussian(scale=0.1)
+    bias = Uniform(low=-0.1, high=0.1)
+    return [Conv((3, 3, 4), init=init, bias=bias, padding=1, activation=Rectlin()),
+            Pooling(2, op=pool_op),
+            Conv((1, 1, 6), init=init, batch_norm=True, activation=Explin()),
+            Conv((3, 3, 6), init=init, bias=bias, strides=2, padding=1, activation=Rectlin(),
+                 fuse=True),
+            Pooling('all', op='avg'),
+            Affine(8, init=init, batch_norm=True, activation=Rectlin()),
+            Affine(nclass, init=init, bias=bias, activation=Softmax())]
+
+
+def train_step(batch_major, pool_op, X, y, params=None):
+    gen_backend(backend='cpu', batch_size=bsz, rng_seed=0, datatype=np.float64,
+                batch_major=batch_major)
+    dataset = ArrayIterator(X, y, nclass=nclass, lshape=lshape)
+    model = Model(layers=make_layers(pool_op))
+    cost = GeneralizedCost(costfunc=SumSquared())
+    model.initialize(dataset, cost)
+
+    layers = [l for l in model.layers_to_optimize if hasattr(l, 'W')]
+    if params is None:
+        params = [l.W.get() for l in layers]
+    for l, W in zip(layers, params):
+        l.W.set(W)
+
+    x, t = next(iter(dataset))
+    if batch_major:
+        assert x.shape == (bsz, np.prod(lshape))
+        assert all(l.outputs.shape[0] == bsz for l in model.layers.layers if l.owns_output)
+    outputs = model.fprop(x)
+    model.bprop(cost.get_errors(outputs, t))
+    grads = [l.dW.get() for l in layers]
+    return params, outputs.get(), grads
+
+
+@pytest.mark.parametrize('pool_op', ['max', 'avg'])
+def test_batch_major_model(pool_op):
+    rng = np.random.RandomState(0)
+    X = rng.uniform(-1, 1, (2 * bsz, np.prod(lshape)))
+    y = rng.randint(nclass, size=2 * bsz)
+
+    params, ref_outputs, ref_grads = train_step(False, pool_op, X, y)
+    _, outputs, grads = train_step(True, pool_op, X, y, params)
+
+    assert np.allclose(outputs, ref_outputs, rtol=0, atol=1e-10)
+    for grad, ref_grad in zip(grads, ref_grads):
+        assert np.allclose(grad, ref_grad, rtol=0, atol=1e-10)
+
+
+def test_batch_major_iterator():
+    be = gen_backend(backend='cpu', batch_size=bsz, datatype=np.float64, batch_major=True)
+    X = np.random.uniform(-1, 1, (bsz + 3, np.prod(lshape)))
+    dataset = ArrayIterator(X, lshape=lshape)
+    assert dataset.nbatches == 2
+
+    x, t = next(iter(dataset))
+    assert x.shape == (bsz, np.prod(lshape))
+    assert np.array_equal(x.get(), np.moveaxis(X[:bsz].reshape((-1,) + lshape), 1, -1)
+                          .reshape((bsz, -1)))
+    # autoencoder targets are feature major
+    assert np.array_equal(t.get(), X[:bsz].T)
+
+    # the layout conversions are inverses of each other
+    fm = be.iobuf(lshape)
+    be.to_feature_major(x, lshape, fm)
+    assert np.array_equal(fm.get(), X[:bsz].T)
+    bm = be.iobuf(lshape, batch_major=True)
+    be.to_batch_major(fm, lshape, bm)
+    assert np.array_equal(bm.get(), x.get())
+
+
+def test_batch_major_unsupported():
+    gen_backend(backend='cpu', batch_size=bsz, batch_major=True)
+    init = Gaussian(scale=0.1)
+    for layers in ([LSTM(8, init, activation=Tanh(), gate_activation=Tanh())],
+                   [MergeBroadcast([Sequential([Affine(4, init)]), Sequential([Affine(4, init)])],
+                                   merge="stack")]):
+        model = Model(layers=layers)
+        with pytest.raises(NotImplementedError):
+            model.initialize((8, 1))
+
+    with pytest.raises(ValueError):
+        gen_backend(backend='gpu', batch_major=True)
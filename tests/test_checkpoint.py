@@ -0,0 +1,223 @@
+# ----------------------------------------------------------------------------
+# Copyright 2016 Nervana Systems Inc.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ----------------------------------------------------------------------------
+"""
+Test checkpointing during training
+"""
+import os
+import signal
+import threading
+
+import h5py
+import numpy as np
+import pytest
+
+from neon.callbacks.callbacks import Callback, Callbacks, SerializeModelCallback
+from neon.data import ArrayIterator
+from neon.initializers import Gaussian
+from neon.layers import Affine, GeneralizedCost
+from neon.models import Model
+from neon.optimizers import GradientDescentMomentum
+from neon.transforms import Rectlin, Logistic, SumSquared
+from neon.util import persist
+from neon.util.persist import CheckpointWriter, load_obj, save_obj
+
+
+def make_model(be, nfeatures=16, nclass=4):
+    init = Gaussian(scale=0.1)
+    X = be.rng.uniform(-1, 1, (2 * be.bsz, nfeatures))
+    y = be.rng.randint(nclass, size=2 * be.bsz)
+    train_set = ArrayIterator(X, y, nclass=nclass)
+    model = Model([Affine(8, init=init, activation=Rectlin()),
+                   Affine(nclass, init=init, activation=Logistic())])
+    model.optimizer = GradientDescentMomentum(learning_rate=0.1, momentum_coef=0.9)
+    model.initialize(train_set, cost=GeneralizedCost(costfunc=SumSquared()))
+    return model, train_set
+
+
+def train_epoch(model, train_set):
+    for x, t in train_set:
+        model.bprop(model.cost.get_errors(model.fprop(x), t))
+        model.optimizer.optimize(model.layers_to_optimize, epoch=model.epoch_index)
+
+
+def test_checkpoint_writer(tmpdir):
+    fn = str(tmpdir.join('obj.pkl'))
+    release = threading.Event()
+    writes = []
+
+    def slow_write(obj, path):
+        release.wait()
+        writes.append(obj)
+        save_obj(obj, path)
+
+    writer = CheckpointWriter()
+    writer.write(slow_write, 1, fn)
+    assert writer.thread.is_alive()
+    # the previous write is still running, the next one is synchronous
+    threading.Timer(0.05, release.set).start()
+    writer.write(slow_write, 2, fn)
+    assert writes == [1, 2]
+    writer.wait()
+    assert load_obj(fn) == 2
+    assert not os.path.exists(fn + '.tmp')
+
+    def failing_write():
+        raise IOError("disk full")
+
+    writer.write(failing_write)
+    with pytest.raises(IOError):
+        writer.wait()
+
+
+@pytest.mark.parametrize('async_write', [True, False])
+def test_serialize_history(backend_cpu64, tmpdir, async_write):
+    model, train_set = make_model(backend_cpu64)
+    save_path = str(tmpdir.join('model.pkl'))
+    callback = SerializeModelCallback(save_path, history=2, async_write=async_write)
+
+    for epoch in range(3):
+        model.epoch_index = epoch
+        train_epoch(model, train_set)
+        callback.on_epoch_end(None, model, epoch)
+        weights = model.layers_to_optimize[0].W.get()
+    callback.on_train_end(None, model)
+
+    assert sorted(os.listdir(str(tmpdir))) == ['model.pkl', 'model_1.pkl', 'model_2.pkl']
+    assert os.readlink(save_path) == 'model_2.pkl'
+    pdict = load_obj(save_path)
+    assert pdict['epoch_index'] == 3
+    assert np.array_equal(pdict['model']['config']['layers'][0]['params']['W'], weights)
+
+
+class SignalCallback(Callback):
+    """
+    Sends a signal to the process at the end of a minibatch.
+    """
+    def __init__(self, epoch, minibatch, signum):
+        super(SignalCallback, self).__init__()
+        self.epoch = epoch
+        self.minibatch = minibatch
+        self.signum = signum
+
+    def on_minibatch_end(self, callback_data, model, epoch, minibatch):
+        if (epoch, minibatch) == (self.epoch, self.minibatch):
+            os.kill(os.getpid(), self.signum)
+
+
+@pytest.mark.parametrize('signum, minibatch, error, nextra',
+                         [(signal.SIGTERM, 1, SystemExit, 5),
+                          (signal.SIGINT, 0, KeyboardInterrupt, 5),
+                          (signal.SIGTERM, 0, SystemExit, 0)])
+def test_resume_mid_epoch(backend_cpu64, tmpdir, signum, minibatch, error, nextra):
+    be = backend_cpu64
+    model, train_set = make_model(be)
+    # a partial last minibatch makes the epochs start at different examples, without
+    # one the minibatches skipped when resuming are only those of the resumed epoch
+    X = be.rng.uniform(-1, 1, (2 * be.bsz + nextra, 16))
+    y = be.rng.randint(4, size=X.shape[0])
+    pdict = model.serialize(keep_states=True)
+    pdict['epoch_index'] = 0
+    num_epochs = 3
+
+    def fit(model, name, extra_callback=None):
+        dataset = ArrayIterator(X, y, nclass=4)
+        callbacks = Callbacks(model, progress_bar=False, output_file=str(tmpdir.join(name)),
+                              save_path=str(tmpdir.join('model.pkl')))
+        if extra_callback is not None:
+            callbacks.add_callback(extra_callback)
+        model.fit(dataset, GeneralizedCost(costfunc=SumSquared()),
+                  GradientDescentMomentum(learning_rate=0.1, momentum_coef=0.9),
+                  num_epochs, callbacks)
+
+    ref_model = Model(pdict)
+    fit(ref_model, 'ref.h5')
+
+    # stopped in the second epoch
+    model = Model(pdict)
+    with pytest.raises(error):
+        fit(model, 'stopped.h5', SignalCallback(1, minibatch, signum))
+    assert signal.getsignal(signum) == signal.SIG_DFL
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    checkpoint = load_obj(str(tmpdir.join('model.pkl')))
+    assert checkpoint['epoch_index'] == 1
+    assert checkpoint['train_state']['minibatch'] == minibatch + 1
+
+    model = Model(str(tmpdir.join('model.pkl')))
+    fit(model, 'resumed.h5')
+    assert model.epoch_index == num_epochs
+    assert model.minibatch_markers == ref_model.minibatch_markers
+    for l, l_ref in zip(model.layers_to_optimize, ref_model.layers_to_optimize):
+        assert np.allclose(l.W.get(), l_ref.W.get(), rtol=0, atol=1e-12)
+
+    with h5py.File(str(tmpdir.join('ref.h5')), 'r') as ref, \
+            h5py.File(str(tmpdir.join('resumed.h5')), 'r') as resumed:
+        assert np.array_equal(resumed['time_markers/minibatch'][:],
+                              ref['time_markers/minibatch'][:])
+
+
+@pytest.mark.parametrize('compression', ['zlib', 'lzma'])
+def test_delta_checkpoints(backend_cpu64, tmpdir, compression):
+    init = Gaussian(scale=0.1)
+    model = Model([Affine(64, init=init, activation=Rectlin()),
+                   Affine(64, init=init, activation=Rectlin()),
+                   Affine(4, init=init, activation=Logistic())])
+    model.initialize((256, 1))
+    save_path = str(tmpdir.join('model.pkl'))
+    callback = SerializeModelCallback(save_path, history=3, full_freq=2,
+                                      compression=compression)
+
+    # only the last layers are trained, the first one is frozen
+    weights = []
+    for epoch in range(5):
+        model.epoch_index = epoch
+        for l in model.layers_to_optimize[1:]:
+            l.W[:] = l.W + 0.01
+        callback.on_epoch_end(None, model, epoch)
+        weights.append([l.W.get() for l in model.layers_to_optimize])
+        if epoch == 3:
+            callback.writer.wait()
+            # the delta of epoch 1 still needs the full checkpoint of epoch 0
+            files = sorted(os.listdir(str(tmpdir)))
+            assert files == ['model.pkl'] + ['model_%d.pkl' % e for e in range(4)]
+            full = os.path.getsize(str(tmpdir.join('model_2.pkl')))
+            assert os.path.getsize(str(tmpdir.join('model_3.pkl'))) < 0.5 * full
+    callback.on_train_end(None, model)
+
+    assert sorted(os.listdir(str(tmpdir))) == ['model.pkl'] + \
+        ['model_%d.pkl' % e for e in range(2, 5)]
+    for epoch in range(2, 5):
+        pdict = load_obj(str(tmpdir.join('model_%d.pkl' % epoch)))
+        assert pdict['epoch_index'] == epoch + 1
+        layers = [l for l in pdict['model']['config']['layers'] if 'params' in l]
+        for layer, W in zip(layers, weights[epoch]):
+            assert np.array_equal(layer['params']['W'], W)
+
+    with pytest.raises(ValueError):
+        SerializeModelCallback(save_path, full_freq=2)
+
+
+def test_chunked_serial(tmpdir, monkeypatch):
+    # without concurrent.futures (python 2 without the backport) the chunks are
+    # processed one at a time
+    monkeypatch.setattr(persist, '_executor', lambda nthreads: persist._SerialExecutor())
+    obj = dict(W=np.random.rand(100, 30), b=[np.arange(7)], epoch_index=3)
+    path, digests = persist.save_chunked(obj, str(tmpdir.join('full.pkl')), chunk_size=1024)
+    obj['W'][:10] = 0
+    persist.save_chunked(obj, str(tmpdir.join('delta.pkl')), base=(path, digests),
+                         chunk_size=1024)
+    out = load_obj(str(tmpdir.join('delta.pkl')))
+    assert np.array_equal(out['W'], obj['W'])
+    assert np.array_equal(out['b'][0], obj['b'][0])
+    assert out['epoch_index'] == 3
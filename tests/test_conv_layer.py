@@ -481,3 +481,48 @@ class ConvLayerRef(object):
         np.multiply(self.updates, epsilon, out=self.updates)
         # skip updating weights, just return the dW and deltas
         # np.subtract(self.weights, self.updates, out=self.weights)
+
+
+def block_diagonal_filters(W, nifm, groups, fsize):
+    # expand grouped (C / G * R * S, K) filters to dense (C * R * S, K) filters
+    nofm = W.shape[1]
+    cg, kg = nifm // groups, nofm // groups
+    W_dense = np.zeros((nifm, fsize, nofm))
+    W = W.reshape((cg, fsize, nofm))
+    for g in range(groups):
+        W_dense[g * cg:(g + 1) * cg, :, g * kg:(g + 1) * kg] = W[:, :, g * kg:(g + 1) * kg]
+    return W_dense.reshape((-1, nofm))
+
+
+@pytest.mark.parametrize("groups,nofm,fshape,stride,pad",
+                         [(2, 8, 3, 1, 1), (4, 4, 3, 2, 0), (4, 8, 1, 1, 0), (4, 4, 1, 1, 0)])
+def test_grouped_conv(backend_cpu64, groups, nofm, fshape, stride, pad):
+    be = backend_cpu64
+    nifm, indim = 4, 7
+    inshape = (nifm, indim, indim)
+    init = Uniform(low=-1, high=1)
+
+    layers = []
+    for g in (groups, 1):
+        layer = Convolution(fshape=(fshape, fshape, nofm), strides=stride, padding=pad,
+                            init=init, groups=g)
+        layer.configure(inshape)
+        layer.prev_layer = True
+        layer.allocate()
+        layer.deltas = be.iobuf(inshape)
+        layers.append(layer)
+    grouped, dense = layers
+    assert grouped.W.shape == (nifm // groups * fshape * fshape, nofm)
+
+    dense.W[:] = block_diagonal_filters(grouped.W.get(), nifm, groups, fshape * fshape)
+
+    inp = be.array(np.random.uniform(-1, 1, (np.prod(inshape), be.bsz)))
+    assert np.allclose(grouped.fprop(inp).get(), dense.fprop(inp).get())
+
+    err = be.array(np.random.uniform(-1, 1, grouped.outputs.shape))
+    assert np.allclose(grouped.bprop(err).get(), dense.bprop(err).get())
+
+    # the grouped weight gradient is the block diagonal of the dense one
+    dW = block_diagonal_filters(grouped.dW.get(), nifm, groups, fshape * fshape)
+    mask = block_diagonal_filters(np.ones(grouped.dW.shape), nifm, groups, fshape * fshape)
+    assert np.allclose(dW, dense.dW.get() * mask)
@@ -14,10 +14,12 @@
 # ----------------------------------------------------------------------------
 import numpy as np
 import os
+import pytest
 
 from neon import NervanaObject
 from neon import logger as neon_logger
-from neon.data import MNIST
+from neon.data import MNIST, ArrayIterator, PrefetchIterator, AugmentedImageIterator
+from neon.data.augment import augment_batch
 from neon.data.text import Text
 
 
@@ -90,3 +92,209 @@ def test_text(backend_default):
     os.remove(data_path)
     os.remove(train_path)
     os.remove(valid_path)
+
+
+def test_prefetch(backend_default):
+    be = NervanaObject.be
+    be.bsz = 4
+    X = np.random.rand(10, 6)
+    y = np.random.randint(0, 3, 10)
+    ref = ArrayIterator(X, y, nclass=3)
+    data = PrefetchIterator(ArrayIterator(X, y, nclass=3), depth=3)
+    assert data.nbatches == ref.nbatches
+    assert data.ndata == ref.ndata
+    assert data.shape == ref.shape
+
+    staging = None
+    for epoch in range(2):
+        batches = [(x.get(), t.get()) for x, t in ref]
+        prev = None
+        for i, (x, t) in enumerate(data):
+            assert np.allclose(x.get(), batches[i][0])
+            assert np.allclose(t.get(), batches[i][1])
+            # the previous minibatch is not overwritten by the next one
+            if prev is not None:
+                assert np.allclose(prev.get(), batches[i - 1][0])
+            prev = x
+        assert i == len(batches) - 1
+        # the host staging buffers are reused
+        if staging is not None:
+            assert all(a is b for s, d in zip(staging, data.staging) for a, b in zip(s, d))
+        staging = data.staging[:]
+
+    # stopping in the middle of an epoch then resetting starts over
+    ref.reset()
+    data.reset()
+    next(iter(data))
+    data.reset()
+    x, t = next(iter(data))
+    assert np.allclose(x.get(), next(iter(ref))[0].get())
+    data.reset()
+
+
+def test_array_iterator_memmap(backend_default, tmpdir):
+    NervanaObject.be.bsz = 4
+    X = np.random.rand(10, 6).astype(np.float32)
+    y = np.random.rand(10, 2).astype(np.float32)
+    fx, fy = str(tmpdir.join('X.npy')), str(tmpdir.join('y.npy'))
+    np.save(fx, X)
+    np.save(fy, y)
+
+    ref = ArrayIterator(X, y, make_onehot=False)
+    data = ArrayIterator(np.load(fx, mmap_mode='r'), np.load(fy, mmap_mode='r'),
+                         make_onehot=False)
+    for epoch in range(2):
+        ref_batches = iter(ref)
+        for x, t in data:
+            x_ref, t_ref = next(ref_batches)
+            assert np.allclose(x.get(), x_ref.get())
+            assert np.allclose(t.get(), t_ref.get())
+        assert next(ref_batches, None) is None
+        assert data.start == ref.start
+
+
+def test_array_iterator_no_copy(backend_cpu):
+    NervanaObject.be.bsz = 4
+    X = np.random.rand(10, 6).astype(np.float32)
+    y = np.random.randint(0, 3, 10)
+
+    # the arrays of the backend data type are used as they are on the CPU
+    data = ArrayIterator(X, y, nclass=3)
+    assert data.Xdev[0] is X
+    ref = ArrayIterator(X.astype(np.float64), y, nclass=3)
+    assert ref.Xdev[0] is not X
+    for epoch in range(2):
+        for (x, t), (x_ref, t_ref) in zip(data, ref):
+            assert np.allclose(x.get(), x_ref.get())
+            assert np.array_equal(t.get(), t_ref.get())
+
+
+# the shuffled examples of the last minibatch and its wrapped around part, a single one
+# with 9 examples, are taken straight into the minibatch
+@pytest.mark.parametrize("ndata", [9, 10])
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_array_iterator_shuffle(backend_default, dtype, ndata):
+    NervanaObject.be.bsz = 4
+    # each example is its index, in the inputs and the labels
+    X = np.repeat(np.arange(ndata)[:, None], 3, axis=1).astype(dtype)
+    y = np.arange(ndata)
+    data = ArrayIterator(X, y, nclass=ndata, shuffle=True)
+
+    orders = []
+    for epoch in range(2):
+        state = data.get_state()
+        seen = []
+        for x, t in data:
+            x_, t_ = x.get(), np.argmax(t.get(), axis=0)
+            assert np.all(x_ == t_)
+            seen.extend(t_)
+        order = np.random.RandomState(state['seed']).permutation(ndata)
+        assert seen[:ndata - state['start']] == list(order[state['start']:])
+        orders.append(order)
+    assert not np.array_equal(orders[0], orders[1])
+
+    # the order of an epoch is restored with its state
+    data.set_state(state)
+    x, t = next(iter(data))
+    assert np.all(np.argmax(t.get(), axis=0) == orders[1][state['start']:state['start'] + 4])
+
+
+@pytest.mark.parametrize('shuffle', [False, True])
+def test_array_iterator_shard(backend_default, shuffle):
+    NervanaObject.be.bsz = 4
+    ndata, world_size = 21, 3
+    X = np.arange(ndata)[:, None].astype(np.float32)
+
+    def epoch(rank, epoch, skip=0):
+        data = ArrayIterator(X, shuffle=shuffle)
+        data.shard(rank, world_size, seed=5, epoch=epoch)
+        data.skip(skip)
+        assert data.nbatches == 2 - skip
+        return [int(v) for x, _ in data for v in x.get().flatten()]
+
+    for e in range(2):
+        shards = [epoch(rank, e) for rank in range(world_size)]
+        seen = sum(shards, [])
+        # the shards cover the data, padded with the first examples of the epoch
+        assert len(seen) == 24
+        assert sorted(seen[:ndata]) == list(range(ndata))
+        assert seen[ndata:] == seen[:24 - ndata]
+        # each worker reproduces its shard and can start at any minibatch
+        assert epoch(1, e) == shards[1]
+        assert epoch(1, e, skip=1) == shards[1][4:]
+    if shuffle:
+        assert epoch(0, 0) != epoch(0, 1)
+
+
+def test_augment_batch():
+    rng = np.random.RandomState(0)
+    images = rng.rand(5, 3, 8, 10)
+    out = np.empty((3 * 4 * 6, 5))
+
+    # center crops
+    augment_batch(images, out, rng, (4, 6), random_crop=False)
+    assert np.array_equal(out, images[:, :, 2:6, 2:8].reshape((5, -1)).T)
+
+    # random crops, each flipped or not, are windows of the images
+    augment_batch(images, out, rng, (4, 6), flip=True)
+    for crop, image in zip(out.T.reshape((5, 3, 4, 6)), images):
+        windows = [image[:, y:y + 4, x:x + 6] for y in range(5) for x in range(5)]
+        assert any(np.array_equal(crop, w) or np.array_equal(crop, w[:, :, ::-1])
+                   for w in windows)
+
+    # zooming out by 2 samples every other pixel of the whole image
+    augment_batch(images[:, :, :8, :8], out[:3 * 4 * 4], rng, (4, 4), scale=(0.5, 0.5))
+    assert np.array_equal(out[:3 * 4 * 4], images[:, :, ::2, :8:2].reshape((5, -1)).T)
+
+
+@pytest.mark.parametrize("nworkers", [0, 2])
+def test_augmented_iterator(backend_default, nworkers):
+    NervanaObject.be.bsz = 4
+    ndata, lshape = 10, (3, 6, 6)
+    # every pixel of an image is its index
+    X = np.repeat(np.arange(ndata)[:, None], np.prod(lshape), axis=1).astype(np.float32)
+    y = np.arange(ndata)
+    data = AugmentedImageIterator(X, y, nclass=ndata, lshape=lshape, crop_size=(4, 4),
+                                  flip=True, scale=(0.8, 1.2), jitter=0.0, nworkers=nworkers)
+    assert data.shape == (3, 4, 4)
+    assert data.nbatches == 3
+    for epoch in range(2):
+        seen = []
+        for x, t in data:
+            x_, t_ = x.get(), np.argmax(t.get(), axis=0)
+            assert x_.shape == (48, 4)
+            assert np.all(x_ == t_)
+            seen.extend(t_)
+        assert sorted(seen[:ndata]) == list(range(ndata))
+
+    # stopping an epoch early leaves the workers ready for the next
+    next(iter(data))
+    assert len(list(data)) == 3
+    data.cleanup()
+
+
+@pytest.mark.parametrize("nworkers", [0, 2])
+def test_augmented_iterator_resume(backend_default, nworkers):
+    NervanaObject.be.bsz = 4
+    lshape = (3, 6, 6)
+    X = np.random.rand(14, np.prod(lshape)).astype(np.float32)
+
+    def iterator(nworkers):
+        return AugmentedImageIterator(X, lshape=lshape, crop_size=(4, 4), flip=True,
+                                      scale=(0.8, 1.2), jitter=0.1, nworkers=nworkers)
+
+    data = iterator(nworkers)
+    state = data.get_state()
+    batches = [x.get().copy() for x, _ in data]
+
+    # resuming in the middle of the epoch reproduces its augmentations
+    data.set_state(state)
+    data.skip(2)
+    assert np.array_equal(next(iter(data))[0].get(), batches[2])
+    data.cleanup()
+
+    # which do not depend on the number of workers
+    ref = iterator(0)
+    ref.set_state(state)
+    for x, batch in zip(ref, batches):
+        assert np.array_equal(x[0].get(), batch)
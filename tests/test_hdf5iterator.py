@@ -22,7 +22,9 @@ import tempfile
 import numpy as np
 
 from neon import NervanaObject
-from neon.data import HDF5Iterator, HDF5IteratorOneHot, HDF5IteratorAutoencoder
+from neon.data import (HDF5Iterator, HDF5IteratorOneHot, HDF5IteratorAutoencoder,
+                       ShardedHDF5Iterator, ShardedHDF5IteratorOneHot, write_arrays,
+                       write_csv, write_image_dir)
 
 logging.basicConfig(level=20)
 logger = logging.getLogger()
@@ -258,3 +260,188 @@ def test_reset(backend_default, hdf5datafile):
         assert np.all(x.get() == x_1)
         assert np.all(t.get() == t_1)
     datit.cleanup()
+
+
+@pytest.mark.parametrize("onehot", [False, True])
+def test_block_read(backend_default, hdf5datafile, onehot):
+    NervanaObject.be.bsz = 128
+
+    # rechunk the data so blocks and minibatches are not aligned
+    (fid, fn) = tempfile.mkstemp(suffix='.h5', prefix='tempdata')
+    os.close(fid)
+    with h5py.File(hdf5datafile, 'r') as src, h5py.File(fn, 'w') as dst:
+        for key in src:
+            dst.create_dataset(key, data=src[key][:], chunks=(50,) + src[key].shape[1:])
+            dst[key].attrs.update(src[key].attrs)
+
+    cls = HDF5IteratorOneHot if onehot else HDF5Iterator
+    ref = cls(fn)
+    datit = cls(fn, block_batches=1, cache_blocks=2)
+    for epoch in range(2):
+        for (x, t), (x_ref, t_ref) in zip(datit, ref):
+            assert np.array_equal(x.get(), x_ref.get())
+            assert np.array_equal(t.get(), t_ref.get())
+    assert datit.inp_reader.block_rows == 150
+    assert len(datit.inp_reader.cache) <= 2
+    # the blocks are transposed straight into a host minibatch of the backend type,
+    # which is the input buffer on the CPU
+    assert datit.mini_batch_in.dtype == datit.inpbuf.dtype
+    if NervanaObject.be.backend_name == 'cpu':
+        assert np.shares_memory(datit.inpbuf._tensor, datit.mini_batch_in)
+    datit.cleanup()
+    ref.cleanup()
+    os.remove(fn)
+
+
+def test_block_shuffle(backend_default, hdf5datafile):
+    NervanaObject.be.bsz = 128
+
+    datit = HDF5Iterator(hdf5datafile, shuffle=True, block_batches=1, cache_blocks=2)
+    ndata = datit.ndata
+    orders = []
+    for epoch in range(2):
+        state = datit.get_state()
+        order = datit.epoch_order()
+        nblocks = datit.inp_reader.nblocks_read
+        seen = []
+        for x, t in datit:
+            t_ = t.get().flatten().astype(int)
+            seen.extend(t_)
+            # the inputs of the file are in the order of the outputs
+            x_exp = (t_[:, None] * datit.inp.shape[1] + np.arange(datit.inp.shape[1])).T
+            assert np.all(x.get() == x_exp)
+        # every example is visited, the last minibatch wraps around to the first ones
+        assert seen[:ndata - state['start']] == list(order[state['start']:])
+        # each block is read once, plus those of the wrap around
+        assert datit.inp_reader.nblocks_read - nblocks <= datit.inp_reader.nblocks_total + 2
+        orders.append(order)
+    assert not np.array_equal(orders[0], orders[1])
+
+    # the order of an epoch is restored with its state
+    datit.set_state(state)
+    assert np.array_equal(datit.epoch_order(), orders[1])
+
+    # a reset in the middle of an epoch starts a new order
+    next(iter(datit))
+    datit.reset()
+    assert datit.start == 0
+    assert not np.array_equal(datit.epoch_order(), orders[1])
+    datit.cleanup()
+
+
+@pytest.mark.parametrize("shuffle", [False, True])
+def test_memmap(backend_default, hdf5datafile, shuffle):
+    NervanaObject.be.bsz = 128
+
+    datit = HDF5Iterator(hdf5datafile, memmap=True, shuffle=shuffle)
+    assert isinstance(datit.inp, np.memmap) and isinstance(datit.out, np.memmap)
+    ref = HDF5Iterator(hdf5datafile)
+    if shuffle:
+        order = datit.epoch_order()
+        ref.inp, ref.out = ref.inp[:][order], ref.out[:][order]
+    for (x, t), (x_ref, t_ref) in zip(datit, ref):
+        assert np.array_equal(x.get(), x_ref.get())
+        assert np.array_equal(t.get(), t_ref.get())
+    datit.cleanup()
+    ref.cleanup()
+
+
+@pytest.mark.parametrize("shuffle", [False, True])
+def test_sharded(backend_default, tmpdir, shuffle):
+    NervanaObject.be.bsz = 128
+    bsz = 128
+
+    # shards of consecutive examples, each example is its index repeated
+    sizes = [100, 150, 60]
+    nfeat = 3
+    fns, first = [], 0
+    for i, n in enumerate(sizes):
+        fn = str(tmpdir.join('shard%d.h5' % i))
+        with h5py.File(fn, 'w') as f:
+            idx = np.arange(first, first + n)
+            inp = f.create_dataset('input', data=np.repeat(idx[:, None], nfeat, axis=1))
+            inp.attrs['lshape'] = (nfeat, 1, 1)
+            out = f.create_dataset('output', data=idx[:, None])
+            out.attrs['nclass'] = sum(sizes)
+        fns.append(fn)
+        first += n
+
+    datit = ShardedHDF5Iterator(str(tmpdir.join('shard*.h5')), shuffle=shuffle,
+                                block_batches=1, nreaders=2)
+    assert datit.ndata == sum(sizes)
+    for epoch in range(2):
+        start = datit.start
+        nbatches = datit.nbatches
+        seen = []
+        for x, t in datit:
+            x_, t_ = x.get(), t.get()
+            assert np.all(x_ == t_)
+            seen.extend(t_[0].astype(int))
+        assert len(seen) == nbatches * bsz
+        if not shuffle:
+            assert seen[:sum(sizes) - start] == list(range(start, sum(sizes)))
+        assert sorted(seen[:sum(sizes) - start]) == sorted(set(seen[:sum(sizes) - start]))
+    datit.cleanup()
+
+    # the shards are split between the workers
+    datit = ShardedHDF5IteratorOneHot(fns, rank=1, nranks=2)
+    assert datit.ndata == sizes[1]
+    x, t = next(iter(datit))
+    assert np.all(np.argmax(t.get(), axis=0) == x.get()[0])
+    datit.cleanup()
+
+
+@pytest.mark.parametrize("mean", ['image', 'channel'])
+def test_writer(backend_default, tmpdir, mean):
+    NervanaObject.be.bsz = 128
+
+    lshape = (3, 2, 2)
+    X = np.random.randint(0, 255, (300, 12)).astype(np.uint8)
+    y = np.random.randint(0, 5, 300)
+    fn = str(tmpdir.join('arrays.h5'))
+    write_arrays(fn, X, y, lshape=lshape, nclass=5, mean=mean, block_rows=70)
+    with h5py.File(fn, 'r') as f:
+        assert f['input'].chunks == (128, 12)
+        assert np.array_equal(f['input'][:], X)
+        assert np.array_equal(f['output'][:, 0], y)
+        mn = X.mean(axis=0) if mean == 'image' else X.reshape((300, 3, -1)).mean(axis=(0, 2))
+        assert np.allclose(f['mean'][:].flatten(), mn)
+
+    datit = HDF5IteratorOneHot(fn)
+    x, t = next(iter(datit))
+    # the iterator subtracts the float32 mean from float32 inputs
+    mn = mn.astype(np.float32).reshape((-1, 1)).repeat(12 // mn.size, axis=0)
+    assert np.allclose(x.get(), X[:128].T.astype(np.float32) - mn, rtol=1e-5, atol=1e-5)
+    assert np.array_equal(np.argmax(t.get(), axis=0), y[:128])
+    datit.cleanup()
+
+    # the same examples from a CSV file
+    csv_fn = str(tmpdir.join('data.csv'))
+    np.savetxt(csv_fn, np.hstack([X, y[:, None]]), delimiter=',', fmt='%d')
+    fn = str(tmpdir.join('csv.h5'))
+    write_csv(fn, csv_fn, lshape=lshape, label_column=-1, nclass=5, block_rows=70,
+              nworkers=2)
+    with h5py.File(fn, 'r') as f:
+        assert np.array_equal(f['input'][:], X)
+        assert np.array_equal(f['output'][:, 0], y)
+
+
+def test_writer_images(tmpdir):
+    Image = pytest.importorskip('PIL.Image')
+    images = {}
+    for cls in ['cat', 'dog']:
+        os.makedirs(str(tmpdir.join('images', cls)))
+        for i in range(3):
+            im = np.random.randint(0, 255, (6, 8, 3)).astype(np.uint8)
+            Image.fromarray(im).save(str(tmpdir.join('images', cls, '%d.png' % i)))
+            images[(cls, i)] = im
+
+    fn = str(tmpdir.join('images.h5'))
+    classes = write_image_dir(fn, str(tmpdir.join('images')), (6, 8), file_pattern='*.png',
+                              nworkers=2, block_rows=4)
+    assert classes == ['cat', 'dog']
+    with h5py.File(fn, 'r') as f:
+        assert tuple(f['input'].attrs['lshape']) == (3, 6, 8)
+        assert f['output'].attrs['nclass'] == 2
+        assert np.array_equal(f['output'][:, 0], [0, 0, 0, 1, 1, 1])
+        assert np.array_equal(f['input'][4], images[('dog', 1)].transpose((2, 0, 1)).flatten())
@@ -0,0 +1,100 @@
+# ----------------------------------------------------------------------------
+# Copyright 2016 Nervana Systems Inc.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ----------------------------------------------------------------------------
+"""
+Test incremental caption decoding against the full unroll of the model
+"""
+import numpy as np
+
+from neon.data.imagecaption import ImageCaption, CaptionDecoder
+from neon.initializers import Constant, Uniform
+from neon.layers import Affine, Dropout, LSTM, MergeMultistream, Sequential
+from neon.models import Model
+from neon.transforms import Logistic, Softmax, Tanh
+
+
+def make_caption_set(be, image_size, vocab_size, max_len):
+    # bypass the file loading of the constructor
+    dataset = ImageCaption.__new__(ImageCaption)
+    dataset.image_size = image_size
+    dataset.vocab_size = vocab_size
+    dataset.max_sentence_length = max_len
+    dataset.index_to_vocab = {i: 'w%d' % i for i in range(vocab_size)}
+    dataset.index_to_vocab[0] = ImageCaption.end_token
+    dataset.vocab_to_index = {w: i for i, w in dataset.index_to_vocab.items()}
+    dataset.dev_X = be.iobuf((vocab_size, max_len))
+    return dataset
+
+
+def make_caption_model(be, image_size, vocab_size, max_len, hidden=16):
+    init = Uniform(low=-0.5, high=0.5)
+    layers = [MergeMultistream(layers=[Sequential([Affine(hidden, init, bias=Constant(0.))]),
+                                       Sequential([Affine(hidden, init, name='sent')])],
+                               merge="recurrent"),
+              Dropout(keep=0.5),
+              LSTM(hidden, init, activation=Logistic(), gate_activation=Tanh(),
+                   reset_cells=True),
+              Affine(vocab_size, init, bias=init, activation=Softmax())]
+    model = Model(layers=layers)
+    model.initialize([(image_size, 1), (vocab_size, max_len)])
+    return model
+
+
+def unrolled_greedy(be, model, dataset, image):
+    # reference decoding: rerun the full sequence for every generated word
+    bsz = be.bsz
+    y = be.zeros(dataset.dev_X.shape)
+    for step in range(1, dataset.max_sentence_length + 1):
+        prob = model.fprop((image, y), inference=True).get()[:, :-bsz].copy()
+        pred = np.argmax(prob, axis=0)
+        prob.fill(0)
+        for i in range(step * bsz):
+            prob[pred[i], i] = 1
+        y[:] = prob
+    return np.argmax(y.get(), axis=0).reshape((-1, bsz))
+
+
+def test_incremental_decode(backend_cpu64):
+    be = backend_cpu64
+    image_size, vocab_size, max_len = 12, 10, 6
+    dataset = make_caption_set(be, image_size, vocab_size, max_len)
+    model = make_caption_model(be, image_size, vocab_size, max_len)
+
+    image = be.array(be.rng.uniform(-1, 1, (image_size, be.bsz)))
+    decoder = CaptionDecoder(model)
+
+    words = dataset.decode(decoder, image)
+    assert words.shape == (max_len, be.bsz)
+    assert np.array_equal(words, unrolled_greedy(be, model, dataset, image))
+
+    # decoder state must not leak between minibatches
+    assert np.array_equal(dataset.decode(decoder, image), words)
+
+
+def test_beam_search(backend_cpu64):
+    be = backend_cpu64
+    image_size, vocab_size, max_len = 12, 10, 6
+    dataset = make_caption_set(be, image_size, vocab_size, max_len)
+    model = make_caption_model(be, image_size, vocab_size, max_len)
+
+    image = be.array(be.rng.uniform(-1, 1, (image_size, be.bsz)))
+    decoder = CaptionDecoder(model)
+
+    greedy = dataset.idx_to_sents(dataset.decode(decoder, image))
+    beam1 = dataset.idx_to_sents(dataset._beam_search(decoder, image, 1))
+    assert beam1 == greedy
+
+    beam = dataset.idx_to_sents(dataset.decode(decoder, image, beam_size=3))
+    assert len(beam) == be.bsz
+    assert all(sent.split()[0] in dataset.vocab_to_index for sent in beam)
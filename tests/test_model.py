@@ -15,16 +15,20 @@
 from builtins import zip
 import numpy as np
 import os
+import pytest
 
 from neon.backends import gen_backend
+from neon.callbacks.callbacks import Callbacks
 from neon.data import ArrayIterator, MNIST, PTB
-from neon.initializers import Gaussian, Constant
+from neon.initializers import Gaussian, Constant, Uniform
 from neon.layers import (GeneralizedCost, Affine, DeepBiRNN, DeepBiLSTM, LSTM, GRU,
                          Dropout, Conv, Pooling, Sequential, MergeMultistream, Recurrent,
-                         RecurrentMean)
-from neon.models import Model
+                         RecurrentMean, BatchNorm, FusedLinear, FusedConvolution,
+                         MergeBroadcast, Convolution)
+from neon.models import Model, load_inference
 from neon.optimizers import GradientDescentMomentum
-from neon.transforms import Rectlin, Logistic, CrossEntropyBinary
+from neon.transforms import (Rectlin, Logistic, CrossEntropyBinary, Explin, Softmax,
+                             SumSquared)
 
 
 def test_model_get_outputs_rnn(backend_default, data):
@@ -178,6 +182,110 @@ def test_model_serialize(backend_default, data):
     os.remove(tmp_save)
 
 
+def test_model_serialize_packed(backend_cpu64, tmpdir):
+    be = backend_cpu64
+    in_shape = (3, 8, 8)
+    init = Gaussian(loc=0.0, scale=0.1)
+    bias = Uniform(low=-0.1, high=0.1)
+    X = be.rng.uniform(-1, 1, (be.bsz, np.prod(in_shape)))
+    y = be.rng.randint(10, size=be.bsz)
+    train_set = ArrayIterator(X, y, nclass=10, lshape=in_shape)
+
+    def make_model(layers):
+        model = Model(layers=layers)
+        model.optimizer = GradientDescentMomentum(learning_rate=0.1, momentum_coef=0.9)
+        model.initialize(train_set, cost=GeneralizedCost(costfunc=SumSquared()))
+        return model
+
+    def train_step(model):
+        for x, t in train_set:
+            model.bprop(model.cost.get_errors(model.fprop(x), t))
+            model.optimizer.optimize(model.layers_to_optimize, epoch=0)
+
+    def params(model):
+        return [getattr(l, key) for l in model.layers_to_optimize
+                for key in l.get_description(get_weights=True, keep_states=False)['params']]
+
+    def states(model):
+        return [s for l in model.layers_to_optimize
+                for s in (sum(l.states, []) if isinstance(l.states[0], list) else l.states)]
+
+    mlp = make_model([Conv((3, 3, 4), init=init, bias=bias, padding=1, activation=Rectlin()),
+                      Affine(nout=20, init=init, batch_norm=True, activation=Rectlin()),
+                      Affine(nout=10, init=init, bias=bias, activation=Logistic())])
+    train_step(mlp)
+    fn = str(tmpdir.join('model.npk'))
+    mlp.save_params(fn)
+    saved = [p.get().copy() for p in params(mlp)]
+
+    # the weights and states are bound to the memory mapped file
+    loaded = make_model(fn)
+    for tensor in params(loaded) + states(loaded):
+        assert isinstance(tensor._tensor.base, np.memmap)
+    for x, t in train_set:
+        ref = mlp.fprop(x, inference=True).get()
+        assert np.allclose(loaded.fprop(x, inference=True).get(), ref, rtol=0, atol=1e-10)
+
+    # training continues identically and does not write to the file
+    train_step(mlp)
+    train_step(loaded)
+    for p, p_ref in zip(params(loaded), params(mlp)):
+        assert np.allclose(p.get(), p_ref.get(), rtol=0, atol=1e-10)
+    for p, p_saved in zip(params(Model(fn)), saved):
+        assert np.array_equal(p.get(), p_saved)
+
+    # the arrays can also be read into memory
+    from neon.util.persist import load_packed
+    mapped, read = load_packed(fn), load_packed(fn, mmap_mode=None)
+    assert read['epoch_index'] == mapped['epoch_index']
+    arrays = [(val, l_mapped['params'][key])
+              for l_read, l_mapped in zip(read['model']['config']['layers'],
+                                          mapped['model']['config']['layers'])
+              for key, val in l_read.get('params', {}).items()]
+    assert len(arrays) == len(saved)
+    for val, val_mapped in arrays:
+        assert type(val) is np.ndarray
+        assert np.array_equal(val, val_mapped)
+
+
+def test_model_load_binds_arrays(backend_cpu64, tmpdir, monkeypatch):
+    import neon.models.model
+    import neon.util.persist
+    from neon.layers.layer import Linear
+    from neon.util.persist import load_class
+
+    # registered classes are found without searching the neon modules
+    monkeypatch.setattr(neon.util.persist.pkgutil, 'iter_modules', None)
+    assert load_class('neon.layers.layer.Linear') is Linear
+    assert load_class('Linear') is Linear
+
+    init = Gaussian(loc=0.0, scale=0.1)
+    model = Model([Conv((3, 3, 4), init=init, padding=1, batch_norm=True, activation=Rectlin()),
+                   Affine(nout=10, init=init, bias=init, activation=Logistic())])
+    model.initialize((3, 8, 8))
+    fn = str(tmpdir.join('model.pkl'))
+    model.save_params(fn)
+
+    loaded = []
+
+    def load_obj(path):
+        loaded.append(neon.util.persist.load_obj(path))
+        return loaded[-1]
+
+    monkeypatch.setattr(neon.models.model, 'load_obj', load_obj)
+    model = Model(fn)
+    model.initialize((3, 8, 8))
+    # the new layers hold the arrays read from the file
+    params = [l['params'] for l in loaded[0]['model']['config']['layers'] if 'params' in l]
+    layers = [l for l in model.layers.layers if hasattr(l, 'W') or hasattr(l, 'gamma')]
+    assert len(params) == len(layers)
+    for l, pdict in zip(layers, params):
+        for key, val in pdict.items():
+            # the description read is left as it is
+            assert type(val) is np.ndarray
+            assert np.shares_memory(getattr(l, key)._tensor, val)
+
+
 def test_conv_rnn(backend_default):
     train_shape = (1, 17, 142)
 
@@ -220,6 +328,269 @@ def test_conv_rnn(backend_default):
         model.bprop(delta)
 
 
+def test_optimize_for_inference(backend_cpu64, tmpdir):
+    be = backend_cpu64
+    in_shape = (3, 8, 8)
+    init = Gaussian(loc=0.0, scale=0.1)
+    bias = Uniform(low=-0.1, high=0.1)
+    layers = [Conv((3, 3, 4), init=init, bias=bias, activation=Rectlin(), padding=1),
+              Conv((3, 3, 6), init=init, batch_norm=True, activation=Explin()),
+              Pooling(2, strides=2),
+              Affine(20, init=init, batch_norm=True, activation=Rectlin()),
+              Dropout(keep=0.8),
+              Affine(16, init=init, bias=bias, activation=Logistic()),
+              Dropout(keep=0.5),
+              Affine(10, init=init, bias=bias, activation=Softmax())]
+    model = Model(layers=layers)
+    model.initialize(in_shape)
+
+    # accumulate batchnorm statistics and use nontrivial scale and shift
+    for i in range(3):
+        model.fprop(be.array(be.rng.uniform(-1, 1, (np.prod(in_shape), be.bsz))))
+    for l in model.layers.layers:
+        if type(l) is BatchNorm:
+            l.gamma[:] = be.array(be.rng.uniform(0.5, 1.5, l.gamma.shape))
+            l.beta[:] = be.array(be.rng.uniform(-0.5, 0.5, l.beta.shape))
+
+    inp = be.array(be.rng.uniform(-1, 1, (np.prod(in_shape), be.bsz)))
+    ref = model.fprop(inp, inference=True).get()
+    nlayers = len(model.layers.layers)
+
+    model.optimize_for_inference()
+    layer_types = [type(l) for l in model.layers.layers]
+    assert layer_types == [FusedConvolution, FusedConvolution, type(model.layers.layers[2]),
+                           FusedLinear, FusedLinear, FusedLinear]
+    assert len(layer_types) < nlayers
+
+    out = model.fprop(inp, inference=True).get()
+    assert np.allclose(out, ref, rtol=0, atol=1e-10)
+
+    # the folded weights can not be trained
+    assert model.inference_only
+    X = be.rng.uniform(-1, 1, (be.bsz, np.prod(in_shape)))
+    train_set = ArrayIterator(X, np.zeros(be.bsz, dtype=np.int32), nclass=10)
+    cost = GeneralizedCost(costfunc=SumSquared())
+    callbacks = Callbacks(model, progress_bar=False, output_file=str(tmpdir.join('fit.h5')))
+    with pytest.raises(AssertionError):
+        model.fit(train_set, cost=cost, optimizer=GradientDescentMomentum(0.1, 0.9),
+                  num_epochs=1, callbacks=callbacks)
+
+
+def test_grouped_conv_serialize(backend_cpu64):
+    be = backend_cpu64
+    in_shape = (4, 8, 8)
+    init = Gaussian(loc=0.0, scale=0.1)
+    bias = Uniform(low=-0.1, high=0.1)
+    branches = [Sequential([Conv((3, 3, 4), init=init, bias=bias, padding=1, groups=4,
+                                 activation=Rectlin())]),
+                Sequential([Conv((1, 1, 8), init=init, bias=bias, groups=2, activation=Rectlin(),
+                                 fuse=True)])]
+    layers = [MergeBroadcast(layers=branches, merge="depth"),
+              Conv((3, 3, 6), init=init, groups=3, activation=Explin()),
+              Pooling(2, strides=2),
+              Affine(10, init=init, bias=bias, activation=Softmax())]
+    model = Model(layers=layers)
+    model.initialize(in_shape)
+
+    inp = be.array(be.rng.uniform(-1, 1, (np.prod(in_shape), be.bsz)))
+    ref = model.fprop(inp, inference=True).get()
+
+    tmp_save = 'test_grouped_conv_serialize_tmp_save.pickle'
+    model.save_params(tmp_save, keep_states=True)
+    try:
+        model = Model(tmp_save)
+        model.initialize(in_shape)
+    finally:
+        os.remove(tmp_save)
+    convs = [l for l in model.layers_to_optimize if isinstance(l, Convolution)]
+    assert [l.groups for l in convs] == [4, 2, 3]
+    assert np.allclose(model.fprop(inp, inference=True).get(), ref)
+
+    model.optimize_for_inference()
+    assert np.allclose(model.fprop(inp, inference=True).get(), ref)
+
+
+def test_single_sample_inference(backend_cpu64):
+    be = backend_cpu64
+    bsz = be.bsz
+    in_shape = (3, 9, 9)
+    init = Gaussian(loc=0.0, scale=0.1)
+    bias = Uniform(low=-0.1, high=0.1)
+    layers = [Conv((3, 3, 4), init=init, bias=bias, padding=1, activation=Rectlin()),
+              Pooling(3, strides=2, padding=1),
+              Conv((3, 3, 6), init=init, strides=2, activation=Explin()),
+              Conv((2, 2, 6), init=init, bias=bias, padding=1, activation=Rectlin(), fuse=True),
+              Pooling(2, op='avg'),
+              Affine(10, init=init, bias=bias, activation=Softmax())]
+    model = Model(layers=layers)
+    model.initialize(in_shape)
+
+    inp = be.rng.uniform(-1, 1, (np.prod(in_shape), bsz))
+    ref = model.fprop(be.array(inp), inference=True).get()
+    # the error of the first sample only
+    err = np.zeros(ref.shape)
+    err[:, 0] = be.rng.uniform(-1, 1, ref.shape[0])
+    model.fprop(be.array(inp))
+    model.bprop(be.array(err))
+    ref_grads = [l.dW.get() for l in model.layers_to_optimize]
+
+    model.set_batch_size(1, reallocate=True)
+    try:
+        assert model.layers.layers[0].outputs.shape[1] == 1
+        assert model.layers.layers[0].nglayer.single
+        for i in range(bsz):
+            out = model.fprop(be.array(inp[:, i:i + 1]), inference=True).get()
+            assert np.allclose(out[:, 0], ref[:, i], rtol=0, atol=1e-10)
+
+        model.fprop(be.array(inp[:, :1]))
+        model.bprop(be.array(err[:, :1]))
+        grads = [l.dW.get() for l in model.layers_to_optimize]
+        for grad, ref_grad in zip(grads, ref_grads):
+            assert np.allclose(grad, ref_grad, rtol=0, atol=1e-10)
+    finally:
+        model.set_batch_size(bsz, reallocate=True)
+
+
+def test_benchmark_latency(backend_cpu64):
+    be = backend_cpu64
+    bsz = be.bsz
+    init = Gaussian(loc=0.0, scale=0.1)
+    model = Model([Conv((3, 3, 4), init=init, padding=1, activation=Rectlin()),
+                   Affine(10, init=init, activation=Softmax())])
+    X = be.rng.uniform(-1, 1, (2 * bsz, 3 * 6 * 6))
+    dataset = ArrayIterator(X, lshape=(3, 6, 6))
+
+    stats = model.benchmark(dataset, inference=True, niterations=3, nskip=1)
+    assert list(stats) == ['fprop', 'latency']
+    assert all(stats['latency'][stat] >= 0 for stat in ('mean', 'median', 'min', 'max'))
+    # the model runs at the batch size of the dataset again
+    assert be.bsz == bsz
+    assert model.layers.layers[0].outputs.shape[1] == bsz
+
+
+def test_reallocate_training(backend_cpu64):
+    be = backend_cpu64
+    bsz = be.bsz
+    in_shape = (3, 6, 6)
+    init = Gaussian(loc=0.0, scale=0.1)
+    layers = [Conv((3, 3, 4), init=init, padding=1, batch_norm=True, activation=Rectlin()),
+              Affine(10, init=init, bias=Uniform(low=-0.1, high=0.1), activation=Softmax())]
+    model = Model(layers=layers)
+    model.initialize(in_shape)
+
+    # a training step at the allocated batch size caches views of the delta buffers
+    inp = be.rng.uniform(-1, 1, (np.prod(in_shape), bsz))
+    err = be.rng.uniform(-1, 1, (10, bsz))
+    model.fprop(be.array(inp))
+    model.bprop(be.array(err))
+
+    model.set_batch_size(2, reallocate=True)
+    try:
+        ref = Model(model.serialize())
+        ref.initialize(in_shape)
+        for m in (model, ref):
+            m.fprop(be.array(inp[:, :2]))
+            m.bprop(be.array(err[:, :2]))
+        for l, l_ref in zip(model.layers_to_optimize, ref.layers_to_optimize):
+            params = l.get_params()
+            ref_params = l_ref.get_params()
+            if isinstance(params, tuple):
+                params, ref_params = [params], [ref_params]
+            for ((_, grad), _), ((_, ref_grad), _) in zip(params, ref_params):
+                assert np.allclose(grad.get(), ref_grad.get(), rtol=0, atol=1e-10)
+    finally:
+        model.set_batch_size(bsz, reallocate=True)
+
+
+def test_dynamic_batch_size(backend_cpu64):
+    be = backend_cpu64
+    bsz = be.bsz
+    in_shape = (3, 8, 8)
+    init = Gaussian(loc=0.0, scale=0.1)
+    bias = Uniform(low=-0.1, high=0.1)
+    layers = [Conv((3, 3, 4), init=init, bias=bias, padding=1, activation=Rectlin()),
+              Pooling(2, strides=2),
+              Conv((3, 3, 6), init=init, batch_norm=True, activation=Explin()),
+              Dropout(keep=0.5),
+              Affine(10, init=init, bias=bias, activation=Softmax())]
+    model = Model(layers=layers)
+    model.initialize(in_shape, cost=GeneralizedCost(costfunc=CrossEntropyBinary()))
+
+    inp = be.rng.uniform(-1, 1, (np.prod(in_shape), bsz))
+    ref = model.fprop(be.array(inp), inference=True).get()
+    full_outputs = [l.outputs for l in model.layers.layers if l.owns_output]
+
+    for N in (1, 3, bsz // 2, bsz):
+        model.set_batch_size(N)
+        assert be.bsz == N
+        outputs = [l.outputs for l in model.layers.layers if l.owns_output]
+        for buf, full in zip(outputs, full_outputs):
+            assert buf.shape[1] == N and np.shares_memory(buf._tensor, full._tensor)
+        out = model.fprop(be.array(inp[:, :N]), inference=True)
+        assert out.shape == (10, N)
+        assert np.allclose(out.get(), ref[:, :N], rtol=0, atol=1e-10)
+        assert model.cost.deltas.shape == (10, N)
+
+    # the buffers the layers allocate for a batch size are reused when binding it again
+    pool, drop = [[l for l in model.layers.layers if type(l) is t][0] for t in (Pooling, Dropout)]
+    masks = dict()
+    for N in (3, bsz, 3, bsz):
+        model.set_batch_size(N)
+        mask = (pool.argmax, drop.keep_mask)
+        assert all(a is b for a, b in zip(masks.setdefault(N, mask), mask))
+        assert model.fprop(be.array(inp[:, :N]), inference=True).shape == (10, N)
+
+    with pytest.raises(ValueError):
+        model.set_batch_size(bsz + 1)
+
+    # only the samples of the partial last minibatch are computed
+    ndata = bsz + 3
+    X = be.rng.uniform(-1, 1, (ndata, np.prod(in_shape)))
+    dataset = ArrayIterator(X, lshape=in_shape)
+    outputs = model.get_outputs(dataset)
+    assert be.bsz == bsz
+    assert outputs.shape == (ndata, 10)
+    last_batch = np.concatenate((X[bsz:], X[:bsz - 3])).T
+    ref = model.fprop(be.array(last_batch), inference=True).get()
+    assert np.allclose(outputs[-3:], ref[:, :3].T, rtol=0, atol=1e-10)
+
+
+def test_export_inference(backend_cpu64, tmpdir):
+    be = backend_cpu64
+    in_shape = (3, 8, 8)
+    init = Gaussian(loc=0.0, scale=0.1)
+    bias = Uniform(low=-0.1, high=0.1)
+    layers = [Conv((3, 3, 4), init=init, bias=bias, padding=1, activation=Rectlin()),
+              Pooling(2, strides=2),
+              Conv((3, 3, 6), init=init, batch_norm=True, activation=Explin()),
+              Affine(10, init=init, bias=bias, activation=Softmax())]
+    model = Model(layers=layers)
+    model.initialize(in_shape)
+    for i in range(2):
+        model.fprop(be.array(be.rng.uniform(-1, 1, (np.prod(in_shape), be.bsz))))
+
+    inp = be.array(be.rng.uniform(-1, 1, (np.prod(in_shape), be.bsz)))
+    ref = model.fprop(inp, inference=True).get()
+    fn = str(tmpdir.join('model.npk'))
+    model.export_inference(fn)
+
+    frozen = load_inference(fn)
+    assert frozen.inference_only
+    for l in frozen.layers.layers:
+        if hasattr(l, 'W'):
+            # the weights are views of the mapped file
+            assert isinstance(l.W._tensor.base, np.memmap)
+            assert l.W._tensor.ctypes.data % 64 == 0
+        assert getattr(l, 'deltas', None) is None
+    assert np.allclose(frozen.fprop(inp, inference=True).get(), ref, rtol=0, atol=1e-10)
+
+    frozen.set_batch_size(3)
+    out = frozen.fprop(be.array(inp.get()[:, :3]), inference=True).get()
+    assert np.allclose(out, ref[:, :3], rtol=0, atol=1e-10)
+    with pytest.raises(AssertionError):
+        frozen.bprop(be.array(np.zeros(ref[:, :3].shape)))
+
+
 if __name__ == '__main__':
     be = gen_backend(backend='gpu', batch_size=128)
     test_conv_rnn(be)
@@ -0,0 +1,170 @@
+# ----------------------------------------------------------------------------
+# Copyright 2016 Nervana Systems Inc.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ----------------------------------------------------------------------------
+"""
+Test sequence generation with the Seq2Seq container
+"""
+import itertools
+
+import numpy as np
+
+from neon.data.dataiterator import NervanaDataIterator
+from neon.initializers import Uniform
+from neon.layers import Affine, GRU, LookupTable, Seq2Seq
+from neon.models import Model
+from neon.transforms import Logistic, Softmax, Tanh
+from neon.util.beamsearch import beam_search
+
+
+class SeqData(NervanaDataIterator):
+    """
+    Minimal conditional sequence dataset of token indices.
+    """
+    def __init__(self, X, Z):
+        super(SeqData, self).__init__(name=None)
+        self.X, self.Z = X, Z
+        self.ndata = X.shape[0]
+        self.nbatches = self.ndata // self.be.bsz
+        self.shape = (X.shape[1], 1)
+        self.decoder_shape = self.shape
+        self.dev_X = self.be.iobuf(X.shape[1], dtype=np.int32)
+        self.dev_Z = self.be.iobuf(X.shape[1], dtype=np.int32)
+
+    def reset(self):
+        pass
+
+    def __iter__(self):
+        bsz = self.be.bsz
+        for i in range(self.nbatches):
+            batch = slice(i * bsz, (i + 1) * bsz)
+            self.dev_X.set(self.X[batch].T.copy())
+            self.dev_Z.set(self.Z[batch].T.copy())
+            yield (self.dev_X, self.dev_Z), None
+
+
+def make_seq2seq(be, vocab_size, steps, ndata=None):
+    ndata = be.bsz if ndata is None else ndata
+    init = Uniform(low=-0.5, high=0.5)
+    encoder = [LookupTable(vocab_size, 8, init),
+               GRU(16, init, activation=Tanh(), gate_activation=Logistic(), reset_cells=True)]
+    decoder = [LookupTable(vocab_size, 8, init),
+               GRU(16, init, activation=Tanh(), gate_activation=Logistic(), reset_cells=True),
+               Affine(vocab_size, init, bias=init, activation=Softmax())]
+    model = Model(layers=Seq2Seq([encoder, decoder]))
+
+    X = be.rng.randint(vocab_size, size=(ndata, steps))
+    dataset = SeqData(X, np.zeros_like(X))
+    model.initialize(dataset)
+    return model, dataset
+
+
+def sequence_logprob(be, model, x, tokens):
+    # teacher forced log probability of the generated tokens
+    steps, bsz = tokens.shape
+    z = be.iobuf(steps, dtype=np.int32)
+    z_host = np.zeros_like(tokens)
+    z_host[1:] = tokens[:-1]
+    z.set(z_host)
+    prob = model.fprop((x, z), inference=False).get().reshape((-1, steps, bsz))
+    return np.log(prob[tokens, np.arange(steps)[:, None], np.arange(bsz)]).sum(axis=0)
+
+
+def test_greedy_generate(backend_cpu64):
+    be = backend_cpu64
+    vocab_size, steps = 10, 5
+    model, dataset = make_seq2seq(be, vocab_size, steps)
+    (x, z), _ = next(iter(dataset))
+
+    tokens = model.layers.generate(x)
+    assert tokens.shape == (steps, be.bsz)
+
+    # with a lookup table input the inference fprop also feeds back the argmax
+    ref = np.argmax(model.fprop(x, inference=True).get(), axis=0).reshape((steps, be.bsz))
+    assert np.array_equal(tokens, ref)
+
+    # a beam of one hypothesis is greedy decoding
+    model.layers.encoder.fprop(x, inference=True)
+    init_state_list = model.layers.encoder.get_final_states(model.layers.decoder_connections)
+    beam1 = model.layers._beam_search(init_state_list, steps, 1, None)
+    assert np.array_equal(beam1, tokens)
+
+
+def test_generate_end_index(backend_cpu64):
+    be = backend_cpu64
+    vocab_size, steps = 10, 5
+    model, dataset = make_seq2seq(be, vocab_size, steps)
+    (x, z), _ = next(iter(dataset))
+
+    tokens = model.layers.generate(x)
+    end_index = tokens[1, 0]
+    ended = model.layers.generate(x, end_index=end_index)
+    for col in range(be.bsz):
+        hits = np.nonzero(tokens[:, col] == end_index)[0]
+        if len(hits) == 0:
+            assert np.array_equal(ended[:, col], tokens[:, col])
+        else:
+            stop = hits[0] + 1
+            assert np.array_equal(ended[:stop, col], tokens[:stop, col])
+            assert np.all(ended[stop:, col] == end_index)
+
+
+def test_beam_generate(backend_cpu64):
+    be = backend_cpu64
+    vocab_size, steps = 10, 5
+    model, dataset = make_seq2seq(be, vocab_size, steps)
+    (x, z), _ = next(iter(dataset))
+
+    greedy = model.layers.generate(x)
+    beam = model.layers.generate(x, beam_size=4)
+    assert beam.shape == greedy.shape
+
+    greedy_score = sequence_logprob(be, model, x, greedy)
+    beam_score = sequence_logprob(be, model, x, beam)
+    assert np.all(beam_score >= greedy_score - 1e-6)
+
+
+def test_beam_search_exact(backend_cpu64):
+    be = backend_cpu64
+    be.bsz = 4
+    nout, steps = 3, 3
+    rng = np.random.RandomState(0)
+    # first token and transition probabilities of each input
+    first = rng.dirichlet(np.ones(nout), size=be.bsz).T
+    trans = rng.dirichlet(np.ones(nout), size=(be.bsz, nout))
+    prob = be.empty((nout, be.bsz))
+    cols = np.arange(be.bsz)
+
+    def step(prev):
+        prob.set(first if prev is None else trans[cols, prev].T)
+        return prob
+
+    # a beam holding every partial sequence finds the most likely one
+    tokens = beam_search(be, step, [], nout, nout ** (steps - 1), steps)
+    for col in cols:
+        seqs = list(itertools.product(range(nout), repeat=steps))
+        logp = [np.log(first[s[0], col]) +
+                sum(np.log(trans[col, a, b]) for a, b in zip(s[:-1], s[1:])) for s in seqs]
+        assert tuple(tokens[:, col]) == seqs[int(np.argmax(logp))]
+
+
+def test_model_generate(backend_cpu64):
+    be = backend_cpu64
+    vocab_size, steps = 10, 4
+    model, dataset = make_seq2seq(be, vocab_size, steps, ndata=2 * be.bsz)
+
+    tokens = model.generate(dataset, beam_size=2)
+    assert tokens.shape == (dataset.ndata, steps)
+
+    (x, z), _ = next(iter(dataset))
+    assert np.array_equal(tokens[:be.bsz], model.layers.generate(x, beam_size=2).T)
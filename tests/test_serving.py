@@ -0,0 +1,101 @@
+# ----------------------------------------------------------------------------
+# Copyright 2016 Nervana Systems Inc.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ----------------------------------------------------------------------------
+"""
+Test the micro-batching inference server
+"""
+import json
+import threading
+
+import numpy as np
+import pytest
+
+from neon.util import compat  # noqa, installs the python 3 standard library names
+from urllib.request import urlopen  # noqa
+from neon.initializers import Gaussian, Uniform
+from neon.layers import Conv, Pooling, Affine
+from neon.models import Model, InferenceServer
+from neon.transforms import Rectlin, Softmax
+
+in_shape = (3, 6, 6)
+
+
+def make_model(be):
+    init = Gaussian(scale=0.1)
+    bias = Uniform(low=-0.1, high=0.1)
+    model = Model([Conv((3, 3, 4), init=init, bias=bias, padding=1, activation=Rectlin()),
+                   Pooling(2),
+                   Affine(5, init=init, bias=bias, activation=Softmax())])
+    model.initialize(in_shape)
+    X = be.rng.uniform(-1, 1, (be.bsz, int(np.prod(in_shape))))
+    ref = model.fprop(be.array(X.T), inference=True).get().T
+    return model, X, ref
+
+
+def test_server_threads(backend_cpu64):
+    be = backend_cpu64
+    model, X, ref = make_model(be)
+    nrequests = min(be.bsz, 24)
+    results = [None] * nrequests
+
+    def client(i):
+        results[i] = server.predict(X[i], timeout=10)
+
+    with InferenceServer(model, max_batch=8, max_latency=0.05) as server:
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(nrequests)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        stats = server.stats()
+
+    assert be.bsz == model.alloc_bsz
+    for i in range(nrequests):
+        assert np.allclose(results[i], ref[i], rtol=0, atol=1e-10)
+    assert stats['requests'] == nrequests
+    assert stats['batches'] < nrequests
+    assert stats['mean_batch_size'] <= 8
+    assert stats['max_queue_wait'] >= stats['mean_queue_wait'] >= 0
+
+    with pytest.raises(ValueError):
+        InferenceServer(model).submit(X[0][:-1])
+
+    # requests are only accepted while the server runs
+    with pytest.raises(RuntimeError):
+        server.predict(X[0], timeout=10)
+
+
+def test_server_asyncio_and_http(backend_cpu64):
+    be = backend_cpu64
+    asyncio = pytest.importorskip('asyncio')
+    model, X, ref = make_model(be)
+
+    loop = asyncio.new_event_loop()
+    with InferenceServer(model, max_latency=0.01) as server:
+        requests = [server.predict_async(X[i], loop=loop) for i in range(4)]
+        outputs = loop.run_until_complete(asyncio.gather(*requests))
+        loop.close()
+        for i, out in enumerate(outputs):
+            assert np.allclose(out, ref[i], rtol=0, atol=1e-10)
+
+        host, port = server.serve_http()
+        url = 'http://%s:%d/' % (host, port)
+        body = json.dumps({'inputs': X[:2].tolist()}).encode('utf-8')
+        reply = json.loads(urlopen(url, body).read().decode('utf-8'))
+        assert np.allclose(reply['outputs'], ref[:2], rtol=0, atol=1e-10)
+        body = json.dumps({'inputs': X[2].tolist()}).encode('utf-8')
+        reply = json.loads(urlopen(url, body).read().decode('utf-8'))
+        assert np.allclose(reply['outputs'], ref[2], rtol=0, atol=1e-10)
+        stats = json.loads(urlopen(url + 'stats').read().decode('utf-8'))
+        assert stats['requests'] == 7
@@ -12,9 +12,14 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 # ----------------------------------------------------------------------------
+import numpy as np
+import pytest
+
 from neon.initializers.initializer import Uniform
-from neon.transforms.activation import Rectlin
-from neon.layers.layer import Linear, Convolution, Conv, Bias, Activation, Affine
+from neon.transforms.activation import Rectlin, Explin, Identity, Logistic
+from neon.layers.layer import (Linear, Convolution, Conv, Bias, Activation, Affine,
+                               FusedLinear, FusedConvolution)
+from neon.layers.container import Sequential
 
 
 def test_conv_wrapper(backend_default):
@@ -75,3 +80,83 @@ def test_affine_wrapper(backend_default):
     assert isinstance(aff[0], Linear)
     assert isinstance(aff[1], Bias)
     assert isinstance(aff[2], Activation)
+
+
+def test_fused_wrappers(backend_cpu64):
+    """
+    Verify that the wrappers only fuse supported bias and activation combinations.
+    """
+    conv = Conv((4, 4, 3), Uniform(), bias=Uniform(), activation=Rectlin(), fuse=True)
+    assert len(conv) == 1
+    assert isinstance(conv[0], FusedConvolution)
+
+    aff = Affine(11, Uniform(), bias=Uniform(), activation=Explin(), fuse=True)
+    assert len(aff) == 1
+    assert isinstance(aff[0], FusedLinear)
+
+    aff = Affine(11, Uniform(), bias=Uniform(), activation=Logistic(), fuse=True)
+    assert [type(l) for l in aff] == [Linear, Bias, Activation]
+
+    aff = Affine(11, Uniform(), bias=Uniform(), batch_norm=False, fuse=False)
+    assert [type(l) for l in aff] == [Linear, Bias]
+
+
+@pytest.mark.parametrize('activation', [Rectlin(), Rectlin(slope=0.1), Explin(), Identity()])
+@pytest.mark.parametrize('conv', [False, True])
+def test_fused_layers(backend_cpu64, activation, conv):
+    """
+    Compare the fused layers against separate Linear/Convolution, Bias and Activation
+    layers in fprop and bprop.
+    """
+    be = backend_cpu64
+    if conv:
+        in_shape = (3, 6, 6)
+
+        def make(fuse):
+            return [Conv((3, 3, 2), Uniform(), bias=Uniform(), activation=Rectlin()),
+                    Conv((3, 3, 4), Uniform(-1, 1), padding=1, bias=Uniform(-1, 1),
+                         activation=activation, fuse=fuse)]
+    else:
+        in_shape = 20
+
+        def make(fuse):
+            return [Affine(10, Uniform(), bias=Uniform(), activation=Rectlin()),
+                    Affine(16, Uniform(-1, 1), bias=Uniform(-1, 1),
+                           activation=activation, fuse=fuse)]
+
+    ref_layers = make(fuse=False)
+    fused_layers = make(fuse=True)
+    assert len(fused_layers[1]) == 1
+
+    nin = np.prod(in_shape)
+    inp = be.array(be.rng.uniform(-1, 1, (nin, be.bsz)))
+    ref_model = Sequential(ref_layers)
+    ref_model.configure(in_shape)
+    ref_model.allocate()
+    fused_model = Sequential(fused_layers)
+    fused_model.configure(in_shape)
+    fused_model.allocate()
+
+    # copy the parameters of the reference layers
+    ref_params = [l for l in ref_model.layers if l.has_params]
+    fused_params = [l for l in fused_model.layers if l.has_params]
+    for ref, fused in zip(ref_params, fused_params):
+        fused.W[:] = ref.W
+    fused = fused_params[-1]
+    fused.b[:] = ref_params[-1].W
+
+    nout = np.prod(ref_model.out_shape)
+    err = be.array(be.rng.uniform(-1, 1, (nout, be.bsz)))
+
+    ref_model.allocate_deltas()
+    fused_model.allocate_deltas()
+    ref_out = ref_model.fprop(inp).get()
+    fused_out = fused_model.fprop(inp).get()
+    assert np.allclose(fused_out, ref_out, rtol=0, atol=1e-10)
+
+    ref_model.bprop(be.array(err.get()))
+    fused_model.bprop(be.array(err.get()))
+    assert np.allclose(fused.deltas.get(), ref_params[-2].deltas.get(), rtol=0, atol=1e-10)
+    assert np.allclose(fused_params[0].dW.get(), ref_params[0].dW.get(), rtol=0, atol=1e-10)
+    assert np.allclose(fused.dW.get(), ref_params[-2].dW.get(), rtol=0, atol=1e-10)
+    assert np.allclose(fused.db.get(), ref_params[-1].dW.get(), rtol=0, atol=1e-10)